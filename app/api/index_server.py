@@ -0,0 +1,183 @@
+"""Index-owner process: serves the embedded Qdrant store over Qdrant's REST API.
+
+Embedded Qdrant (QdrantClient(path=...)) takes an exclusive lock on its
+directory, so only one process may open it. This server is that one process;
+API workers started with QDRANT_URL=http://127.0.0.1:6333 talk to it through the
+regular qdrant-client HTTP transport, exactly as they would to a real Qdrant
+server (which can replace it without code changes).
+
+Only the endpoints the app uses are implemented: collection create / get /
+update / exists / delete (generation GC), payload index, points upsert / retrieve / delete / scroll /
+count / search / query.
+
+Usage (from the repo root):
+    python -m app.api.index_server [--host 127.0.0.1] [--port 6333] [--path data/persist/qdrant]
+"""
+
+import argparse
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from fastapi import Body, FastAPI
+from fastapi.encoders import jsonable_encoder
+from qdrant_client import QdrantClient
+from qdrant_client.http import models as qmodels
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+app = FastAPI(title="Finance QA index server")
+
+_client: Optional[QdrantClient] = None
+# the embedded store is not safe for concurrent access; requests are serialised here
+_lock = threading.Lock()
+
+
+def open_index(path: Optional[str] = None) -> QdrantClient:
+    global _client
+    if _client is None:
+        path = path or os.path.join(settings.persist_dir, 'qdrant')
+        os.makedirs(path, exist_ok=True)
+        _client = QdrantClient(path=path)
+        print(f"[INDEX] opened path={path}")
+    return _client
+
+
+def _ok(call, *args, **kwargs) -> Dict[str, Any]:
+    t0 = time.time()
+    with _lock:
+        result = call(*args, **kwargs)
+    return {"result": jsonable_encoder(result), "status": "ok", "time": time.time() - t0}
+
+
+@app.get("/")
+def root():
+    return {"title": "finance-qa index server (qdrant REST subset)", "version": "1.12.1"}
+
+
+@app.get("/collections")
+def get_collections():
+    return _ok(open_index().get_collections)
+
+
+@app.get("/collections/{name}")
+def get_collection(name: str):
+    return _ok(open_index().get_collection, name)
+
+
+@app.get("/collections/{name}/exists")
+def collection_exists(name: str):
+    return _ok(lambda: qmodels.CollectionExistence(exists=open_index().collection_exists(name)))
+
+
+@app.put("/collections/{name}")
+def create_collection(name: str, body: Dict[str, Any] = Body(...)):
+    req = qmodels.CreateCollection.model_validate(body)
+    return _ok(open_index().create_collection, name, vectors_config=req.vectors,
+               sparse_vectors_config=req.sparse_vectors, quantization_config=req.quantization_config)
+
+
+@app.delete("/collections/{name}")
+def delete_collection(name: str):
+    return _ok(open_index().delete_collection, name)
+
+
+@app.patch("/collections/{name}")
+def update_collection(name: str, body: Dict[str, Any] = Body(...)):
+    req = qmodels.UpdateCollection.model_validate(body)
+    return _ok(open_index().update_collection, name, sparse_vectors_config=req.sparse_vectors,
+               quantization_config=req.quantization_config)
+
+
+@app.put("/collections/{name}/index")
+def create_field_index(name: str, body: Dict[str, Any] = Body(...)):
+    req = qmodels.CreateFieldIndex.model_validate(body)
+    return _ok(open_index().create_payload_index, name, field_name=req.field_name, field_schema=req.field_schema)
+
+
+@app.put("/collections/{name}/points")
+def upsert_points(name: str, body: Dict[str, Any] = Body(...)):
+    if 'batch' in body:
+        points = qmodels.PointsBatch.model_validate(body).batch
+    else:
+        points = qmodels.PointsList.model_validate(body).points
+    return _ok(open_index().upsert, name, points=points)
+
+
+@app.post("/collections/{name}/points")
+def get_points(name: str, body: Dict[str, Any] = Body(...)):
+    req = qmodels.PointRequest.model_validate(body)
+    return _ok(open_index().retrieve, name, ids=req.ids, with_payload=req.with_payload,
+               with_vectors=req.with_vector)
+
+
+@app.post("/collections/{name}/points/delete")
+def delete_points(name: str, body: Dict[str, Any] = Body(...)):
+    if 'filter' in body:
+        selector = qmodels.FilterSelector.model_validate(body)
+    else:
+        selector = qmodels.PointIdsList.model_validate(body)
+    return _ok(open_index().delete, name, points_selector=selector)
+
+
+@app.post("/collections/{name}/points/scroll")
+def scroll_points(name: str, body: Dict[str, Any] = Body(...)):
+    req = qmodels.ScrollRequest.model_validate(body)
+
+    def scroll():
+        points, offset = open_index().scroll(name, scroll_filter=req.filter, limit=req.limit or 10,
+                                             offset=req.offset, with_payload=req.with_payload,
+                                             with_vectors=req.with_vector, order_by=req.order_by)
+        return qmodels.ScrollResult(points=points, next_page_offset=offset)
+    return _ok(scroll)
+
+
+@app.post("/collections/{name}/points/count")
+def count_points(name: str, body: Dict[str, Any] = Body(...)):
+    req = qmodels.CountRequest.model_validate(body)
+    return _ok(open_index().count, name, count_filter=req.filter, exact=req.exact)
+
+
+@app.post("/collections/{name}/points/search")
+def search_points(name: str, body: Dict[str, Any] = Body(...)):
+    req = qmodels.SearchRequest.model_validate(body)
+    return _ok(open_index().search, name, query_vector=req.vector, query_filter=req.filter,
+               search_params=req.params, limit=req.limit, offset=req.offset or 0,
+               with_payload=req.with_payload, with_vectors=req.with_vector, score_threshold=req.score_threshold)
+
+
+@app.post("/collections/{name}/points/query")
+def query_points(name: str, body: Dict[str, Any] = Body(...)):
+    req = qmodels.QueryRequest.model_validate(body)
+    return _ok(open_index().query_points, name, query=req.query, using=req.using, prefetch=req.prefetch,
+               query_filter=req.filter, search_params=req.params, limit=req.limit or 10, offset=req.offset,
+               with_payload=req.with_payload, with_vectors=req.with_vector, score_threshold=req.score_threshold)
+
+
+def start_in_thread(host: str = '127.0.0.1', port: int = 6333, path: Optional[str] = None):
+    """Serve on a daemon thread (tests / single-box setups); returns the uvicorn server."""
+    import uvicorn
+    open_index(path)
+    server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level='warning'))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def main():
+    import uvicorn
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=6333)
+    parser.add_argument('--path', default=None, help='embedded store directory (default: persist_dir/qdrant)')
+    args = parser.parse_args()
+    open_index(args.path)
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
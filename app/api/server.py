@@ -1,17 +1,31 @@
 from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 import shutil
 import os
 import json
+import time
 import uuid
 import threading
 import traceback
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # non-POSIX: every process runs the inbox scan / watcher
+    fcntl = None
+
+_T_IMPORT = time.time()
 
 from app.stores.main_store import MainStore
+from app.stores import generations
 from app.services.qa_loop import QALoop
 from app.core.config import get_settings
 from app.services.event_logger import EventLogger
+from app.services.inbox_watcher import InboxWatcher
+from app.services.embedding_cache import get_embedding_cache
+from app.services.openai_client import get_embedding_scheduler
 
 settings = get_settings()
 
@@ -24,15 +38,229 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-store = MainStore()
-qa = QALoop(store)
+# Stores are opened lazily (first request or the startup thread) so the server
+# accepts requests immediately; the inbox scan runs in the background.
+_store = None
+_qa = None
+_watcher = None
+_init_lock = threading.Lock()
+_startup = {'phase': 'starting', 'role': None, 'scan_job_id': None, 'timings_ms': {}, 'error': None}
+_ingest_lock_file = None
+# index generations: one rebuild at a time; readers follow CURRENT (checked at most every few seconds)
+_rebuild_lock = threading.Lock()
+_switch_lock = threading.Lock()
+_retired = {}  # generation -> store swapped out but still open for in-flight requests (grace period)
+_rebuild = {'job_id': None, 'generation': None, 'phase': None, 'error': None}
+_generation_checked = 0.0
+_GENERATION_POLL = 2.0
+
+
+def _record_phase(name: str, t0: float):
+    ms = (time.time() - t0) * 1000.0
+    _startup['timings_ms'][name] = round(ms, 1)
+    print(f"[STARTUP] phase={name} ms={ms:.1f}")
+
+
+def _claim_ingest() -> bool:
+    """With several workers (uvicorn --workers N) only the lock holder scans and watches the inbox."""
+    global _ingest_lock_file
+    if fcntl is None:
+        return True
+    f = open(os.path.join(settings.persist_dir, 'ingest.lock'), 'w')
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        return False
+    _ingest_lock_file = f  # held (and the lock with it) for the life of the process
+    return True
+
+
+def get_store() -> MainStore:
+    global _store, _qa
+    if _store is None:
+        with _init_lock:
+            if _store is None:
+                t0 = time.time()
+                store = MainStore()
+                _qa = QALoop(store)
+                _store = store
+                _record_phase('store_open', t0)
+    else:
+        _follow_active_generation()
+    return _store
+
+
+def _require_ingest_role():
+    if _startup['role'] != 'ingest':
+        raise HTTPException(503, f"this worker does not ingest (role={_startup['role']}); retry against the ingest worker")
+
+
+@contextmanager
+def _writing():
+    """Store for an endpoint write, held under MainStore.ingest_lock.
+
+    Writes are serialized with the inbox watcher and with generation swaps;
+    the store is resolved after taking the lock so a write never lands in a
+    generation that was just swapped out. Only the ingest worker accepts
+    writes (query-role workers share the index read-only).
+    """
+    _require_ingest_role()
+    with MainStore.ingest_lock:
+        yield get_store()
+
+
+def _swap_store(new: MainStore):
+    """Point new requests at another generation; requests already running keep the store they started with."""
+    global _store, _qa, _watcher
+    old = _store
+    with _init_lock:
+        _store, _qa = new, QALoop(new)
+    if _watcher is not None and _watcher.store is old:
+        _watcher.stop()
+        _watcher = InboxWatcher(new)
+        _watcher.start()
+    if old is None:
+        return
+    _retired[old.generation] = old
+
+    def retire():
+        time.sleep(settings.generation_grace_seconds)
+        with _switch_lock:
+            if _retired.get(old.generation) is not old:
+                return  # switched back to it meanwhile
+            del _retired[old.generation]
+        try:
+            old.close()
+            if _startup['role'] != 'query':
+                generations.collect_garbage(protect=[_store.generation, *_retired],
+                                            qdrant=_store.lc_store.qdrant if _store.lc_store.shared else None)
+        except Exception as e:
+            print(f"[GENERATION] ERROR retiring {old.generation}: {e}")
+            EventLogger(f"generation-gc-{uuid.uuid4()}").error('generation_gc_failed', generation=old.generation,
+                                                                 error=str(e), traceback=traceback.format_exc())
+    threading.Thread(target=retire, daemon=True).start()
+
+
+def _switch_to(generation: str, activate: bool = False):
+    """Serve another generation (reusing it if still open); activate=True also points CURRENT at it."""
+    with _switch_lock:
+        if generation == _store.generation:
+            if activate:
+                generations.set_active(generation)
+            return
+        new = _retired.pop(generation, None) or MainStore(generation)
+        if activate:
+            generations.set_active(generation)
+        _swap_store(new)
+
+
+def _follow_active_generation():
+    """Switch to the generation in CURRENT once another process (or worker) activated it."""
+    global _generation_checked
+    now = time.time()
+    if now - _generation_checked < _GENERATION_POLL or _rebuild_lock.locked() or _switch_lock.locked():
+        return
+    _generation_checked = now
+    active = generations.active_generation()
+    if active == _store.generation:
+        return
+    try:
+        print(f"[GENERATION] following active={active} (was {_store.generation})")
+        _switch_to(active)
+    except Exception as e:
+        print(f"[GENERATION] could not open {active}: {e}")
+
+
+def _rebuild_generation(job_id: str):
+    """Blue/green rebuild: build + validate a new generation while the current one serves, then swap."""
+    global _watcher
+    logger = EventLogger(job_id)
+    if not _rebuild_lock.acquire(blocking=False):
+        logger.error('generation_rebuild_busy', running=_rebuild['job_id'])
+        return
+    watcher = _watcher
+    _rebuild.update(job_id=job_id, generation=None, phase='building', error=None)
+    try:
+        old = get_store()
+        new = old.build_generation(logger=logger)
+        _rebuild.update(generation=new.generation, phase='swapping')
+        # pause inbox ingestion into the old generation, carry over its last changes, then swap;
+        # endpoint writes wait on the ingest lock and then go to the new generation
+        if watcher is not None:
+            watcher.stop()
+            _watcher = None
+        with MainStore.ingest_lock:
+            old.catch_up(new, logger=logger)
+            with _switch_lock:
+                generations.set_active(new.generation)
+                _swap_store(new)
+        logger.info('generation_swapped', generation=new.generation, previous=old.generation)
+        _rebuild['phase'] = 'done'
+        logger.done(status='ok', generation=new.generation)
+    except Exception as e:
+        _rebuild.update(phase='failed', error=str(e))
+        logger.error('generation_rebuild_failed', error=str(e), traceback=traceback.format_exc())
+    finally:
+        if watcher is not None and _watcher is None:
+            _watcher = InboxWatcher(_store)
+            _watcher.start()
+        _rebuild_lock.release()
+
+
+def get_qa() -> QALoop:
+    get_store()
+    return _qa
 
-# Optional startup scan
-if settings.auto_scan_on_start:
+
+def _startup_task():
+    global _watcher
     try:
-        store.scan_folder()
-    except Exception:
-        pass
+        _startup['phase'] = 'opening_stores'
+        get_store()
+        ingest = _claim_ingest()
+        _startup['role'] = 'ingest' if ingest else 'query'
+        print(f"[STARTUP] pid={os.getpid()} role={_startup['role']}")
+        stale = _store.stale_reason()
+        if ingest and stale and settings.generation_auto_rebuild:
+            # keep serving the current generation; the scan and watcher then run on the rebuilt one
+            print(f"[STARTUP] generation={_store.generation} is stale ({stale}); rebuilding")
+            _startup['phase'] = 'rebuilding'
+            t0 = time.time()
+            _rebuild_generation(f"generation-rebuild-{uuid.uuid4()}")
+            _record_phase('generation_rebuild', t0)
+        if ingest and settings.auto_scan_on_start:
+            _startup['phase'] = 'scanning'
+            job_id = f"startup-scan-{uuid.uuid4()}"
+            _startup['scan_job_id'] = job_id
+            t0 = time.time()
+            try:
+                with MainStore.ingest_lock:
+                    _store.scan_folder(logger=EventLogger(job_id))
+            except Exception as e:
+                _startup['error'] = str(e)
+                print(f"[STARTUP] scan failed: {e}")
+            _record_phase('inbox_scan', t0)
+        if ingest and settings.watch_inbox:
+            _watcher = InboxWatcher(_store)
+            _watcher.start()
+        _startup['phase'] = 'ready'
+    except Exception as e:
+        _startup['phase'] = 'failed'
+        _startup['error'] = str(e)
+        print(f"[STARTUP] store init failed: {e}")
+
+
+@app.on_event("startup")
+def _on_startup():
+    _record_phase('import', _T_IMPORT)
+    threading.Thread(target=_startup_task, daemon=True).start()
+
+
+@app.on_event("shutdown")
+def _on_shutdown():
+    if _watcher is not None:
+        _watcher.stop()
 
 class QuestionRequest(BaseModel):
     question: str
@@ -49,22 +277,28 @@ class JobStatusResponse(BaseModel):
 
 @app.get("/files")
 def list_files():
-    return {"files": store.list_files()}
+    # served from the document catalog (no collection scan)
+    catalog = get_store().lc_store.catalog
+    filings = {f['filename']: f for f in catalog.filings()}
+    docs = [{**d, 'filing': filings.get(d['filename'])} for d in catalog.documents()]
+    return {"files": [d['filename'] for d in docs], "documents": docs}
 
 @app.post("/upload")
 def upload_pdf(file: UploadFile = File(...)):
     if not file.filename.lower().endswith('.pdf'):
         raise HTTPException(400, 'Only PDF files supported')
-    dest_path = os.path.join('data', file.filename)
-    with open(dest_path, 'wb') as f:
-        shutil.copyfileobj(file.file, f)
-    meta = store.load_pdf(dest_path)
+    with _writing() as store:
+        dest_path = os.path.join('data', file.filename)
+        with open(dest_path, 'wb') as f:
+            shutil.copyfileobj(file.file, f)
+        meta = store.load_pdf(dest_path)
     return {"status": "ok", **meta}
 
 @app.post("/upload_async")
 def upload_pdf_async(background: BackgroundTasks, file: UploadFile = File(...)):
     if not file.filename.lower().endswith('.pdf'):
         raise HTTPException(400, 'Only PDF files supported')
+    _require_ingest_role()
     job_id = str(uuid.uuid4())
     dest_path = os.path.join('data', file.filename)
     with open(dest_path, 'wb') as f:
@@ -73,7 +307,8 @@ def upload_pdf_async(background: BackgroundTasks, file: UploadFile = File(...)):
     def task():
         try:
             # Use streaming ingestion; batch size derived from settings unless overridden
-            meta = store.load_pdf_streaming(dest_path, logger=logger)
+            with _writing() as store:
+                meta = store.load_pdf_streaming(dest_path, logger=logger)
         except Exception as e:
             logger.error('ingest_failed', error=str(e), traceback=traceback.format_exc())
     background.add_task(task)
@@ -82,23 +317,28 @@ def upload_pdf_async(background: BackgroundTasks, file: UploadFile = File(...)):
 @app.post("/scan")
 def scan_folder_alt():
     # Alternative endpoint name for scan
-    result = store.scan_folder()
+    with _writing() as store:
+        result = store.scan_folder()
     return result
 
 @app.post("/scan_folder")
 def scan_folder(force: bool = False):
     # Simple synchronous scan (could be made async with events similar to uploads)
-    result = store.scan_folder(force=force)
+    with _writing() as store:
+        result = store.scan_folder(force=force)
     return result
 
 @app.delete("/files/{filename}")
 def delete_file(filename: str):
-    store.delete_file(filename)
-    return {"status": "deleted", "filename": filename}
+    with _writing() as store:
+        if not store.lc_store.catalog.contains(filename):
+            raise HTTPException(404, 'File not found')
+        removed = store.delete_file(filename)
+    return {"status": "deleted", "filename": filename, "document": removed}
 
 @app.post("/question")
 def ask(req: QuestionRequest):
-    trace = qa.run(req.question)
+    trace = get_qa().run(req.question)
     trace_path = os.path.join(settings.trace_dir, f"{trace['id']}.json")
     with open(trace_path, 'w') as f:
         json.dump(trace, f)
@@ -111,7 +351,7 @@ def ask_async(req: QuestionAsyncRequest):
     def task():
         try:
             logger.info('qa_loop_start', question=req.question)
-            trace = qa.run(req.question)
+            trace = get_qa().run(req.question)
             trace_path = os.path.join(settings.trace_dir, f"{trace['id']}.json")
             with open(trace_path, 'w') as f:
                 json.dump(trace, f)
@@ -159,17 +399,63 @@ def list_traces():
     traces = sorted(traces, key=lambda x: x.get('created_at') or '', reverse=True)
     return {'traces': traces}
 
+@app.get("/generations")
+def list_generations():
+    return {"active": generations.active_generation(), "rebuild": _rebuild,
+            "generations": generations.list_generations()}
+
+@app.post("/generations/rebuild")
+def rebuild_generation():
+    """Re-ingest every catalogued document into a new generation under the current settings, then swap."""
+    if _rebuild_lock.locked():
+        raise HTTPException(409, f"rebuild already running (job {_rebuild['job_id']})")
+    job_id = f"generation-rebuild-{uuid.uuid4()}"
+    threading.Thread(target=_rebuild_generation, args=(job_id,), daemon=True).start()
+    return {"job_id": job_id, "status": "started"}
+
+@app.post("/generations/{generation}/activate")
+def activate_generation(generation: str):
+    """Roll back / forward to a finished generation."""
+    meta = generations.read_meta(generation)
+    if meta.get('status') not in ('ready', 'active') or not os.path.isdir(generations.generation_root(generation)):
+        raise HTTPException(404, 'No finished generation with that id')
+    if _rebuild_lock.locked():
+        raise HTTPException(409, 'rebuild running')
+    get_store()
+    with MainStore.ingest_lock:  # no write may land in the generation being swapped out
+        _switch_to(generation, activate=True)
+    return {"active": generation}
+
+@app.get("/ready")
+def ready():
+    """Readiness probe: 200 once the stores are open (the inbox scan may still be running)."""
+    ok = _store is not None and _startup['phase'] != 'failed'
+    if settings.ready_requires_scan:
+        ok = ok and _startup['phase'] == 'ready'
+    body = {"ready": ok, **_startup}
+    return JSONResponse(body, status_code=200 if ok else 503)
+
 @app.get("/health")
 def health():
+    if _store is None:
+        # liveness must not wait for store init
+        return {"status": "starting", "backend": "langchain", "startup": _startup}
+    store = _store
     try:
-        # Get collection info from simplified store
-        collection_info = store.lc_store.get_collection_info()
-        counts = {
-            'docs': collection_info.get('docs', {}).get('points_count', 0),
-            'chunks': collection_info.get('chunks', {}).get('points_count', 0),
-            'tables': collection_info.get('tables', {}).get('points_count', 0)
-        }
-        return {"status": "ok", "backend": "langchain", **counts}
+        # counts come from the document catalog (no collection scan)
+        counts = store.lc_store.catalog.totals()
+        cache = get_embedding_cache()
+        cache_stats = cache.stats() if cache is not None else None
+        dedup = store.lc_store.dedup.stats() if store.lc_store.dedup is not None else None
+        table_store = store.lc_store.tables.stats() if store.lc_store.tables is not None else None
+        facts = store.lc_store.facts.stats() if store.lc_store.facts is not None else None
+        scheduler = get_embedding_scheduler()
+        embedding_stats = scheduler.stats() if scheduler is not None else None
+        return {"status": "ok", "backend": "langchain", **counts, "embedding_cache": cache_stats,
+                "embedding_scheduler": embedding_stats, "dedup": dedup, "table_store": table_store, "facts": facts, "startup": _startup,
+                "generation": store.generation,
+                "watcher": _watcher.stats if _watcher is not None else None,
+                "faiss": {name: m.stats() for name, m in store.lc_store.faiss.items()} or None}
     except Exception as e:
         return {"status": "error", "backend": "langchain", "error": str(e)}
 
@@ -192,11 +478,15 @@ def _explain_trace(trace):
         elif t == 'retrieve_docs':
             parts.append(f"Retrieved {len(step['candidates'])} candidate summaries")
         elif t == 'select_docs':
-            parts.append(f"Selected docs: {step['selection']}")
+            parts.append(f"{'Routed' if step.get('routed') else 'Selected'} docs: {step['selection']}")
         elif t == 'retrieve_chunks':
             parts.append(f"Retrieved {len(step['chunks'])} chunks and {len(step['tables'])} tables")
         elif t == 'filter_chunks':
             parts.append(f"Filter selected {len(step['selected'])} chunks, answerable={step['answerable']}")
+        elif t == 'route_filings':
+            parts.append(f"Routed by issuer/year/form to {step['files']}")
+        elif t == 'fact_lookup':
+            parts.append(f"Fact index: {len(step['facts'])} facts for '{step['metric']}' in {step['periods']}")
         elif t == 'final_answer':
             parts.append(f"Final answer produced")
     return "\n".join(parts)
@@ -5,36 +5,96 @@ import os
 class Settings(BaseModel):
     # IMPORTANT: Set OPENAI_API_KEY in environment; leave blank if not set.
     openai_api_key: str = os.getenv("OPENAI_API_KEY", "")
+    openai_base_url: str = os.getenv("OPENAI_BASE_URL", "")  # optional override, e.g. a local fake embedding server
     embedding_model: str = "text-embedding-3-small"
+    embedding_dim: int = 1536  # stored vector width; requested via `dimensions` when it differs from the model's native width
     chat_model: str = "gpt-4o-mini-2024-07-18"
     summary_chars: int = 5000
 
     chunk_size: int = 1200
     chunk_overlap: int = 150
     embedding_batch_size: int = 32
+    ingest_queue_pages: int = 8  # parsed pages buffered ahead of the embed/upsert stage
+    scan_concurrent: bool = True  # multi-file scans: parse (processes) -> summarize/embed (threads) -> single writer
+    scan_parse_processes: int = 0  # files parsed concurrently (0 = os.cpu_count())
+    scan_embed_threads: int = 4  # files summarized/embedded concurrently
+    scan_write_queue: int = 16  # embedded batches buffered ahead of the Qdrant writer
+    embedding_cache_enabled: bool = True  # on-disk (model, dim, sha256(text)) -> vector cache
+    embedding_cache_max_entries: int = 500_000  # LRU-evicted beyond this (~6KB per 1536-dim vector)
+    embedding_max_batch_tokens: int = 60_000  # token budget per embeddings request
+    embedding_max_batch_items: int = 256  # inputs per embeddings request
+    embedding_max_in_flight: int = 4  # concurrent embeddings requests per process
+    embedding_max_retries: int = 6  # retries on 429 / 5xx / timeouts
+    embedding_backoff_base: float = 0.5  # seconds; full-jitter exponential backoff
+    embedding_backoff_max: float = 30.0
+    embedding_request_timeout: float = 60.0
     event_buffer_flush_events: int = 5  # how many events before disk flush
 
-    table_max_rows: int = 50
+    table_max_rows: int = 50  # rows of a hydrated table shown to the answer LLM
     table_max_cols: int = 30
+    table_store_enabled: bool = True  # keep full table rows in a compressed sidecar (tables.sqlite), fetched at answer time
+    table_context_max_chars: int = 6000  # per hydrated table in the final-answer context
+    fact_store_enabled: bool = True  # extract (issuer, metric, fiscal year, value, unit) facts from tables at ingest (facts.sqlite)
+    fact_fast_path: str = "answer"  # metric/year questions: "answer" (directly when unambiguous and asking just that figure, else seed) | "seed" (facts + tables seed the loop's evidence) | "off"
+    fact_seed_tables: int = 3  # source tables hydrated next to the seeded facts
+    route_by_filing_metadata: bool = True  # restrict doc candidates to the filings a question's issuer / fiscal year / form constraints resolve to
+    route_max_filings: int = 3  # constraints resolving to at most this many filings skip doc search and the select_docs LLM call
 
 
     persist_dir: str = "data/persist"
+    # shared index for multi-worker serving: a Qdrant server or `python -m app.api.index_server` (empty = embedded store)
+    qdrant_url: str = os.getenv("QDRANT_URL", "")
+    qdrant_api_key: str = os.getenv("QDRANT_API_KEY", "")
+    generation_auto_rebuild: bool = True  # ingest settings changed since the active index generation was built: rebuild it in the background
+    generation_keep: int = 2  # finished index generations kept on disk (active + one to roll back to)
+    generation_max_missing: int = 0  # catalogued documents a new generation may lack and still be activated
+    generation_grace_seconds: float = 30.0  # a swapped-out generation stays open this long for in-flight requests
+    generation_stale_build_seconds: float = 21600.0  # a 'building' generation older than this counts as abandoned
     trace_dir: str = "data/traces"
     events_dir: str = "data/events"
     watch_dir: str = "data/inbox"  # directory where user drops PDFs
     auto_scan_on_start: bool = True  # automatically ingest new PDFs at startup
+    ready_requires_scan: bool = False  # /ready waits for the background startup scan too
+    watch_inbox: bool = True  # background watcher ingests / deletes inbox PDFs as they change
+    watch_poll_interval: float = 2.0  # seconds; used when watchdog (inotify) is not installed
+    watch_debounce_seconds: float = 1.5  # file must be unchanged this long before it is ingested
     simple_pdf_parser: bool = False  # fast path: page text only, no block/table scan
     enable_table_extraction: bool = True  # allow disabling table detection for speed
+    parse_workers: int = 1  # >1 parses page ranges in a process pool (each worker opens the PDF)
+    parse_pages_per_task: int = 8  # pages handed to a worker per task
+    parse_cache_enabled: bool = True  # reuse persisted page layouts keyed by file hash + parser version
+    parse_cache_max_mb: int = 512  # least recently used parse-cache entries are evicted above this (0 = unbounded)
     parse_debug: bool = True  # verbose parsing / ingestion prints to stdout
     rag_debug: bool = True  # verbose RAG pipeline (query reformulation, retrieval steps)
     chunk_strategy: str = "recursive"  # one of: fixed, sentence, recursive
     max_chunk_size: int = 1200  # upper bound for adaptive strategies
     sentence_split_regex: str = r"(?<=[.!?])\s+"  # basic sentence boundary
     doc_summary_max_chars: int = 600  # truncate summary shown to selection LLM
+    doc_index_in_memory: bool = True  # doc routing via an in-memory summary matrix instead of a Qdrant search
+    retrieval_backend: str = "qdrant"  # "qdrant" | "faiss" (FAISS mirror of chunks/tables; Qdrant stays the source of truth)
+    faiss_index_type: str = "hnsw"  # "hnsw" | "ivf" | "flat"
+    faiss_hnsw_m: int = 32
+    faiss_hnsw_ef_construction: int = 80
+    faiss_hnsw_ef_search: int = 96
+    faiss_ivf_nlist: int = 0  # 0 = 4 * sqrt(n) at training time
+    faiss_nprobe: int = 16
+    faiss_exact_filter_max: int = 50_000  # doc-filtered searches over at most this many rows are exact
+    faiss_rebuild_dead_ratio: float = 0.2  # compact + rebuild once this share of rows is tombstoned
+    faiss_save_every: int = 20_000  # rows added between index snapshots (newer rows are re-added on load)
+    vector_quantization: str = "none"  # chunks/tables: "none" | "int8" (scalar) | "binary" (1 bit per dim)
+    quantization_oversample: float = 4.0  # quantized search fetches top_k * this, then rescores with float vectors
+    coarse_dim: int = 0  # >0: the FAISS mirror indexes the first coarse_dim components (matryoshka prefix) and reranks with the full vector
+    coarse_candidates: int = 200  # coarse-stage hits reranked with the full vector
+    dedup_enabled: bool = True  # SimHash near-duplicate detection for chunks at ingest
+    dedup_max_hamming: int = 3  # max differing bits (of 64) to call two chunks near-duplicates
+    dedup_oversample: int = 2  # chunk search fetches top_k * this before collapsing duplicate groups
 
     top_k_docs: int = 12
     top_k_chunks: int = 12
     top_k_tables: int = 12
+    retrieval_min_score: float = 0.0  # adaptive top-k: drop hits below this cosine similarity (0 = off)
+    retrieval_relative_drop: float = 0.0  # adaptive top-k: drop hits scoring below best * (1 - this) (0 = off)
+    retrieval_min_keep: int = 1  # never cut below this many hits
     iterative_max_loops: int = 4
     # Weight for lexical (BM25) vs dense in ensemble (lexical weight = retrieval_alpha, dense weight = 1 - retrieval_alpha)
     retrieval_alpha: float = 0.1
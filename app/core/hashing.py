@@ -0,0 +1,24 @@
+import hashlib
+import json
+from typing import Any, Dict
+
+_READ_BLOCK = 1 << 20
+
+
+def file_sha256(path: str) -> str:
+    """Streamed sha256 of a file's content (constant memory)."""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(_READ_BLOCK), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def text_sha256(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def config_fingerprint(values: Dict[str, Any]) -> str:
+    """Short stable digest of a config dict (key order independent)."""
+    blob = json.dumps(values, sort_keys=True, default=str)
+    return hashlib.sha256(blob.encode('utf-8')).hexdigest()[:16]
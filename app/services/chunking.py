@@ -1,12 +1,18 @@
 import re
-from typing import Iterable, List, Dict, Any
+from bisect import bisect_right
+from typing import Iterable, List, Dict, Any, Optional
 from dataclasses import dataclass
 
+# chars before the previous scan end that are re-checked, so delimiters split across pages are found
+_RESCAN_MARGIN = 256
+
 @dataclass
 class TextChunk:
     text: str
     start: int
     end: int
+    page_start: Optional[int] = None  # set when fed page by page (see ChunkStream)
+    page_end: Optional[int] = None
 
 class Chunker:
     """Configurable chunker supporting multiple strategies.
@@ -15,8 +21,13 @@ class Chunker:
     - fixed: sliding window with overlap
     - sentence: group sentences up to max size
     - recursive: fallback style (sentence grouping; if still too large, split)
+
+    All strategies run in a single left-to-right pass (see ChunkStream); chunk
+    text is always the exact source slice text[start:end].
     """
     def __init__(self, strategy: str, chunk_size: int, overlap: int, max_chunk_size: int, sentence_regex: str):
+        if strategy not in ('fixed', 'sentence', 'recursive'):
+            strategy = 'fixed'  # fallback to fixed
         self.strategy = strategy
         self.chunk_size = chunk_size
         self.overlap = overlap
@@ -24,66 +35,152 @@ class Chunker:
         self.sentence_regex = re.compile(sentence_regex)
 
     def chunk(self, text: str) -> List[TextChunk]:
-        if self.strategy == 'fixed':
-            return list(self._fixed(text))
-        elif self.strategy == 'sentence':
-            return list(self._sentence_group(text))
-        elif self.strategy == 'recursive':
-            return list(self._recursive(text))
+        stream = self.stream()
+        return stream.feed(text) + stream.flush()
+
+    def stream(self) -> 'ChunkStream':
+        """Incremental chunker: feed page texts, receive chunks as soon as they are final."""
+        return ChunkStream(self)
+
+
+class ChunkStream:
+    """Single-pass chunker over text fed piece by piece (pages).
+
+    Pieces are joined with a newline, matching "\\n".join(pages), and offsets
+    refer to that joined text. Only the open group / pending sentence / window
+    is buffered, and each character is scanned by the sentence regex a bounded
+    number of times, so the whole pass is O(n). When pieces are fed with a page
+    number, every chunk records the first and last page it touches.
+    """
+    def __init__(self, chunker: Chunker):
+        self.c = chunker
+        self._buf = ''
+        self._base = 0  # global offset of _buf[0]
+        self._total = 0  # global length fed so far
+        self._started = False
+        self._page_starts: List[int] = []  # global start offset of each fed page still referenced
+        self._page_nums: List[Optional[int]] = []
+        # fixed strategy: next window start
+        self._pos = 0
+        # sentence strategies: start of the sentence still being read, and the open group
+        self._sent_start = 0
+        self._scanned = 0
+        self._group: Optional[List[int]] = None  # [start, end]
+
+    # ---------------- feeding ----------------
+    def feed(self, text: str, page: Optional[int] = None) -> List[TextChunk]:
+        if self._started:
+            self._append('\n')
+        self._started = True
+        self._page_starts.append(self._total)
+        self._page_nums.append(page)
+        self._append(text)
+        out: List[TextChunk] = []
+        if self.c.strategy == 'fixed':
+            self._fixed(out, final=False)
+        else:
+            self._sentences(out, final=False)
+        self._trim()
+        return out
+
+    def flush(self) -> List[TextChunk]:
+        out: List[TextChunk] = []
+        if self.c.strategy == 'fixed':
+            self._fixed(out, final=True)
         else:
-            # fallback to fixed
-            return list(self._fixed(text))
-
-    def _fixed(self, text: str) -> Iterable[TextChunk]:
-        start = 0
-        n = len(text)
-        while start < n:
-            end = min(start + self.chunk_size, n)
-            yield TextChunk(text=text[start:end], start=start, end=end)
-            if end == n:
+            self._sentences(out, final=True)
+            if self._group is not None:
+                self._emit_group(out, *self._group)
+                self._group = None
+        self._trim()
+        return out
+
+    def _append(self, s: str):
+        self._buf += s
+        self._total += len(s)
+
+    # ---------------- strategies ----------------
+    def _fixed(self, out: List[TextChunk], final: bool):
+        size = self.c.chunk_size
+        step = max(1, size - self.c.overlap)
+        while self._pos < self._total:
+            end = min(self._pos + size, self._total)
+            if end == self._total and not final:
+                break  # window may still grow with the next page
+            out.append(self._make(self._pos, end))
+            if end == self._total:
+                self._pos = end
                 break
-            start = end - self.overlap
-            if start < 0:
-                start = 0
-
-    def _split_sentences(self, text: str) -> List[str]:
-        # naive sentence splitting
-        parts = self.sentence_regex.split(text)
-        # reintroduce delimiters is skipped for simplicity; acceptable for grouping
-        return [p.strip() for p in parts if p.strip()]
-
-    def _sentence_group(self, text: str) -> Iterable[TextChunk]:
-        sentences = self._split_sentences(text)
-        buf: List[str] = []
-        buf_len = 0
-        cursor = 0
-        for s in sentences:
-            if not buf:
-                chunk_start = text.find(s, cursor)
-            tentative_len = buf_len + (1 if buf else 0) + len(s)
-            if tentative_len > self.chunk_size and buf:
-                chunk_text = ' '.join(buf)
-                chunk_end = chunk_start + len(chunk_text)
-                yield TextChunk(text=chunk_text, start=chunk_start, end=chunk_end)
-                buf = [s]
-                buf_len = len(s)
-                cursor = chunk_end
-                chunk_start = text.find(s, cursor)
-            else:
-                buf.append(s)
-                buf_len += (1 if buf_len>0 else 0) + len(s)
-        if buf:
-            chunk_text = ' '.join(buf)
-            chunk_end = chunk_start + len(chunk_text)
-            yield TextChunk(text=chunk_text, start=chunk_start, end=chunk_end)
-
-    def _recursive(self, text: str) -> Iterable[TextChunk]:
-        # Start with sentence groups up to max_chunk_size; if a sentence itself exceeds, fallback to fixed split inside
-        for group in self._sentence_group(text):
-            if len(group.text) <= self.max_chunk_size:
-                yield group
-            else:
-                # fall back to fixed splitting inside this group.text
-                for sub in self._fixed(group.text):
-                    # adjust offsets relative to original text
-                    yield TextChunk(text=sub.text, start=group.start + sub.start, end=group.start + sub.end)
+            self._pos += step
+
+    def _sentences(self, out: List[TextChunk], final: bool):
+        regex = self.c.sentence_regex
+        # text before _scanned held no boundary last time; rescan only a small margin of it
+        scan_from = max(self._sent_start, self._scanned - _RESCAN_MARGIN) - self._base
+        for m in regex.finditer(self._buf, scan_from):
+            if m.end() == len(self._buf) and not final:
+                break  # delimiter touches the end; the next page may extend it
+            self._add_sentence(out, self._sent_start, self._base + m.start())
+            self._sent_start = self._base + m.end()
+        self._scanned = self._total
+        if final:
+            self._add_sentence(out, self._sent_start, self._total)
+            self._sent_start = self._total
+
+    def _add_sentence(self, out: List[TextChunk], start: int, end: int):
+        # trim surrounding whitespace without copying the sentence
+        buf, base = self._buf, self._base
+        while start < end and buf[start - base].isspace():
+            start += 1
+        while end > start and buf[end - base - 1].isspace():
+            end -= 1
+        if start >= end:
+            return
+        if self._group is not None and end - self._group[0] > self.c.chunk_size:
+            self._emit_group(out, *self._group)
+            self._group = None
+        if self._group is None:
+            self._group = [start, end]
+        else:
+            self._group[1] = end
+
+    def _emit_group(self, out: List[TextChunk], start: int, end: int):
+        if self.c.strategy == 'recursive' and end - start > self.c.max_chunk_size:
+            # oversize group (a single long sentence): fixed windows inside it
+            size = self.c.chunk_size
+            step = max(1, size - self.c.overlap)
+            pos = start
+            while True:
+                w_end = min(pos + size, end)
+                out.append(self._make(pos, w_end))
+                if w_end == end:
+                    break
+                pos += step
+            return
+        out.append(self._make(start, end))
+
+    # ---------------- bookkeeping ----------------
+    def _make(self, start: int, end: int) -> TextChunk:
+        text = self._buf[start - self._base:end - self._base]
+        return TextChunk(text=text, start=start, end=end,
+                         page_start=self._page_at(start), page_end=self._page_at(max(start, end - 1)))
+
+    def _page_at(self, offset: int) -> Optional[int]:
+        i = bisect_right(self._page_starts, offset) - 1
+        return self._page_nums[i] if i >= 0 else None
+
+    def _trim(self):
+        """Drop buffered text (and page marks) that no open chunk can reference."""
+        if self.c.strategy == 'fixed':
+            keep = self._pos
+        else:
+            keep = self._group[0] if self._group is not None else self._sent_start
+        keep = min(keep, self._total)
+        if keep > self._base:
+            self._buf = self._buf[keep - self._base:]
+            self._base = keep
+        # keep the page containing `keep` and everything after it
+        i = bisect_right(self._page_starts, keep) - 1
+        if i > 0:
+            del self._page_starts[:i]
+            del self._page_nums[:i]
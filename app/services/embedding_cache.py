@@ -0,0 +1,138 @@
+import os
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.core.config import get_settings
+from app.core.hashing import text_sha256
+
+settings = get_settings()
+
+
+class EmbeddingCache:
+    """On-disk content-addressed embedding cache (SQLite).
+
+    Rows are keyed by (model, dim, sha256(text)) and store the float32 vector
+    as a blob. `dim` is the requested output dimension (0 = model default).
+    When the row count exceeds `max_entries` the least recently used rows are
+    evicted down to ~90% of the bound.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_entries: Optional[int] = None):
+        self.path = path or os.path.join(settings.persist_dir, 'embedding_cache.sqlite')
+        self.max_entries = max_entries if max_entries is not None else settings.embedding_cache_max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS embeddings ('
+            ' model TEXT NOT NULL, dim INTEGER NOT NULL, text_hash TEXT NOT NULL,'
+            ' vec BLOB NOT NULL, last_used REAL NOT NULL,'
+            ' PRIMARY KEY (model, dim, text_hash))'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)')
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._count = self._conn.execute('SELECT COUNT(*) FROM embeddings').fetchone()[0]
+
+    def get_many(self, model: str, dim: int, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        hashes = [text_sha256(t) for t in texts]
+        found: Dict[str, np.ndarray] = {}
+        unique = list(dict.fromkeys(hashes))
+        with self._lock:
+            # stay below SQLite's bound-parameter limit
+            for i in range(0, len(unique), 500):
+                part = unique[i:i+500]
+                marks = ','.join('?' * len(part))
+                rows = self._conn.execute(
+                    f'SELECT text_hash, vec FROM embeddings WHERE model=? AND dim=? AND text_hash IN ({marks})',
+                    (model, dim, *part)
+                ).fetchall()
+                for h, blob in rows:
+                    found[h] = np.frombuffer(blob, dtype=np.float32).copy()
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    'UPDATE embeddings SET last_used=? WHERE model=? AND dim=? AND text_hash=?',
+                    [(now, model, dim, h) for h in found]
+                )
+                self._conn.commit()
+            out = [found.get(h) for h in hashes]
+            hit = sum(1 for v in out if v is not None)
+            self.hits += hit
+            self.misses += len(out) - hit
+        return out
+
+    def put_many(self, model: str, dim: int, texts: Sequence[str], vectors: Sequence[Sequence[float]]):
+        if not texts:
+            return
+        now = time.time()
+        rows = [
+            (model, dim, text_sha256(t), np.asarray(v, dtype=np.float32).tobytes(), now)
+            for t, v in zip(texts, vectors)
+        ]
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                'INSERT OR IGNORE INTO embeddings (model, dim, text_hash, vec, last_used) VALUES (?, ?, ?, ?, ?)',
+                rows
+            )
+            self._count += self._conn.total_changes - before
+            self._conn.commit()
+            if self.max_entries and self._count > self.max_entries:
+                self._evict()
+
+    def _evict(self):
+        # the running count only sees this connection's inserts (other workers share the file): recount first
+        self._count = self._conn.execute('SELECT COUNT(*) FROM embeddings').fetchone()[0]
+        excess = self._count - int(self.max_entries * 0.9)
+        if excess <= 0:
+            return
+        cur = self._conn.execute(
+            'DELETE FROM embeddings WHERE rowid IN (SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)',
+            (excess,)
+        )
+        self._conn.commit()
+        removed = max(cur.rowcount, 0)
+        self.evictions += removed
+        self._count -= removed
+        if settings.rag_debug:
+            print(f"[EMB_CACHE] evicted={removed} size={self._count}")
+
+    def get_or_compute(self, model: str, dim: int, texts: Sequence[str],
+                       compute: Callable[[List[str]], Sequence[Sequence[float]]]) -> List[np.ndarray]:
+        """Return vectors for texts, calling compute() only for the (de-duplicated) misses."""
+        cached = self.get_many(model, dim, texts)
+        missing = list(dict.fromkeys(t for t, v in zip(texts, cached) if v is None))
+        if missing:
+            computed = compute(missing)
+            self.put_many(model, dim, missing, computed)
+            by_text = {t: np.asarray(v, dtype=np.float32) for t, v in zip(missing, computed)}
+            cached = [v if v is not None else by_text[t] for t, v in zip(texts, cached)]
+        return cached
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            'entries': self._count,
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': (self.hits / total) if total else 0.0,
+        }
+
+
+@lru_cache()
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """Process-wide shared cache, or None when disabled in settings."""
+    if not settings.embedding_cache_enabled:
+        return None
+    return EmbeddingCache()
@@ -0,0 +1,152 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence
+
+from app.core.config import get_settings
+
+try:
+    import tiktoken
+except ImportError:  # optional: fall back to a chars/4 estimate
+    tiktoken = None
+
+settings = get_settings()
+
+_RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    code = getattr(exc, 'status_code', None)
+    if code is None and getattr(exc, 'response', None) is not None:
+        code = getattr(exc.response, 'status_code', None)
+    return code
+
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    response = getattr(exc, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    try:
+        value = headers.get('retry-after')
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """429 / 5xx / timeouts / connection drops are retried; other client errors are not."""
+    code = _status_code(exc)
+    if code is not None:
+        return code in _RETRYABLE_STATUS
+    name = type(exc).__name__
+    return isinstance(exc, (TimeoutError, ConnectionError)) or name in ('APIConnectionError', 'APITimeoutError', 'RateLimitError')
+
+
+class EmbeddingScheduler:
+    """Packs texts into token-budgeted requests and runs them with bounded concurrency.
+
+    One scheduler is shared per process so max_in_flight caps concurrent
+    embedding requests across ingestion and query callers. Failed requests
+    are retried with full-jitter exponential backoff (honouring Retry-After).
+    """
+
+    def __init__(self, embed_batch: Callable[[List[str]], Sequence[Sequence[float]]],
+                 max_batch_tokens: Optional[int] = None, max_batch_items: Optional[int] = None,
+                 max_in_flight: Optional[int] = None, max_retries: Optional[int] = None,
+                 backoff_base: Optional[float] = None, backoff_max: Optional[float] = None):
+        self.embed_batch = embed_batch
+        self.max_batch_tokens = max_batch_tokens or settings.embedding_max_batch_tokens
+        self.max_batch_items = max_batch_items or settings.embedding_max_batch_items
+        self.max_in_flight = max_in_flight or settings.embedding_max_in_flight
+        self.max_retries = settings.embedding_max_retries if max_retries is None else max_retries
+        self.backoff_base = settings.embedding_backoff_base if backoff_base is None else backoff_base
+        self.backoff_max = settings.embedding_backoff_max if backoff_max is None else backoff_max
+        self._pool = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix='embed')
+        self._encoder = None
+        if tiktoken is not None:
+            try:
+                self._encoder = tiktoken.encoding_for_model(settings.embedding_model)
+            except Exception:
+                self._encoder = None
+        self._lock = threading.Lock()
+        self._stats = {'requests': 0, 'texts': 0, 'tokens': 0, 'retries': 0, 'rate_limited': 0, 'failures': 0, 'busy_seconds': 0.0}
+
+    def count_tokens(self, text: str) -> int:
+        if self._encoder is not None:
+            return len(self._encoder.encode(text, disallowed_special=()))
+        return len(text) // 4 + 1
+
+    def pack(self, texts: Sequence[str]) -> List[List[int]]:
+        """Greedy in-order packing of text indices under the token and item budgets."""
+        batches: List[List[int]] = []
+        current: List[int] = []
+        tokens = 0
+        for i, t in enumerate(texts):
+            n = self.count_tokens(t)
+            if current and (tokens + n > self.max_batch_tokens or len(current) >= self.max_batch_items):
+                batches.append(current)
+                current, tokens = [], 0
+            current.append(i)
+            tokens += n
+        if current:
+            batches.append(current)
+        return batches
+
+    def embed(self, texts: Sequence[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        t0 = time.time()
+        batches = self.pack(texts)
+        futures = [self._pool.submit(self._run_with_retry, [texts[i] for i in b]) for b in batches]
+        out: List[Optional[Sequence[float]]] = [None] * len(texts)
+        for b, fut in zip(batches, futures):
+            for i, vec in zip(b, fut.result()):
+                out[i] = vec
+        if settings.rag_debug:
+            dt = time.time() - t0
+            print(f"[EMB] texts={len(texts)} requests={len(batches)} elapsed={dt:.3f}s texts_per_s={len(texts) / dt if dt else 0.0:.1f}")
+        return out
+
+    def _run_with_retry(self, batch: List[str]) -> Sequence[Sequence[float]]:
+        n_tokens = sum(self.count_tokens(t) for t in batch)
+        attempt = 0
+        while True:
+            t0 = time.time()
+            try:
+                vecs = self.embed_batch(batch)
+                if len(vecs) != len(batch):
+                    raise ValueError(f"embedding response size {len(vecs)} != request size {len(batch)}")
+            except Exception as e:
+                with self._lock:
+                    self._stats['busy_seconds'] += time.time() - t0
+                    if _status_code(e) == 429:
+                        self._stats['rate_limited'] += 1
+                if attempt >= self.max_retries or not is_retryable(e):
+                    with self._lock:
+                        self._stats['failures'] += 1
+                    raise
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+                delay = max(delay, _retry_after(e) or 0.0)
+                attempt += 1
+                with self._lock:
+                    self._stats['retries'] += 1
+                if settings.rag_debug:
+                    print(f"[EMB] retry attempt={attempt} status={_status_code(e)} sleep={delay:.2f}s error={type(e).__name__}")
+                time.sleep(delay)
+                continue
+            with self._lock:
+                self._stats['busy_seconds'] += time.time() - t0
+                self._stats['requests'] += 1
+                self._stats['texts'] += len(batch)
+                self._stats['tokens'] += n_tokens
+            return vecs
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            s = dict(self._stats)
+        busy = s['busy_seconds']
+        # throughput per request-second; with N in flight wall-clock throughput is up to N x this
+        s['texts_per_request_second'] = s['texts'] / busy if busy else 0.0
+        s['tokens_per_request_second'] = s['tokens'] / busy if busy else 0.0
+        s['max_in_flight'] = self.max_in_flight
+        return s
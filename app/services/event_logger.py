@@ -13,6 +13,7 @@ class EventLogger:
         self.job_id = job_id
         self.path = os.path.join(settings.events_dir, f"{job_id}.jsonl")
         self._buffer: List[str] = []
+        self._buffer_lock = threading.Lock()  # events may come from several ingest threads
         self._flush_every = settings.event_buffer_flush_events
         self._write_event('job_started', {})
 
@@ -23,17 +24,20 @@ class EventLogger:
             'data': payload
         }
         line = json.dumps(evt, ensure_ascii=False)
-        self._buffer.append(line)
-        if len(self._buffer) >= self._flush_every or event_type in ('error', 'job_finished'):
+        with self._buffer_lock:
+            self._buffer.append(line)
+            flush = len(self._buffer) >= self._flush_every or event_type in ('error', 'job_finished')
+        if flush:
             self._flush()
 
     def _flush(self):
-        if not self._buffer:
-            return
         with _lock:
+            with self._buffer_lock:
+                lines, self._buffer = self._buffer, []
+            if not lines:
+                return
             with open(self.path, 'a') as f:
-                f.write("\n".join(self._buffer) + "\n")
-        self._buffer.clear()
+                f.write("\n".join(lines) + "\n")
 
     def info(self, message: str, **kwargs):
         self._write_event('info', {'message': message, **kwargs})
@@ -0,0 +1,152 @@
+import os
+import re
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+# Bump whenever extraction output changes so stored filings are re-ingested (part of the ingest fingerprint).
+FILING_METADATA_VERSION = 1
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_REGISTRANT_RE = re.compile(r"([^\n]+?)\s*\n\s*\(\s*exact name of registrant", re.IGNORECASE)
+_FORM_RE = re.compile(r"\bFORM\s+(10-KT?|10-Q|20-F|40-F|8-K|6-K)\b", re.IGNORECASE)
+_PERIOD_RE = re.compile(
+    r"for\s+the\s+(fiscal\s+year|quarterly\s+period|year)\s+ended\s*:?\s*([A-Za-z]+\s+\d{1,2}\s*,?\s*((?:19|20)\d{2}))",
+    re.IGNORECASE)
+_YEAR_RE = re.compile(r"(?<!\d)((?:19|20)\d{2})(?!\d)")
+_TICKER_SECTION_RE = re.compile(r"section\s+12\s*\(\s*b\s*\)(.*?)(?:section\s+12\s*\(\s*g\s*\)|indicate\s+by\s+check)",
+                                re.IGNORECASE | re.DOTALL)
+_TICKER_LINE_RE = re.compile(r"^\s*([A-Z]{1,5}(?:\.[A-Z])?)\s*$", re.MULTILINE)
+_QUESTION_TICKER_RE = re.compile(r"\b([A-Z]{2,5}(?:\.[A-Z])?)\b")
+_QUESTION_FORM_RE = re.compile(r"\b(10-KT?|10-Q|20-F|40-F|8-K|6-K)\b|\b(annual|quarterly)\b", re.IGNORECASE)
+_NOT_TICKERS = {'LLC', 'NYSE', 'OR', 'THE', 'INC', 'AND', 'N', 'A'}
+# issuer name / filename tokens that do not identify a company
+_ISSUER_STOPWORDS = {'inc', 'corp', 'corporation', 'company', 'the', 'ltd', 'plc', 'llc', 'group', 'holding',
+                     'holdings', 'annual', 'report', 'form', 'filing', 'pdf', 'and', 'co'}
+
+
+def registrant_name(text: str) -> Optional[str]:
+    """Issuer name from a filing cover page ('<name>' above '(Exact name of registrant ...)')."""
+    m = _REGISTRANT_RE.search(text or '')
+    if not m:
+        return None
+    name = m.group(1).strip(' _\t')
+    return name or None
+
+
+def extract_filing_metadata(cover_text: str, filename: str) -> Dict[str, Any]:
+    """Issuer, form type, fiscal year / period end and tickers from a filing's first pages.
+
+    Falls back to the filename for the form type ('...10-k...') and the
+    fiscal year (first 19xx/20xx in it); fields that cannot be found are
+    None / empty.
+    """
+    text = cover_text or ''
+    stem = os.path.splitext(filename)[0]
+    form = _FORM_RE.search(text[:5000]) or _FORM_RE.search(stem.replace('_', '-'))
+    period = _PERIOD_RE.search(text)
+    fiscal_year = int(period.group(3)) if period else None
+    if fiscal_year is None:
+        m = _YEAR_RE.search(stem)
+        fiscal_year = int(m.group(1)) if m else None
+    tickers: List[str] = []
+    section = _TICKER_SECTION_RE.search(text)
+    if section:
+        for t in _TICKER_LINE_RE.findall(section.group(1)):
+            if t not in _NOT_TICKERS and t not in tickers:
+                tickers.append(t)
+    return {
+        'issuer': registrant_name(text),
+        'form_type': form.group(1).upper() if form else None,
+        'fiscal_year': fiscal_year,
+        'period_end': period.group(2).strip() if period else None,
+        'tickers': tickers,
+    }
+
+
+def issuer_keys(text: str) -> List[str]:
+    """Identifying lowercase words of an issuer name or filename stem."""
+    return sorted({w for w in _WORD_RE.findall((text or '').lower()) if len(w) >= 3 and w.isalpha() and w not in _ISSUER_STOPWORDS})
+
+
+def _prefix_words(words: Iterable[str], filename: str) -> Set[str]:
+    """Question words matching a filename key as a prefix either way ('google' ~ 'goog-10-k...')."""
+    keys = [k for k in issuer_keys(os.path.splitext(filename)[0]) if len(k) >= 4]
+    return {w for w in words if any(w.startswith(k) or (len(w) >= 4 and k.startswith(w)) for k in keys)}
+
+
+def match_issuers(question: str, filings: Iterable[Dict[str, Any]]) -> List[str]:
+    """Filenames of the filings whose issuer the question names.
+
+    Tickers must appear in upper case and registrant names as whole words;
+    only when neither matches are filenames ('goog-10-k...') tried as word
+    prefixes ('Google').
+    """
+    filings = list(filings)
+    words = set(_WORD_RE.findall(question.lower()))
+    tickers = set(_QUESTION_TICKER_RE.findall(question))
+    matched = [f['filename'] for f in filings
+               if tickers & set(f.get('tickers') or []) or words & set(issuer_keys(f.get('issuer') or ''))]
+    if matched:
+        return matched
+    return [f['filename'] for f in filings if _prefix_words(words, f['filename'])]
+
+
+def issuer_words(question: str, filings: Iterable[Dict[str, Any]]) -> Set[str]:
+    """Lowercase question words that name one of the filings' issuers (ticker, registrant word or filename prefix)."""
+    words = set(_WORD_RE.findall(question.lower()))
+    tickers = set(_QUESTION_TICKER_RE.findall(question))
+    out: Set[str] = set()
+    for f in filings:
+        out |= {w for t in tickers & set(f.get('tickers') or []) for w in _WORD_RE.findall(t.lower())}
+        out |= words & set(issuer_keys(f.get('issuer') or ''))
+        out |= _prefix_words(words, f['filename'])
+    return out
+
+
+def parse_constraints(question: str) -> Dict[str, Any]:
+    """Fiscal years and form types a question asks about."""
+    years = sorted({int(y) for y in _YEAR_RE.findall(question)})
+    forms = set()
+    for form, kind in _QUESTION_FORM_RE.findall(question):
+        if form:
+            forms.add(form.upper())
+        elif kind.lower() == 'annual':
+            forms.update({'10-K', '10-KT', '20-F', '40-F'})
+        else:
+            forms.add('10-Q')
+    return {'years': years, 'form_types': sorted(forms)}
+
+
+def resolve_filings(question: str, filings: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Filings a question is constrained to by issuer, fiscal year and form type.
+
+    A figure for year Y is reported in that year's filing and repeated as
+    comparatives in the next two, so Y keeps filings for fiscal years
+    Y..Y+2, preferring exact years when there are any. Each constraint is
+    only applied when something survives it. Returns {'issuers', 'years',
+    'form_types', 'files'}; files is None when nothing constrains the question.
+    """
+    c = parse_constraints(question)
+    out: Dict[str, Any] = {'issuers': [], 'years': [], 'form_types': [], 'files': None}
+    scope = filings
+    constrained = False
+    by_name = {f['filename']: f for f in filings}
+    named = match_issuers(question, filings)
+    if named:
+        scope = [by_name[n] for n in named]
+        out['issuers'] = sorted({by_name[n].get('issuer') or n for n in named})
+        constrained = True
+    if c['form_types']:
+        kept = [f for f in scope if f.get('form_type') in c['form_types']]
+        if kept:
+            scope, out['form_types'], constrained = kept, c['form_types'], True
+    if c['years']:
+        exact = [f for f in scope if f.get('fiscal_year') in c['years']]
+        later = [f for f in scope if f.get('fiscal_year') and any(y < f['fiscal_year'] <= y + 2 for y in c['years'])]
+        # an exact filing per year wins; years without one fall back to the later filings repeating them
+        covered = {f['fiscal_year'] for f in exact}
+        kept = exact + [f for f in later if any(y not in covered and y < f['fiscal_year'] <= y + 2 for y in c['years'])]
+        if kept:
+            scope, out['years'], constrained = kept, c['years'], True
+    if constrained:
+        out['files'] = sorted({f['filename'] for f in scope})
+    return out
@@ -0,0 +1,181 @@
+import os
+import queue
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.config import get_settings
+from app.services.event_logger import EventLogger
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # optional: fall back to polling the directory
+    FileSystemEventHandler = object
+    Observer = None
+
+settings = get_settings()
+
+
+def _stat_sig(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_size, st.st_mtime_ns)
+
+
+class _Handler(FileSystemEventHandler):
+    def __init__(self, watcher: 'InboxWatcher'):
+        self.watcher = watcher
+
+    def on_any_event(self, event):
+        if event.is_directory:
+            return
+        for path in (event.src_path, getattr(event, 'dest_path', '')):
+            if path:
+                self.watcher.notify(os.fsdecode(path))
+
+
+class InboxWatcher:
+    """Background watcher feeding inbox changes into an ingestion queue.
+
+    Uses watchdog (inotify on Linux) when installed, otherwise polls the
+    directory every watch_poll_interval seconds. A file is queued only after
+    its size and mtime stayed unchanged for watch_debounce_seconds, so copies
+    in progress are not parsed half-written. A single worker thread drains the
+    queue through MainStore.sync_file (ingest, skip unchanged, or delete),
+    holding MainStore.ingest_lock so it never races an endpoint write.
+    """
+
+    def __init__(self, store, watch_dir: Optional[str] = None):
+        self.store = store
+        self.watch_dir = watch_dir or settings.watch_dir
+        self.debounce = settings.watch_debounce_seconds
+        self.poll_interval = settings.watch_poll_interval
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Tuple[float, Optional[Tuple[int, int]]]] = {}  # name -> (last change, stat)
+        self._queue: "queue.Queue[str]" = queue.Queue()
+        self._stop = threading.Event()
+        self._observer = None
+        self._threads = []
+        self.stats: Dict[str, Any] = {'mode': None, 'events': 0, 'ingested': 0, 'deleted': 0, 'skipped': 0,
+                                      'failed': 0, 'queued': 0, 'last_job_id': None}
+
+    def start(self):
+        os.makedirs(self.watch_dir, exist_ok=True)
+        # reconcile once: files added or removed while the server was down (unchanged ones skip on a stat match)
+        for name in set(self._snapshot()) | set(self.store.manifest.filenames()):
+            self.notify(os.path.join(self.watch_dir, name))
+        mode = 'polling'
+        if Observer is not None:
+            try:
+                self._observer = Observer()
+                self._observer.schedule(_Handler(self), self.watch_dir, recursive=False)
+                self._observer.start()
+                mode = 'inotify'
+            except Exception as e:
+                print(f"[WATCH] native watcher unavailable, polling instead: {e}")
+                self._observer = None
+        self.stats['mode'] = mode
+        loops = [self._debounce_loop, self._ingest_loop] + ([self._poll_loop] if mode == 'polling' else [])
+        for target in loops:
+            t = threading.Thread(target=target, daemon=True)
+            t.start()
+            self._threads.append(t)
+        print(f"[WATCH] watching dir={self.watch_dir} mode={mode} debounce={self.debounce}s")
+
+    def stop(self):
+        self._stop.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+        for t in self._threads:
+            t.join(timeout=5)
+
+    def notify(self, path: str):
+        """Record a change to path; it is queued once it has been stable for the debounce window."""
+        name = os.path.basename(path)
+        if not name.lower().endswith('.pdf') or os.path.dirname(os.path.abspath(path)) != os.path.abspath(self.watch_dir):
+            return
+        with self._lock:
+            self._pending[name] = (time.time(), _stat_sig(path))
+            self.stats['events'] += 1
+
+    def _snapshot(self) -> Dict[str, Tuple[int, int]]:
+        out = {}
+        try:
+            entries = list(os.scandir(self.watch_dir))
+        except FileNotFoundError:
+            return out
+        for e in entries:
+            if e.is_file() and e.name.lower().endswith('.pdf'):
+                st = e.stat()
+                out[e.name] = (st.st_size, st.st_mtime_ns)
+        return out
+
+    def _poll_loop(self):
+        seen = self._snapshot()
+        while not self._stop.wait(self.poll_interval):
+            current = self._snapshot()
+            for name in set(seen) | set(current):
+                if seen.get(name) != current.get(name):
+                    self.notify(os.path.join(self.watch_dir, name))
+            seen = current
+
+    def _debounce_loop(self):
+        tick = max(0.05, min(0.5, self.debounce / 2))
+        while not self._stop.wait(tick):
+            now = time.time()
+            ready = []
+            with self._lock:
+                for name, (changed, sig) in list(self._pending.items()):
+                    current = _stat_sig(os.path.join(self.watch_dir, name))
+                    if current != sig:
+                        self._pending[name] = (now, current)  # still being written
+                    elif now - changed >= self.debounce:
+                        del self._pending[name]
+                        ready.append(name)
+            for name in ready:
+                self._queue.put(name)
+                self.stats['queued'] += 1
+
+    def _acquire_ingest(self) -> bool:
+        """Wait for the store's ingest lock unless stopped first (a stopped watcher's files are reconciled on the next start)."""
+        while not self._stop.is_set():
+            if self.store.ingest_lock.acquire(timeout=0.5):
+                return True
+        return False
+
+    def _ingest_loop(self):
+        while not self._stop.is_set():
+            try:
+                name = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if not self._acquire_ingest():
+                break  # stopped while an endpoint write or a generation swap held the lock
+            job_id = f"watch-{uuid.uuid4()}"
+            logger = EventLogger(job_id)
+            try:
+                result = self.store.sync_file(os.path.join(self.watch_dir, name), logger=logger)
+            except Exception as e:
+                self.stats['failed'] += 1
+                self.stats['last_job_id'] = job_id
+                logger.error('watch_ingest_failed', filename=name, error=str(e))
+                print(f"[WATCH] failed file={name}: {e}")
+                continue
+            finally:
+                self.store.ingest_lock.release()
+            status = result['status']
+            if status in ('ingested', 'deleted'):
+                self.stats[status] += 1
+                self.stats['last_job_id'] = job_id
+                if status == 'deleted':
+                    logger.done(**result)
+                print(f"[WATCH] {status} file={name} job={job_id}")
+            else:
+                self.stats['skipped'] += 1
+                if settings.parse_debug:
+                    print(f"[WATCH] {status} file={name} reason={result.get('reason')}")
@@ -1,11 +1,14 @@
 import os
 import json
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import numpy as np
 import hashlib
 import time
+from functools import lru_cache
 
 from app.core.config import get_settings
+from app.services.embedding_cache import get_embedding_cache
+from app.services.embedding_scheduler import EmbeddingScheduler
 
 try:
     from openai import OpenAI
@@ -14,11 +17,66 @@ except ImportError:  # placeholder if openai not installed yet
 
 settings = get_settings()
 
+# native output width of known embedding models; other widths are requested via `dimensions`
+_NATIVE_DIMS = {'text-embedding-3-small': 1536, 'text-embedding-3-large': 3072, 'text-embedding-ada-002': 1536}
+
+
+def requested_dimensions(model: Optional[str] = None, dim: Optional[int] = None) -> int:
+    """`dimensions` sent with embedding requests (0 = model default, also the embedding cache key)."""
+    model = model or settings.embedding_model
+    dim = dim or settings.embedding_dim
+    native = _NATIVE_DIMS.get(model)
+    return 0 if native in (None, dim) else dim
+
+
+def embeddings_are_fake() -> bool:
+    """True when no OpenAI client can be built and embeddings fall back to hashed pseudo vectors."""
+    return OpenAI is None or not settings.openai_api_key
+
+
+def get_embedding_scheduler(model: Optional[str] = None, dim: Optional[int] = None) -> Optional[EmbeddingScheduler]:
+    """Process-wide scheduler per (model, width) so the in-flight limit covers every embedding caller."""
+    model = model or settings.embedding_model
+    return _scheduler(model, requested_dimensions(model, dim))
+
+
+@lru_cache()
+def _scheduler(model: str, dims: int) -> Optional[EmbeddingScheduler]:
+    if OpenAI is None or not settings.openai_api_key:
+        return None
+    # retries are owned by the scheduler (jittered backoff shared across requests)
+    client = OpenAI(api_key=settings.openai_api_key, base_url=settings.openai_base_url or None,
+                    max_retries=0, timeout=settings.embedding_request_timeout)
+
+    extra = {'dimensions': dims} if dims else {}
+
+    def embed_batch(texts: List[str]) -> List[np.ndarray]:
+        resp = client.embeddings.create(model=model, input=texts, **extra)
+        data = sorted(resp.data, key=lambda d: d.index)
+        return [np.array(d.embedding, dtype=np.float32) for d in data]
+
+    return EmbeddingScheduler(embed_batch)
+
+
+_fake_warned = False
+
+
+def _warn_fake_embeddings():
+    global _fake_warned
+    if not _fake_warned:
+        _fake_warned = True
+        print("[EMBED] WARNING no OPENAI_API_KEY (or openai not installed): using pseudo embeddings; "
+              "files ingested now are re-ingested once a key is configured")
+
+
 class OpenAIClient:
-    def __init__(self):
+    def __init__(self, embedding_model: Optional[str] = None, embedding_dim: Optional[int] = None):
+        # an index generation built with another model keeps embedding its queries with that model
+        self.embedding_model = embedding_model or settings.embedding_model
+        self.embedding_dim = embedding_dim or settings.embedding_dim
         self.api_key = settings.openai_api_key
         if OpenAI and self.api_key:
-            self.client = OpenAI(api_key=self.api_key)
+            self.client = OpenAI(api_key=self.api_key, base_url=settings.openai_base_url or None)
         else:
             self.client = None
 
@@ -26,15 +84,18 @@ class OpenAIClient:
         if not texts:
             return []
         if self.client is None:
-            # deterministic pseudo embedding fallback
+            # deterministic pseudo embedding fallback (marked in the ingest fingerprint, so it is re-ingested once a key is set)
+            _warn_fake_embeddings()
             return [self._fake_embed(t) for t in texts]
-        model = settings.embedding_model
-        # openai new python client embedding usage (adapt if needed)
-        resp = self.client.embeddings.create(model=model, input=texts)
-        out = []
-        for d in resp.data:
-            out.append(np.array(d.embedding, dtype=np.float32))
-        return out
+        cache = get_embedding_cache()
+        if cache is None:
+            return self._embed_remote(texts)
+        dims = requested_dimensions(self.embedding_model, self.embedding_dim)
+        return cache.get_or_compute(self.embedding_model, dims, texts, self._embed_remote)
+
+    def _embed_remote(self, texts: List[str]) -> List[np.ndarray]:
+        # token-budgeted batches, bounded concurrency and 429 backoff live in the scheduler
+        return get_embedding_scheduler(self.embedding_model, self.embedding_dim).embed(texts)
 
     def chat_json(self, system: str, user: str, schema_desc: str) -> Dict[str, Any]:
         prompt = f"You MUST respond ONLY with valid JSON. Schema: {schema_desc}. If unsure, output an empty JSON object matching schema keys.\nUser Query: {user}" 
@@ -106,4 +167,4 @@ class OpenAIClient:
         # simple hashing to stable vector
         h = hashlib.sha256(text.encode()).digest()
         rng = np.random.default_rng(int.from_bytes(h[:8], 'little'))
-        return rng.standard_normal(256).astype(np.float32)
+        return rng.standard_normal(self.embedding_dim).astype(np.float32)
@@ -0,0 +1,108 @@
+import gzip
+import json
+import os
+import re
+import time
+from typing import Iterator, List, Optional
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+_ENTRY_RE = re.compile(r"^[0-9a-f]{64}-v(\d+)-[ts]\.jsonl\.gz$")
+_TMP_MAX_AGE = 3600.0  # seconds; older temp files were left behind by a crashed parse
+
+
+class ParseCache:
+    """Persisted PDFLoader output (per-page text, block layout, raw table rows).
+
+    One gzip-compressed JSON-lines file per (file sha256, parser version,
+    table extraction flag), one line per page, so pages can be streamed back
+    without materializing the document. Chunking and embedding settings are
+    not part of the key: re-chunking experiments start from here.
+
+    An entry's mtime is its last use; collect() drops other parser versions
+    and, above parse_cache_max_mb, the least recently used entries (those of
+    deleted or replaced files age out this way).
+    """
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = root or os.path.join(settings.persist_dir, 'parse_cache')
+        os.makedirs(self.root, exist_ok=True)
+
+    def path_for(self, sha256: str, parser_version: int, extract_tables: bool) -> str:
+        mode = 't' if extract_tables else 's'
+        return os.path.join(self.root, f"{sha256}-v{parser_version}-{mode}.jsonl.gz")
+
+    def exists(self, path: str) -> bool:
+        return os.path.exists(path)
+
+    def read(self, path: str) -> Iterator[dict]:
+        try:
+            os.utime(path)  # mark as recently used
+        except OSError:
+            pass
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def writer(self, path: str) -> 'ParseCacheWriter':
+        return ParseCacheWriter(path)
+
+    def collect(self, parser_version: int, max_bytes: Optional[int] = None) -> List[str]:
+        """Remove entries of other parser versions, stale temp files and, above max_bytes, LRU entries down to ~90%."""
+        max_bytes = settings.parse_cache_max_mb * 1024 * 1024 if max_bytes is None else max_bytes
+        now = time.time()
+        removed, entries = [], []
+        for e in os.scandir(self.root):
+            try:
+                st = e.stat()
+            except OSError:
+                continue  # removed meanwhile (another process collecting)
+            m = _ENTRY_RE.match(e.name)
+            if e.name.endswith('.tmp'):
+                if now - st.st_mtime > _TMP_MAX_AGE:
+                    removed.append(e.path)
+            elif m and int(m.group(1)) != parser_version:
+                removed.append(e.path)
+            elif m:
+                entries.append((st.st_mtime, st.st_size, e.path))
+        total = sum(size for _, size, _ in entries)
+        if max_bytes > 0 and total > max_bytes:
+            for _, size, path in sorted(entries):
+                if total <= max_bytes * 0.9:
+                    break
+                removed.append(path)
+                total -= size
+        for path in removed:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        if removed and settings.parse_debug:
+            print(f"[PARSE] cache_collect removed={len(removed)} bytes={total}")
+        return removed
+
+
+class ParseCacheWriter:
+    """Writes pages to a temp file; commit() publishes atomically, discard() drops it."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._tmp = f"{path}.{os.getpid()}.tmp"
+        self._f = gzip.open(self._tmp, 'wt', encoding='utf-8', compresslevel=6)
+
+    def write(self, record: dict):
+        self._f.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + "\n")
+
+    def commit(self):
+        self._f.close()
+        os.replace(self._tmp, self.path)
+
+    def discard(self):
+        self._f.close()
+        try:
+            os.remove(self._tmp)
+        except OSError:
+            pass
@@ -1,10 +1,22 @@
 import fitz  # PyMuPDF
-from typing import List, Dict, Any, Iterable
-from dataclasses import dataclass
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
+from dataclasses import dataclass, field
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+import multiprocessing
+import os
+import pickle
 import re
+import tempfile
 import time
-from tqdm import tqdm
 from app.services.chunking import Chunker
+from app.services.parse_cache import ParseCache
+from app.core.hashing import file_sha256
+
+# Bump whenever page extraction output changes so stale parse-cache entries are ignored.
+PARSER_VERSION = 2
+_SCALE_RE = re.compile(r"\(\s*(?:dollars\s+|amounts\s+)?in\s+(thousands|millions|billions)", re.IGNORECASE)
 
 @dataclass
 class ParsedChunk:
@@ -19,6 +31,33 @@ class ParsedTable:
     raw: List[List[str]]
     metadata: Dict[str, Any]
 
+@dataclass
+class ParsedPage:
+    index: int
+    text: str
+    chunks: List[ParsedChunk] = field(default_factory=list)  # chunks that became final while reading this page
+    tables: List[ParsedTable] = field(default_factory=list)
+
+@dataclass
+class PageLayout:
+    """Single-pass extraction result for one page (picklable for worker processes)."""
+    index: int
+    text: str
+    blocks: List[Tuple[float, float, float, float, str]]  # x0, y0, x1, y1, text per text block
+    tables: List[List[List[str]]]  # column-aligned rows per detected table
+
+    def to_record(self) -> Dict[str, Any]:
+        return {
+            'i': self.index,
+            't': self.text,
+            'b': [[round(x0, 1), round(y0, 1), round(x1, 1), round(y1, 1), txt] for x0, y0, x1, y1, txt in self.blocks],
+            'tb': self.tables,
+        }
+
+    @classmethod
+    def from_record(cls, rec: Dict[str, Any]) -> 'PageLayout':
+        return cls(rec['i'], rec['t'], [tuple(b) for b in rec['b']], rec['tb'])
+
 class PDFLoader:
     def __init__(self, chunk_size: int, chunk_overlap: int):
         # legacy parameters retained; actual behavior controlled by settings + Chunker
@@ -34,113 +73,326 @@ class PDFLoader:
             sentence_regex=s.sentence_split_regex,
         )
 
+    def page_count(self, file_path: str) -> int:
+        with fitz.open(file_path) as doc:
+            return len(doc)
+
     def load(self, file_path: str) -> Dict[str, Any]:
-        from app.core.config import get_settings  # local import to avoid cycles
-        settings = get_settings()
-        doc = fitz.open(file_path)
+        """Parse a whole PDF into memory (full text, chunks, tables). See iter_pages for the streaming form."""
         full_text_pages: List[str] = []
         chunks: List[ParsedChunk] = []
         tables: List[ParsedTable] = []
+        for page in self.iter_pages(file_path):
+            full_text_pages.append(page.text)
+            chunks.extend(page.chunks)
+            tables.extend(page.tables)
+        return {'full_text': "\n".join(full_text_pages), 'chunks': chunks, 'tables': tables}
+
+    def iter_pages(self, file_path: str, workers: Optional[int] = None) -> Iterator[ParsedPage]:
+        """Yield pages in order as they are parsed.
+
+        Each ParsedPage carries the tables found on it and the chunks that were
+        completed once its text was appended; chunk offsets refer to
+        "\\n".join(page texts). The trailing chunk(s) are attached to the last page.
+        workers overrides settings.parse_workers (page-range process pool size).
+        """
+        from app.core.config import get_settings  # local import to avoid cycles
+        settings = get_settings()
         filename = file_path.split('/')[-1]
+        stream = self._chunker.stream()
+        chunk_counter = 0
+        table_counter = 0
+        n_chars = 0
 
-        start_time = time.time()
-        if settings.parse_debug:
-            print(f"[PARSE] file={filename} pages={len(doc)} simple={settings.simple_pdf_parser}")
-
-        # Fast path: just concatenate page text, skip block & table scans
-        if settings.simple_pdf_parser:
-            t_pages_start = time.time()
-            for page_index in range(len(doc)):
-                page = doc[page_index]
-                text = page.get_text("text")  # simplest text extraction
-                full_text_pages.append(text)
-            if settings.parse_debug:
-                print(f"[PARSE] collected_pages elapsed={time.time()-t_pages_start:.3f}s chars={sum(len(p) for p in full_text_pages)} hi")
-            full_text = "\n".join(full_text_pages)
-            # chunking
-            if settings.parse_debug:
-                print(f"[PARSE] collected_pages elapsed={time.time()-t_pages_start:.3f}s chars={sum(len(p) for p in full_text_pages)} hi")
-            t_chunk_start = time.time()
-            chunk_counter = 0
-            chunk_objs = self._chunker.chunk(full_text)
-            if settings.parse_debug:
-                print(f"[PARSE] strategy={settings.chunk_strategy} planned_chunks={len(chunk_objs)}")
-            for ch in tqdm(chunk_objs, desc="Chunking text", disable=not settings.parse_debug):
-                chunks.append(ParsedChunk(
+        def make_chunks(pieces) -> List[ParsedChunk]:
+            nonlocal chunk_counter
+            out = []
+            for ch in pieces:
+                out.append(ParsedChunk(
                     id=f"chunk-{chunk_counter}",
                     text=ch.text,
-                    metadata={
-                        'source_file': filename,
-                        'type': 'chunk',
-                        'char_start': ch.start,
-                        'char_end': ch.end,
-                    }
+                    metadata={'source_file': filename, 'type': 'chunk', 'char_start': ch.start, 'char_end': ch.end,
+                              'page_start': ch.page_start, 'page_end': ch.page_end}
                 ))
                 chunk_counter += 1
-            # optional table extraction disabled in fast mode unless explicitly enabled and flag on
-            if settings.enable_table_extraction and not settings.simple_pdf_parser:
-                pass  # unreachable branch, kept for clarity
-            if settings.parse_debug:
-                print(f"[PARSE] chunking elapsed={time.time()-t_chunk_start:.3f}s chunks={len(chunks)}")
-                print(f"[PARSE] done total_elapsed={time.time()-start_time:.3f}s")
-            return {'full_text': full_text, 'chunks': chunks, 'tables': tables}
+            return out
 
-        # Original (richer) path with naive table detection
-        table_counter = 0
-        chunk_counter = 0
-        t_pages_start = time.time()
-        for page_index in range(len(doc)):
-            page = doc[page_index]
-            text = page.get_text("text")
-            full_text_pages.append(text)
-            if settings.enable_table_extraction:
-                blocks = page.get_text("blocks")
-                for b in blocks:
-                    btext = b[4]
-                    if self._looks_like_table(btext):
-                        rows = self._table_rows(btext)
-                        if rows:
-                            header = rows[0]
-                            first_col = [r[0] for r in rows[1:]] if len(rows) > 1 and rows[0] else []
-                            rep = " | ".join(header) + " || " + " ; ".join(first_col[:15])
-                            tables.append(ParsedTable(
-                                id=f"table-{table_counter}",
-                                text=rep[:2000],
-                                raw=rows,
-                                metadata={'page': page_index, 'source_file': filename, 'type': 'table'}
-                            ))
-                            table_counter += 1
+        start_time = time.time()
+        n_pages = self.page_count(file_path)
+        workers = max(1, min(settings.parse_workers if workers is None else workers, n_pages))
+        extract_tables = settings.enable_table_extraction and not settings.simple_pdf_parser  # fast path skips block & table scans
         if settings.parse_debug:
-            print(f"[PARSE] pages+tables elapsed={time.time()-t_pages_start:.3f}s tables={len(tables)}")
-        full_text = "\n".join(full_text_pages)
-        t_chunk_start = time.time()
-        chunk_objs = self._chunker.chunk(full_text)
-        for ch in chunk_objs:
-            chunks.append(ParsedChunk(
-                id=f"chunk-{chunk_counter}",
-                text=ch.text,
-                metadata={'source_file': filename, 'type': 'chunk', 'char_start': ch.start, 'char_end': ch.end}
-            ))
-            chunk_counter += 1
+            print(f"[PARSE] file={filename} pages={n_pages} simple={settings.simple_pdf_parser} workers={workers}")
+        pending: Optional[ParsedPage] = None
+        for layout in self._raw_pages(file_path, n_pages, workers, extract_tables):
+            page_index, text = layout.index, layout.text
+            n_chars += len(text)
+            page_tables: List[ParsedTable] = []
+            for rows in layout.tables:
+                # ids assigned here, in page order, so they are identical for any worker count
+                page_tables.append(self._make_table(rows, table_counter, page_index, filename, text))
+                table_counter += 1
+            current = ParsedPage(index=page_index, text=text, chunks=make_chunks(stream.feed(text, page=page_index)), tables=page_tables)
+            # one page lookahead so the final flush can be attached to the last page
+            if pending is not None:
+                yield pending
+            pending = current
+        if pending is not None:
+            pending.chunks.extend(make_chunks(stream.flush()))
+            yield pending
         if settings.parse_debug:
-            print(f"[PARSE] chunking elapsed={time.time()-t_chunk_start:.3f}s chunks={len(chunks)} total_elapsed={time.time()-start_time:.3f}s")
-        return {'full_text': full_text, 'chunks': chunks, 'tables': tables}
+            print(f"[PARSE] done file={filename} strategy={settings.chunk_strategy} chars={n_chars} chunks={chunk_counter} tables={table_counter} total_elapsed={time.time()-start_time:.3f}s")
+
+    def _raw_pages(self, file_path: str, n_pages: int, workers: int, extract_tables: bool) -> Iterator[PageLayout]:
+        """Yield PageLayout records in page order, from the parse cache when possible."""
+        from app.core.config import get_settings
+        settings = get_settings()
+        if not settings.parse_cache_enabled:
+            yield from self._parse_pages(file_path, n_pages, workers, extract_tables)
+            return
+        cache = ParseCache()
+        path = cache.path_for(file_sha256(file_path), PARSER_VERSION, extract_tables)
+        if cache.exists(path):
+            if settings.parse_debug:
+                print(f"[PARSE] cache_hit path={path}")
+            for rec in cache.read(path):
+                yield PageLayout.from_record(rec)
+            return
+        writer = cache.writer(path)
+        complete = False
+        try:
+            for layout in self._parse_pages(file_path, n_pages, workers, extract_tables):
+                writer.write(layout.to_record())
+                yield layout
+            complete = True
+        finally:
+            # an abandoned or failed parse must not leave a truncated cache entry
+            if complete:
+                writer.commit()
+                cache.collect(PARSER_VERSION)
+            else:
+                writer.discard()
+
+    def _parse_pages(self, file_path: str, n_pages: int, workers: int, extract_tables: bool) -> Iterator[PageLayout]:
+        """Yield PageLayout records in page order, serially or from a process pool."""
+        if workers <= 1:
+            yield from _iter_page_range(file_path, 0, n_pages, extract_tables)
+            return
+        from app.core.config import get_settings
+        step = max(1, get_settings().parse_pages_per_task)
+        ranges = iter([(s, min(s + step, n_pages)) for s in range(0, n_pages, step)])
+        # spawn: fitz is not fork-safe once the parent has opened documents
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            # at most workers * 2 ranges in flight, so a slow consumer bounds the parsed pages held in memory;
+            # the window is consumed from the left, so pages stay ordered while later ranges parse
+            window: deque = deque()
+            try:
+                for a, b in itertools.islice(ranges, workers * 2):
+                    window.append(pool.submit(_parse_page_range, file_path, a, b, extract_tables))
+                while window:
+                    part = window.popleft().result()
+                    for a, b in itertools.islice(ranges, 1):
+                        window.append(pool.submit(_parse_page_range, file_path, a, b, extract_tables))
+                    yield from part
+            finally:
+                # an abandoned or failed parse does not wait for the ranges still queued
+                for fut in window:
+                    fut.cancel()
+
+    def _make_table(self, rows: List[List[str]], table_index: int, page_index: int, filename: str, page_text: str = '') -> ParsedTable:
+        header = rows[0]
+        first_col = [r[0] for r in rows[1:]] if len(rows) > 1 and rows[0] else []
+        rep = " | ".join(header) + " || " + " ; ".join(first_col[:15])
+        # scale note ("in millions, except per share amounts") from the table itself, else from its page
+        scale = _SCALE_RE.search(" ".join(" ".join(r) for r in rows)) or _SCALE_RE.search(page_text)
+        return ParsedTable(
+            id=f"table-{table_index}",
+            text=rep[:2000],
+            raw=rows,
+            metadata={'page': page_index, 'source_file': filename, 'type': 'table',
+                      'unit': scale.group(1).lower() if scale else ''}
+        )
 
     # _chunk_iter removed in favor of Chunker class
 
-    def _looks_like_table(self, text: str) -> bool:
-        lines = [l for l in text.splitlines() if l.strip()]
-        if len(lines) < 2:
-            return False
-        pattern = re.compile(r"\S+\s{2,}\S+\s{2,}\S+")
-        hits = sum(1 for ln in lines if pattern.search(ln))
-        return hits >= 2
-
-    def _table_rows(self, text: str) -> List[List[str]]:
-        rows = []
-        for line in text.splitlines():
-            if not line.strip():
-                continue
-            cols = re.split(r"\s{2,}", line.strip())
-            rows.append(cols)
-        return rows
+
+# Parsing entry points live at module level so ProcessPoolExecutor workers can pickle them.
+def spool_file(file_path: str, chunk_size: int, chunk_overlap: int) -> Dict[str, Any]:
+    """Parse a whole file in one worker process (file-level parallelism, see MainStore.scan_folder).
+
+    Pages are pickled one after another into a temp file instead of being
+    returned, so the parent streams them back with read_spool and never
+    holds a whole parsed file. Returns {'spool', 'pages', 'chunks', 'tables'}.
+    """
+    fd, spool = tempfile.mkstemp(prefix='parsed-', suffix='.pages')
+    counts = {'pages': 0, 'chunks': 0, 'tables': 0}
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for page in PDFLoader(chunk_size, chunk_overlap).iter_pages(file_path, workers=1):
+                pickle.dump(page, f, protocol=pickle.HIGHEST_PROTOCOL)
+                counts['pages'] += 1
+                counts['chunks'] += len(page.chunks)
+                counts['tables'] += len(page.tables)
+    except BaseException:
+        os.remove(spool)
+        raise
+    return {'spool': spool, **counts}
+
+
+def read_spool(spool: str) -> Iterator[ParsedPage]:
+    """Stream the pages written by spool_file, one at a time."""
+    with open(spool, 'rb') as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+
+def _iter_page_range(file_path: str, start: int, end: int, extract_tables: bool) -> Iterator[PageLayout]:
+    with fitz.open(file_path) as doc:
+        for page_index in range(start, end):
+            yield _extract_page(doc[page_index], page_index, extract_tables)
+
+def _parse_page_range(file_path: str, start: int, end: int, extract_tables: bool) -> List[PageLayout]:
+    """Parse pages [start, end) of a PDF; each worker opens the document itself."""
+    return list(_iter_page_range(file_path, start, end, extract_tables))
+
+# ---------------- Layout-aware extraction ----------------
+_DICT_FLAGS = fitz.TEXTFLAGS_DICT & ~fitz.TEXT_PRESERVE_IMAGES
+_TOKEN_RE = re.compile(r"\S+")
+_AMOUNT_RE = re.compile(r"^(\(?[-–—]?[$€£¥]?\d[\d,]*(\.\d+)?\)?%?|[-–—])$")  # a lone dash is a nil amount
+_CURRENCY = {'$', '€', '£', '¥'}
+_ATTACH = {')', '%', ')%', '%)'}
+
+@dataclass
+class _Cell:
+    x0: float
+    x1: float
+    y: float  # baseline
+    size: float
+    text: str
+
+def _extract_page(page, page_index: int, extract_tables: bool) -> PageLayout:
+    """One text-extraction call per page producing text, block geometry and table candidates."""
+    if not extract_tables:
+        return PageLayout(page_index, page.get_text("text"), [], [])
+    layout = page.get_text("dict", flags=_DICT_FLAGS)
+    lines: List[str] = []
+    blocks: List[Tuple[float, float, float, float, str]] = []
+    cells: List[_Cell] = []
+    for block in layout['blocks']:
+        if block.get('type') != 0:
+            continue
+        block_lines = []
+        for line in block['lines']:
+            block_lines.append(''.join(span['text'] for span in line['spans']))
+            for span in line['spans']:
+                cells.extend(_span_cells(span))
+        lines.extend(block_lines)
+        x0, y0, x1, y1 = block['bbox']
+        blocks.append((x0, y0, x1, y1, "\n".join(block_lines)))
+    text = ''.join(ln + "\n" for ln in lines)
+    return PageLayout(page_index, text, blocks, _detect_tables(cells))
+
+def _span_cells(span) -> List[_Cell]:
+    """Split a span into cells: a trailing run of amounts becomes one cell per amount.
+
+    Handles spans like "Revenues 182,527 257,637" where single spaces separate columns.
+    Token x positions are interpolated across the span width.
+    """
+    text = span['text']
+    toks = [(m.start(), m.end(), m.group()) for m in _TOKEN_RE.finditer(text) if m.group() not in _CURRENCY]
+    if not toks:
+        return []
+    x0, _, x1, _ = span['bbox']
+    per_char = (x1 - x0) / len(text)
+    y, size = span['origin'][1], span['size']
+    split_from = len(toks)
+    while split_from > 0 and _AMOUNT_RE.match(toks[split_from - 1][2]):
+        split_from -= 1
+    groups = [toks[:split_from]] if split_from > 0 else []
+    groups.extend([t] for t in toks[split_from:])
+    return [
+        _Cell(x0 + g[0][0] * per_char, x0 + g[-1][1] * per_char, y, size, ' '.join(t[2] for t in g))
+        for g in groups
+    ]
+
+def _group_rows(cells: List[_Cell]) -> List[List[_Cell]]:
+    """Cluster cells sharing a baseline (across blocks) and merge word fragments within a row."""
+    rows: List[List[_Cell]] = []
+    for c in sorted(cells, key=lambda c: (c.y, c.x0)):
+        if rows and abs(c.y - rows[-1][0].y) <= max(2.0, 0.25 * c.size):
+            rows[-1].append(c)
+        else:
+            rows.append([c])
+    out = []
+    for row in rows:
+        merged: List[_Cell] = []
+        for c in sorted(row, key=lambda c: c.x0):
+            if merged:
+                prev = merged[-1]
+                gap = c.x0 - prev.x1
+                both_amounts = _AMOUNT_RE.match(prev.text) and _AMOUNT_RE.match(c.text)
+                if c.text in _ATTACH or (gap < 0.5 * c.size and not both_amounts):
+                    prev.text = prev.text + ('' if c.text in _ATTACH else ' ') + c.text
+                    prev.x1 = max(prev.x1, c.x1)
+                    continue
+            merged.append(_Cell(c.x0, c.x1, c.y, c.size, c.text))
+        out.append(merged)
+    return out
+
+def _is_tabular(row: List[_Cell]) -> bool:
+    # multi-column prose also yields several cells per baseline, so require a numeric cell
+    return len(row) >= 2 and any(_AMOUNT_RE.match(c.text) for c in row)
+
+def _detect_tables(cells: List[_Cell]) -> List[List[List[str]]]:
+    """Find runs of multi-cell rows and align them into columns."""
+    rows = _group_rows(cells)
+    tables: List[List[List[str]]] = []
+    region: List[List[_Cell]] = []
+
+    def close():
+        while region and not _is_tabular(region[-1]):
+            region.pop()
+        if sum(1 for r in region if _is_tabular(r)) >= 2:
+            tables.append(_align_columns(region))
+        region.clear()
+
+    prev_y = 0.0
+    plain_run = 0
+    for row in rows:
+        size = max(c.size for c in row)
+        tabular = _is_tabular(row)
+        if region and (row[0].y - prev_y > 2.5 * size or (not tabular and plain_run >= 2)):
+            close()
+        if tabular or region:
+            # label-only rows ("Costs and expenses:") are kept while inside a table
+            region.append(row)
+        plain_run = 0 if tabular else plain_run + 1
+        prev_y = row[0].y
+    close()
+    return tables
+
+def _align_columns(region: List[List[_Cell]]) -> List[List[str]]:
+    """Derive columns from overlapping x-extents of the fullest rows, then place every cell."""
+    full = max(len(r) for r in region)
+    ref = [c for r in region if len(r) >= max(2, full - 1) for c in r]
+    cols: List[List[float]] = []
+    for x0, x1 in sorted((c.x0, c.x1) for c in ref):
+        if cols and x0 <= cols[-1][1]:
+            cols[-1][1] = max(cols[-1][1], x1)
+        else:
+            cols.append([x0, x1])
+    out = []
+    for r in region:
+        row = [''] * len(cols)
+        for c in r:
+            overlaps = [min(c.x1, b) - max(c.x0, a) for a, b in cols]
+            j = max(range(len(cols)), key=lambda k: overlaps[k])
+            if overlaps[j] <= 0:
+                mid = (c.x0 + c.x1) / 2.0
+                j = min(range(len(cols)), key=lambda k: abs((cols[k][0] + cols[k][1]) / 2.0 - mid))
+            row[j] = (row[j] + ' ' + c.text).strip()
+        out.append(row)
+    return out
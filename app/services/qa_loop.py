@@ -1,13 +1,14 @@
 import uuid
 import json
 import traceback
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from datetime import datetime
 import os
 
 from app.core.config import get_settings
 from app.services.openai_client import OpenAIClient
 from app.stores.main_store import MainStore
+from app.stores.table_store import render_table
 
 settings = get_settings()
 
@@ -36,8 +37,13 @@ If not answerable, craft missing_info_query to retrieve new info.
 
 FINAL_ANSWER_PROMPT = """You are a finance QA assistant. Use only the provided chunks to answer. You may perform calculations. Return JSON: {"answer": "string", "reasoning": "string"}.
 If numeric, include numeric form in answer.
+Table chunks hold the full table: one row per line, cells separated by " | ".
 """
 
+def _source_files(chosen_doc_ids) -> List[str]:
+    """Map LLM-chosen 'doc-<filename>' ids to the source_file values used as retrieval filters."""
+    return sorted({cid[len('doc-'):] for cid in chosen_doc_ids if isinstance(cid, str) and cid.startswith('doc-')})
+
 class QALoop:
     def __init__(self, store: MainStore):
         self.store = store
@@ -61,6 +67,87 @@ class QALoop:
                 print(f"[LLM-OUT] stage={stage} (non-serializable) resp={resp}")
         return resp
 
+    def _final_context(self, accumulated_chunks: Dict[str, Dict[str, Any]]) -> str:
+        """Selected evidence for the answer prompt; tables are hydrated with their full rows from the table store."""
+        table_ids = [cid for cid, c in accumulated_chunks.items() if (c.get('metadata') or {}).get('type') == 'table']
+        rows = self.store.table_rows(table_ids) if table_ids else {}
+        if self._debug and table_ids:
+            print(f"[RAG] hydrated_tables={len(rows)}/{len(table_ids)}")
+        return json.dumps([
+            {'id': cid, 'text': render_table(rows[cid]) if rows.get(cid) else c['text'][:1200]}
+            for cid, c in accumulated_chunks.items()
+        ])
+
+    def _route(self, user_query: str, trace: Dict[str, Any]) -> Dict[str, Any]:
+        """Resolve issuer / fiscal-year / form constraints of the question against the catalogued filings.
+
+        scope['files'] (None = unconstrained) restricts doc candidates before any
+        LLM sees them. Only when an issuer (name or ticker) matched and at most
+        route_max_filings filings remain is scope['routed'] set and select_docs
+        skipped; year / form alone still leave the choice to select_docs.
+        """
+        if not settings.route_by_filing_metadata:
+            return {'files': None, 'routed': False}
+        scope = self.store.resolve_filings(user_query)
+        scope['routed'] = bool(scope['issuers']) and bool(scope['files']) and len(scope['files']) <= settings.route_max_filings
+        if scope['files'] is not None:
+            trace['steps'].append({'loop': 0, 'type': 'route_filings', **scope})
+        if self._debug:
+            print(f"[ROUTE] issuers={scope.get('issuers')} years={scope.get('years')} forms={scope.get('form_types')} files={scope['files']} routed={scope['routed']}")
+        return scope
+
+    def _fact_fast_path(self, user_query: str, trace: Dict[str, Any], scope: Optional[Dict[str, Any]],
+                        accumulated_chunks: Dict[str, Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Answer or pre-seed metric / fiscal-year questions from the fact index before the iterative loop.
+
+        An unambiguous hit for a question asking just that figure is answered
+        directly (fact_fast_path="answer"). Otherwise -- ambiguous, asking for
+        growth, a share, a margin..., or fact_fast_path="seed" -- the facts and
+        their source tables are added to accumulated_chunks and the loop still
+        retrieves the rest of the evidence.
+        Returns the final answer JSON, or None to run the loop.
+        """
+        mode = settings.fact_fast_path
+        if mode == 'off':
+            return None
+        hit = self.store.lookup_facts(user_query, source_files=(scope or {}).get('files'))
+        facts = hit['facts']
+        if self._debug:
+            print(f"[FACTS] metric={hit['metric']} periods={hit['periods']} files={hit['files']} facts={len(facts)} unambiguous={hit['unambiguous']} direct={hit['direct']} extra={hit['extra_terms']}")
+        if not facts:
+            return None
+        step = {'loop': 0, 'type': 'fact_lookup', **hit}
+        trace['steps'].append(step)
+        if mode != 'answer' or not (hit['unambiguous'] and hit['direct']):
+            table_ids = list(dict.fromkeys(f['table_id'] for f in facts))[:settings.fact_seed_tables]
+            rows = self.store.table_rows(table_ids)
+            for i, f in enumerate(facts[:20]):
+                accumulated_chunks[f"fact-{i}"] = {
+                    'id': f"fact-{i}",
+                    'text': f"{f['issuer']} | {f['label']} | fiscal {f['period']} | {f['text']} {f['unit']} | {f['source_file']} p.{(f['page'] or 0) + 1}",
+                    'metadata': {'type': 'fact', 'source_file': f['source_file'], 'page': f['page']},
+                }
+            for tid in table_ids:
+                if rows.get(tid):
+                    # hydrated again with the full rows by _final_context
+                    accumulated_chunks[tid] = {'id': tid, 'text': render_table(rows[tid]), 'metadata': {'type': 'table'}}
+            step['seeded'] = len(accumulated_chunks)
+            if self._debug:
+                print(f"[RAG] fact_seed evidence={len(accumulated_chunks)}")
+            return None
+        f = facts[0]
+        scale = f" (in {f['unit']})" if f['unit'] not in ('', '%') else ''
+        final_json = {
+            'answer': f"{f['text']}{scale}",
+            'reasoning': f"{f['issuer']} reports {f['label']} of {f['text']}{scale} for fiscal {f['period']} "
+                         f"({f['source_file']}, page {(f['page'] or 0) + 1}, {f['table_id']}).",
+        }
+        trace['steps'].append({'loop': 0, 'type': 'final_answer', 'result': final_json, 'fast_path': True})
+        trace['final_answer'] = final_json
+        if self._debug:
+            print(f"[RAG] fast_path final_answer={self._t(final_json.get('answer',''))}")
+        return final_json
+
     def _t(self, text: str, limit: int = 180) -> str:
         if text is None:
             return ''
@@ -76,7 +163,10 @@ class QALoop:
         accumulated_chunks: Dict[str, Dict[str, Any]] = {}
 
         current_query = user_query
-        for loop_idx in range(settings.iterative_max_loops):
+        scope = self._route(user_query, trace)
+        # the fact index answers common metric / year questions without the loop, or seeds its evidence
+        max_loops = 0 if self._fact_fast_path(user_query, trace, scope, accumulated_chunks) is not None else settings.iterative_max_loops
+        for loop_idx in range(max_loops):
             # Step 1: reformulate
             reform_json = self._chat('reformulate', settings.json_response_system_prompt, f"{REFORM_PROMPT}\nQuery: {current_query}", '{"reformulated":"string"}')
             reformulated = reform_json.get('reformulated', current_query)
@@ -84,34 +174,38 @@ class QALoop:
                 print(f"[RAG] loop={loop_idx} reformulated='{self._t(reformulated)}'")
             trace['steps'].append({'loop': loop_idx, 'type': 'reformulate', 'input': current_query, 'output': reformulated})
 
-            # Step 2: doc retrieval (LangChain store directly uses text query)
+            # Step 2: doc retrieval (query embedded once per loop, vector reused for chunks/tables)
             import time as _time
             t0 = _time.time()
-            docs = self.store.retrieve_docs(reformulated, settings.top_k_docs)
-            dt = (_time.time() - t0) * 1000.0
-            if self._debug:
-                print(f"[PERF] retrieve_docs loop={loop_idx} ms={dt:.1f}")
-            if self._debug:
-                print(f"[RAG] loop={loop_idx} retrieved_docs={len(docs)} ids={[d['id'] for d in docs]}")
-            trace['steps'].append({'loop': loop_idx, 'type': 'retrieve_docs', 'candidates': docs})
-            # Step 3: doc selection via LLM
-            doc_context = json.dumps([{ 'id': d['id'], 'score': round(d['score'],4), 'summary': d.get('summary_short', d.get('text')) } for d in docs])
-            print(f"length of doc_context: {len(doc_context)}")
-            sel_json = self._chat('select_docs', settings.json_response_system_prompt, f"{DOC_SELECT_PROMPT}\nQuery: {reformulated}\nDocs: {doc_context}", '{"chosen_doc_ids":[],"reason":"string"}')
-            chosen_ids = set(sel_json.get('chosen_doc_ids', []))
-            if self._debug:
-                print(f"[RAG] loop={loop_idx} selected_docs={list(chosen_ids)} reason={self._t(sel_json.get('reason',''))}")
-            trace['steps'].append({'loop': loop_idx, 'type': 'select_docs', 'selection': list(chosen_ids), 'llm_raw': sel_json})
-
-            # Step 4: chunk & table retrieval limited to chosen docs
-            chunks = self.store.retrieve_chunks(reformulated, settings.top_k_chunks)
-            tables = self.store.retrieve_tables(reformulated, settings.top_k_tables)
-            # filter by chosen docs if any
-            if chosen_ids:
-                chunks = [c for c in chunks if 'doc-' + c['metadata'].get('source_file', '') in chosen_ids]
-                tables = [t for t in tables if 'doc-' + t['metadata'].get('source_file', '') in chosen_ids]
+            query_vec = self.store.embed_query(reformulated)
+            t1 = _time.time()
+            if scope['routed']:
+                # issuer / year constraints already name the filings: no summary search, no select_docs call
+                chosen_ids = {f"doc-{f}" for f in scope['files']}
+                trace['steps'].append({'loop': loop_idx, 'type': 'select_docs', 'selection': sorted(chosen_ids), 'routed': True})
+            else:
+                docs = self.store.retrieve_docs_by_vector(query_vec, settings.top_k_docs, source_files=scope['files'])
+                dt = (_time.time() - t1) * 1000.0
+                if self._debug:
+                    print(f"[PERF] embed_query loop={loop_idx} ms={(t1 - t0) * 1000.0:.1f} retrieve_docs ms={dt:.1f}")
+                if self._debug:
+                    print(f"[RAG] loop={loop_idx} retrieved_docs={len(docs)} ids={[d['id'] for d in docs]}")
+                trace['steps'].append({'loop': loop_idx, 'type': 'retrieve_docs', 'candidates': docs})
+                # Step 3: doc selection via LLM
+                doc_context = json.dumps([{ 'id': d['id'], 'score': round(d['score'],4), 'summary': d.get('summary_short', d.get('text')) } for d in docs])
+                print(f"length of doc_context: {len(doc_context)}")
+                sel_json = self._chat('select_docs', settings.json_response_system_prompt, f"{DOC_SELECT_PROMPT}\nQuery: {reformulated}\nDocs: {doc_context}", '{"chosen_doc_ids":[],"reason":"string"}')
+                chosen_ids = set(sel_json.get('chosen_doc_ids', []))
+                if self._debug:
+                    print(f"[RAG] loop={loop_idx} selected_docs={list(chosen_ids)} reason={self._t(sel_json.get('reason',''))}")
+                trace['steps'].append({'loop': loop_idx, 'type': 'select_docs', 'selection': list(chosen_ids), 'llm_raw': sel_json})
+
+            # Step 4: chunk & table retrieval limited to chosen docs (filter applied inside the vector search)
+            chosen_files = _source_files(chosen_ids) or scope['files']
+            hits = self.store.retrieve_multi(query_vec, {'chunks': settings.top_k_chunks, 'tables': settings.top_k_tables}, source_files=chosen_files)
+            chunks, tables = hits['chunks'], hits['tables']
             if self._debug:
-                print(f"[RAG] loop={loop_idx} chunks={len(chunks)} tables={len(tables)} (after filter)")
+                print(f"[RAG] loop={loop_idx} chunks={len(chunks)} tables={len(tables)} (filtered in store)")
             trace['steps'].append({'loop': loop_idx, 'type': 'retrieve_chunks', 'chunks': chunks, 'tables': tables})
 
             # Step 5: LLM chunk filtering & answerability
@@ -129,7 +223,7 @@ class QALoop:
 
             if answerable or loop_idx == settings.iterative_max_loops - 1:
                 # final answer
-                final_context = json.dumps([{ 'id': cid, 'text': c['text'][:1200] } for cid, c in accumulated_chunks.items()])
+                final_context = self._final_context(accumulated_chunks)
                 final_json = self._chat('final_answer', settings.json_response_system_prompt, f"{FINAL_ANSWER_PROMPT}\nQuery: {user_query}\nChunks: {final_context}", '{"answer":"string","reasoning":"string"}')
                 trace['steps'].append({'loop': loop_idx, 'type': 'final_answer', 'result': final_json})
                 trace['final_answer'] = final_json
@@ -155,7 +249,14 @@ class QALoop:
         accumulated_chunks: Dict[str, Dict[str, Any]] = {}
         current_query = user_query
         logger.info('loop_start', trace_id=trace_id)
-        for loop_idx in range(settings.iterative_max_loops):
+        scope = self._route(user_query, trace)
+        fast = self._fact_fast_path(user_query, trace, scope, accumulated_chunks)
+        if fast is not None:
+            logger.info('fact_fast_path', facts=len(next(x for x in trace['steps'] if x['type'] == 'fact_lookup')['facts']))
+        elif accumulated_chunks:
+            logger.info('fact_seeded', evidence=len(accumulated_chunks))
+        max_loops = 0 if fast is not None else settings.iterative_max_loops
+        for loop_idx in range(max_loops):
             logger.progress('reformulate', loop_idx, settings.iterative_max_loops)
             reform_json = self._chat('reformulate', settings.json_response_system_prompt, f"{REFORM_PROMPT}\nQuery: {current_query}", '{"reformulated":"string"}')
             reformulated = reform_json.get('reformulated', current_query)
@@ -165,37 +266,42 @@ class QALoop:
             logger.progress('retrieve_docs', loop_idx, settings.iterative_max_loops)
             import time as _time
             t0 = _time.time()
-            docs = self.store.retrieve_docs(reformulated, settings.top_k_docs)
-            dt = (_time.time() - t0) * 1000.0
-            if settings.rag_debug:
-                print(f"[PERF] retrieve_docs(loop={loop_idx}) ms={dt:.1f}")
-            if settings.rag_debug:
-                print(f"[RAG] loop={loop_idx} retrieved_docs={len(docs)} ids={[d['id'] for d in docs]} scores={[round(d.get('score',0.0),3) for d in docs]}")
-            trace['steps'].append({'loop': loop_idx, 'type': 'retrieve_docs', 'candidates': docs})
-            doc_context = json.dumps([
-                {
-                    'id': d['id'],
-                    'score': round(d.get('score', 0.0), 4),
-                    'summary': (
-                        d.get('summary_short')
-                        or d.get('summary')
-                        or d.get('text', '')[:settings.doc_summary_max_chars]
-                    )
-                } for d in docs
-            ])
-            sel_json = self._chat('select_docs', settings.json_response_system_prompt, f"{DOC_SELECT_PROMPT}\nQuery: {reformulated}\nDocs: {doc_context}", '{"chosen_doc_ids":[],"reason":"string"}')
-            chosen_ids = set(sel_json.get('chosen_doc_ids', []))
-            if settings.rag_debug:
-                print(f"[RAG] loop={loop_idx} selected_docs={list(chosen_ids)} reason={self._t(sel_json.get('reason',''))}")
-            trace['steps'].append({'loop': loop_idx, 'type': 'select_docs', 'selection': list(chosen_ids), 'llm_raw': sel_json})
+            query_vec = self.store.embed_query(reformulated)
+            t1 = _time.time()
+            if scope['routed']:
+                # issuer / year constraints already name the filings: no summary search, no select_docs call
+                chosen_ids = {f"doc-{f}" for f in scope['files']}
+                trace['steps'].append({'loop': loop_idx, 'type': 'select_docs', 'selection': sorted(chosen_ids), 'routed': True})
+            else:
+                docs = self.store.retrieve_docs_by_vector(query_vec, settings.top_k_docs, source_files=scope['files'])
+                dt = (_time.time() - t1) * 1000.0
+                if settings.rag_debug:
+                    print(f"[PERF] embed_query(loop={loop_idx}) ms={(t1 - t0) * 1000.0:.1f} retrieve_docs ms={dt:.1f}")
+                if settings.rag_debug:
+                    print(f"[RAG] loop={loop_idx} retrieved_docs={len(docs)} ids={[d['id'] for d in docs]} scores={[round(d.get('score',0.0),3) for d in docs]}")
+                trace['steps'].append({'loop': loop_idx, 'type': 'retrieve_docs', 'candidates': docs})
+                doc_context = json.dumps([
+                    {
+                        'id': d['id'],
+                        'score': round(d.get('score', 0.0), 4),
+                        'summary': (
+                            d.get('summary_short')
+                            or d.get('summary')
+                            or d.get('text', '')[:settings.doc_summary_max_chars]
+                        )
+                    } for d in docs
+                ])
+                sel_json = self._chat('select_docs', settings.json_response_system_prompt, f"{DOC_SELECT_PROMPT}\nQuery: {reformulated}\nDocs: {doc_context}", '{"chosen_doc_ids":[],"reason":"string"}')
+                chosen_ids = set(sel_json.get('chosen_doc_ids', []))
+                if settings.rag_debug:
+                    print(f"[RAG] loop={loop_idx} selected_docs={list(chosen_ids)} reason={self._t(sel_json.get('reason',''))}")
+                trace['steps'].append({'loop': loop_idx, 'type': 'select_docs', 'selection': list(chosen_ids), 'llm_raw': sel_json})
             logger.progress('retrieve_chunks', loop_idx, settings.iterative_max_loops)
-            chunks = self.store.retrieve_chunks(reformulated, settings.top_k_chunks)
-            tables = self.store.retrieve_tables(reformulated, settings.top_k_tables)
-            if chosen_ids:
-                chunks = [c for c in chunks if 'doc-' + c['metadata'].get('source_file', '') in chosen_ids]
-                tables = [t for t in tables if 'doc-' + t['metadata'].get('source_file', '') in chosen_ids]
+            chosen_files = _source_files(chosen_ids) or scope['files']
+            hits = self.store.retrieve_multi(query_vec, {'chunks': settings.top_k_chunks, 'tables': settings.top_k_tables}, source_files=chosen_files)
+            chunks, tables = hits['chunks'], hits['tables']
             if settings.rag_debug:
-                print(f"[RAG] loop={loop_idx} chunks={len(chunks)} tables={len(tables)} (after filter)")
+                print(f"[RAG] loop={loop_idx} chunks={len(chunks)} tables={len(tables)} (filtered in store)")
             trace['steps'].append({'loop': loop_idx, 'type': 'retrieve_chunks', 'chunks': chunks, 'tables': tables})
             limited_chunks = chunks[:8] + tables[:4]
             chunk_context = json.dumps([{ 'id': c['id'], 'text': c['text'][:500] } for c in limited_chunks])
@@ -211,7 +317,7 @@ class QALoop:
             trace['steps'].append({'loop': loop_idx, 'type': 'filter_chunks', 'selected': list(rel_ids), 'answerable': answerable, 'llm_raw': filter_json})
             if answerable or loop_idx == settings.iterative_max_loops - 1:
                 logger.progress('final_answer', loop_idx, settings.iterative_max_loops)
-                final_context = json.dumps([{ 'id': cid, 'text': c['text'][:1200] } for cid, c in accumulated_chunks.items()])
+                final_context = self._final_context(accumulated_chunks)
                 final_json = self._chat('final_answer', settings.json_response_system_prompt, f"{FINAL_ANSWER_PROMPT}\nQuery: {user_query}\nChunks: {final_context}", '{"answer":"string","reasoning":"string"}')
                 trace['steps'].append({'loop': loop_idx, 'type': 'final_answer', 'result': final_json})
                 trace['final_answer'] = final_json
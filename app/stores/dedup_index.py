@@ -0,0 +1,141 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_NUMBER_RE = re.compile(r"\d[\d,.]*")
+_BANDS = 4  # 4 x 16-bit bands: any pair within Hamming distance 3 shares at least one band
+_BAND_BITS = 64 // _BANDS
+_BAND_MASK = (1 << _BAND_BITS) - 1
+_SHINGLE = 3
+_MIN_SHINGLES = 8  # very short chunks give unstable fingerprints
+
+
+def simhash(text: str) -> Optional[int]:
+    """64-bit SimHash over lowercase word 3-shingles (numbers kept, so different figures differ).
+
+    Returns None when the text is too short to fingerprint reliably.
+    """
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < _SHINGLE + _MIN_SHINGLES - 1:
+        return None
+    shingles = [' '.join(words[i:i + _SHINGLE]) for i in range(len(words) - _SHINGLE + 1)]
+    hashes = np.frombuffer(
+        b''.join(hashlib.blake2b(sh.encode('utf-8'), digest_size=8).digest() for sh in shingles), dtype='<u8'
+    )
+    # per-bit majority vote across shingle hashes
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder='little')
+    votes = bits.sum(axis=0, dtype=np.int64) * 2 - len(shingles)
+    return int.from_bytes(np.packbits(votes > 0, bitorder='little').tobytes(), 'little')
+
+
+def numeric_signature(text: str) -> int:
+    """64-bit digest of the figures in a chunk, in order.
+
+    Near-duplicate text reporting different figures (e.g. the same MD&A
+    sentence for two fiscal years) is not collapsed: both are evidence.
+    """
+    nums = ' '.join(m.group().rstrip('.,') for m in _NUMBER_RE.finditer(text))
+    return int.from_bytes(hashlib.blake2b(nums.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def _to_signed(v: int) -> int:
+    # SQLite INTEGER is signed 64-bit
+    return v - (1 << 64) if v >= (1 << 63) else v
+
+
+class DedupIndex:
+    """Persistent SimHash index over stored chunks for near-duplicate detection.
+
+    Each entry maps a chunk point id to its fingerprint, source file and the
+    canonical point it duplicates (itself for originals). Lookups use banded
+    exact matching on 16-bit slices, then an exact Hamming check.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_hamming: Optional[int] = None):
+        self.path = path or os.path.join(settings.persist_dir, 'dedup.sqlite')
+        self.max_hamming = settings.dedup_max_hamming if max_hamming is None else max_hamming
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS fingerprints ('
+            ' point_id TEXT PRIMARY KEY, simhash INTEGER NOT NULL, numsig INTEGER NOT NULL,'
+            ' source_file TEXT NOT NULL, canonical_id TEXT NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_fp_source ON fingerprints(source_file)')
+        self._conn.commit()
+        self._hash: Dict[str, Tuple[int, int]] = {}  # canonical point id -> (simhash, numeric signature)
+        self._bands: List[Dict[int, List[str]]] = [defaultdict(list) for _ in range(_BANDS)]
+        mask = (1 << 64) - 1
+        for point_id, h, ns, canonical in self._conn.execute('SELECT point_id, simhash, numsig, canonical_id FROM fingerprints'):
+            # only canonical chunks are match targets; duplicates point at them
+            if point_id == canonical:
+                self._insert_mem(point_id, h & mask, ns & mask)
+
+    def _insert_mem(self, point_id: str, h: int, numsig: int):
+        self._hash[point_id] = (h, numsig)
+        for b in range(_BANDS):
+            self._bands[b][(h >> (b * _BAND_BITS)) & _BAND_MASK].append(point_id)
+
+    def find(self, h: int, numsig: int) -> Optional[str]:
+        """Closest canonical point within max_hamming of fingerprint h reporting the same figures, if any."""
+        best: Optional[Tuple[int, str]] = None
+        with self._lock:
+            seen = set()
+            for b in range(_BANDS):
+                for pid in self._bands[b].get((h >> (b * _BAND_BITS)) & _BAND_MASK, ()):
+                    if pid in seen:
+                        continue
+                    seen.add(pid)
+                    other = self._hash.get(pid)
+                    if other is None or other[1] != numsig:
+                        continue
+                    d = bin(h ^ other[0]).count('1')
+                    if d <= self.max_hamming and (best is None or d < best[0]):
+                        best = (d, pid)
+        return best[1] if best else None
+
+    def add(self, entries: List[Tuple[str, int, int, str, str]]):
+        """Record (point_id, simhash, numsig, source_file, canonical_id) rows."""
+        if not entries:
+            return
+        with self._lock:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO fingerprints (point_id, simhash, numsig, source_file, canonical_id) VALUES (?, ?, ?, ?, ?)',
+                [(pid, _to_signed(h), _to_signed(ns), src, canon) for pid, h, ns, src, canon in entries]
+            )
+            self._conn.commit()
+            for pid, h, ns, _, canon in entries:
+                if pid == canon:
+                    self._insert_mem(pid, h, ns)
+
+    def remove_file(self, source_file: str):
+        """Forget a file's fingerprints; its canonicals stop matching new chunks."""
+        with self._lock:
+            rows = self._conn.execute('SELECT point_id FROM fingerprints WHERE source_file=?', (source_file,)).fetchall()
+            self._conn.execute('DELETE FROM fingerprints WHERE source_file=?', (source_file,))
+            self._conn.commit()
+            for (pid,) in rows:
+                entry = self._hash.pop(pid, None)
+                if entry is None:
+                    continue
+                h = entry[0]
+                for b in range(_BANDS):
+                    bucket = self._bands[b].get((h >> (b * _BAND_BITS)) & _BAND_MASK)
+                    if bucket and pid in bucket:
+                        bucket.remove(pid)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            total = self._conn.execute('SELECT COUNT(*) FROM fingerprints').fetchone()[0]
+        return {'fingerprints': total, 'canonical': len(self._hash), 'duplicates': total - len(self._hash)}
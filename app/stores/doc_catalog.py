@@ -0,0 +1,146 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+_DOC_COLUMNS = ('filename', 'sha256', 'pages', 'num_chunks', 'num_tables', 'has_summary', 'ingested_at', 'source_path')
+_FILING_COLUMNS = ('filename', 'issuer', 'form_type', 'fiscal_year', 'period_end', 'tickers')
+
+
+class DocCatalog:
+    """Persistent per-file catalog: one row per ingested document plus its point ids.
+
+    Answers list/count/lookup questions without touching Qdrant. Point ids are
+    recorded as batches are written, so a file's points are known even if its
+    ingestion is interrupted; the document row is written when ingestion completes.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.path.join(settings.persist_dir, 'catalog.sqlite')
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS documents ('
+            ' filename TEXT PRIMARY KEY, sha256 TEXT, pages INTEGER, num_chunks INTEGER NOT NULL DEFAULT 0,'
+            ' num_tables INTEGER NOT NULL DEFAULT 0, has_summary INTEGER NOT NULL DEFAULT 0, ingested_at REAL,'
+            ' source_path TEXT)'
+        )
+        if 'source_path' not in {r[1] for r in self._conn.execute('PRAGMA table_info(documents)')}:
+            # catalogs written before rebuilds needed the source file
+            self._conn.execute('ALTER TABLE documents ADD COLUMN source_path TEXT')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS points ('
+            ' point_id TEXT NOT NULL, collection TEXT NOT NULL, filename TEXT NOT NULL,'
+            ' PRIMARY KEY (collection, point_id))'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_points_file ON points(filename)')
+        # filing metadata from the cover page, for constraint-based routing (see app.services.filing_metadata)
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS filings ('
+            ' filename TEXT PRIMARY KEY, issuer TEXT, form_type TEXT, fiscal_year INTEGER, period_end TEXT, tickers TEXT)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_filings_year ON filings(fiscal_year)')
+        self._conn.commit()
+
+    def data_version(self) -> int:
+        """Changes whenever another connection (e.g. another worker process) commits to the catalog."""
+        with self._lock:
+            return self._conn.execute('PRAGMA data_version').fetchone()[0]
+
+    def add_points(self, filename: str, collection: str, point_ids: Iterable[str]):
+        with self._lock:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO points (point_id, collection, filename) VALUES (?, ?, ?)',
+                [(pid, collection, filename) for pid in point_ids]
+            )
+            self._conn.commit()
+
+    def record(self, filename: str, sha256: Optional[str] = None, pages: Optional[int] = None,
+               num_chunks: int = 0, num_tables: int = 0, has_summary: bool = False, ingested_at: Optional[float] = None,
+               source_path: Optional[str] = None):
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO documents (filename, sha256, pages, num_chunks, num_tables, has_summary, ingested_at, source_path)'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (filename, sha256, pages, num_chunks, num_tables, int(has_summary), ingested_at or time.time(), source_path)
+            )
+            self._conn.commit()
+
+    def remove(self, filename: str) -> Optional[Dict[str, Any]]:
+        """Drop a file's row and point ids; returns the removed row, if any."""
+        doc = self.get(filename)
+        with self._lock:
+            self._conn.execute('DELETE FROM documents WHERE filename=?', (filename,))
+            self._conn.execute('DELETE FROM points WHERE filename=?', (filename,))
+            self._conn.execute('DELETE FROM filings WHERE filename=?', (filename,))
+            self._conn.commit()
+        return doc
+
+    def set_filing(self, filename: str, issuer: Optional[str] = None, form_type: Optional[str] = None,
+                   fiscal_year: Optional[int] = None, period_end: Optional[str] = None, tickers: Iterable[str] = ()):
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO filings (filename, issuer, form_type, fiscal_year, period_end, tickers) VALUES (?, ?, ?, ?, ?, ?)',
+                (filename, issuer, form_type, fiscal_year, period_end, ' '.join(tickers))
+            )
+            self._conn.commit()
+
+    def filings(self) -> List[Dict[str, Any]]:
+        """Filing metadata of every catalogued document (fields are None where extraction found nothing)."""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT d.filename, {', '.join('f.' + c for c in _FILING_COLUMNS[1:])}"
+                ' FROM documents d LEFT JOIN filings f ON f.filename = d.filename ORDER BY d.filename'
+            ).fetchall()
+        out = []
+        for r in rows:
+            filing = dict(zip(_FILING_COLUMNS, r))
+            filing['tickers'] = (filing['tickers'] or '').split()
+            out.append(filing)
+        return out
+
+    def get(self, filename: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(f"SELECT {', '.join(_DOC_COLUMNS)} FROM documents WHERE filename=?", (filename,)).fetchone()
+        return dict(zip(_DOC_COLUMNS, row)) if row else None
+
+    def contains(self, filename: str) -> bool:
+        """True if the file has a document row or any recorded points."""
+        with self._lock:
+            return self._conn.execute(
+                'SELECT 1 FROM documents WHERE filename=? UNION ALL SELECT 1 FROM points WHERE filename=? LIMIT 1',
+                (filename, filename)
+            ).fetchone() is not None
+
+    def point_ids(self, filename: str) -> Dict[str, List[str]]:
+        out: Dict[str, List[str]] = {}
+        with self._lock:
+            for pid, col in self._conn.execute('SELECT point_id, collection FROM points WHERE filename=?', (filename,)):
+                out.setdefault(col, []).append(pid)
+        return out
+
+    def documents(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(f"SELECT {', '.join(_DOC_COLUMNS)} FROM documents ORDER BY filename").fetchall()
+        return [dict(zip(_DOC_COLUMNS, r)) for r in rows]
+
+    def filenames(self) -> List[str]:
+        with self._lock:
+            return [r[0] for r in self._conn.execute('SELECT filename FROM documents ORDER BY filename')]
+
+    def is_empty(self) -> bool:
+        with self._lock:
+            return self._conn.execute('SELECT 1 FROM points LIMIT 1').fetchone() is None
+
+    def totals(self) -> Dict[str, int]:
+        with self._lock:
+            docs, chunks, tables = self._conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(num_chunks), 0), COALESCE(SUM(num_tables), 0) FROM documents'
+            ).fetchone()
+        return {'docs': docs, 'chunks': chunks, 'tables': tables}
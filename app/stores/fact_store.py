@@ -0,0 +1,296 @@
+import os
+import re
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import get_settings
+from app.services.filing_metadata import issuer_words, match_issuers
+
+settings = get_settings()
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_YEAR_RE = re.compile(r"\b(?:fy\s*|fiscal\s+(?:year\s+)?)?((?:19|20)\d{2})\b", re.IGNORECASE)
+_YEAR_CELL_RE = re.compile(r"^\s*(?:fy\s*|fiscal\s*)?((?:19|20)\d{2})\s*$", re.IGNORECASE)
+_NUMBER_RE = re.compile(r"^\(?\s*\$?\s*\(?\s*(-?[\d,]*\.?\d+)\s*\)?\s*(%?)\s*\)?$")
+_FOOTNOTE_RE = re.compile(r"^\(\d{1,2}\)$|^\*+$")
+# phrasing variants of the same metric, applied to normalized (stemmed) text
+_SYNONYMS = (
+    ('net sale', 'revenue'),
+    ('total sale', 'revenue'),
+    ('net revenue', 'revenue'),
+    ('operating revenue', 'revenue'),
+    ('net earning', 'net income'),
+    ('net profit', 'net income'),
+    ('income from operation', 'operating income'),
+    ('operating profit', 'operating income'),
+)
+# labels too generic to identify a metric on their own
+_GENERIC_LABELS = {'', 'total', 'other', 'net', 'amount', 'change', 'year', 'period', 'note', 'as of december'}
+
+
+def _stem(word: str) -> str:
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 4 and word.endswith(('sses', 'xes', 'ches', 'shes')):
+        return word[:-2]
+    if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+        return word[:-1]
+    return word
+
+
+# question words that do not change which figure is asked for
+_QUESTION_STOPWORDS = {_stem(w) for w in (
+    'what', 'was', 'were', 'is', 'are', 'the', 'a', 'an', 'of', 'in', 'for', 'did', 'does', 'do', 'how', 'much',
+    'during', 'fiscal', 'year', 'fy', 'total', 'reported', 'report', 'company', 'its', 'their', 'amount', 'value',
+    'figure', 'as', 'on', 'at', 'to', 'by', 'million', 'billion', 'thousand', 'dollars', 'usd', 'us', 's', 'inc',
+    'ended', 'end', 'full', 'annual', 'k', '10', 'form', 'filing', 'january', 'february', 'march', 'april', 'may',
+    'june', 'july', 'august', 'september', 'october', 'november', 'december')}
+# words asking for something derived from a stored figure rather than the figure itself
+_DERIVATION_TERMS = {_stem(w) for w in (
+    'growth', 'grow', 'grew', 'change', 'increase', 'decrease', 'decline', 'margin', 'ratio', 'percent',
+    'percentage', 'share', 'per', 'average', 'compare', 'compared', 'difference', 'yoy', 'cagr', 'rate',
+    'proportion', 'between', 'vs', 'versus')}
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, footnote-free, stemmed word sequence with metric synonyms folded."""
+    text = re.sub(r"\(\d{1,2}\)|\$", ' ', text.lower())
+    out = ' ' + ' '.join(_stem(w) for w in _WORD_RE.findall(text)) + ' '
+    for src, dst in _SYNONYMS:
+        out = out.replace(f' {src} ', f' {dst} ')
+    return out.strip()
+
+
+def normalize_label(label: str) -> Tuple[str, bool]:
+    """Canonical metric key of a row label -> (key, is_total); 'Total revenues' and 'Revenues' share a key."""
+    norm = normalize_text(label)
+    is_total = norm == 'total' or norm.startswith('total ')
+    if is_total:
+        norm = norm[len('total'):].strip()
+    return norm, is_total
+
+
+def parse_number(cell: str) -> Optional[Tuple[float, bool]]:
+    """Parse a table cell like '1,234', '(8,979)', '$ 12.5', '14 %' -> (value, is_percent)."""
+    cell = (cell or '').strip()
+    if not cell or _FOOTNOTE_RE.match(cell):
+        return None
+    m = _NUMBER_RE.match(cell)
+    if not m:
+        return None
+    try:
+        value = float(m.group(1).replace(',', ''))
+    except ValueError:
+        return None
+    if '(' in cell and ')' in cell:
+        value = -value
+    return value, bool(m.group(2))
+
+
+def _header_years(rows: List[List[str]]) -> Tuple[Dict[int, int], int]:
+    """Column index -> fiscal year from the header rows, and the index of the first data row."""
+    years: Dict[int, int] = {}
+    for i, row in enumerate(rows):
+        cells = [(c or '').strip() for c in row]
+        found = {j: int(m.group(1)) for j, c in enumerate(cells) if (m := _YEAR_CELL_RE.match(c))}
+        numeric = [c for c in cells if parse_number(c) is not None and not _YEAR_CELL_RE.match(c)]
+        if numeric and not found:
+            return years, i
+        if found:
+            years = found  # the lowest header row with years wins (spanning headers sit above it)
+    return years, len(rows)
+
+
+def extract_facts(rows: List[List[str]], unit: str = '') -> List[Dict[str, Any]]:
+    """(label, period, value) facts of a table whose columns are headed by fiscal years.
+
+    A label row without figures (layout extraction often puts the label on
+    its own line) names the figures of the next unlabeled row.
+    """
+    years, start = _header_years(rows)
+    if not years:
+        return []
+    facts = []
+    pending = ''
+    for row in rows[start:]:
+        cells = [(c or '').strip() for c in row]
+        label = next((c for c in cells[:2] if c and parse_number(c) is None and not _FOOTNOTE_RE.match(c)), '')
+        values = []
+        for col, year in years.items():
+            if col < len(cells):
+                parsed = parse_number(cells[col])
+                if parsed is not None:
+                    values.append((year, cells[col], parsed))
+        if not values:
+            if label:
+                pending = label
+            continue
+        label = label or pending
+        pending = ''
+        key, is_total = normalize_label(label)
+        if key in _GENERIC_LABELS:
+            continue
+        for year, text, (value, is_percent) in values:
+            facts.append({'label': label, 'key': key, 'is_total': is_total, 'period': year, 'value': value,
+                          'text': text, 'unit': '%' if is_percent else unit})
+    return facts
+
+
+class FactStore:
+    """Numeric facts (issuer, metric, fiscal year, value, unit, page) extracted from ingested tables.
+
+    Rows persist in SQLite; lookups run over in-memory NumPy columns that are
+    rebuilt after local writes or when another process changed the database.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.path.join(settings.persist_dir, 'facts.sqlite')
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS facts ('
+            ' source_file TEXT NOT NULL, table_id TEXT NOT NULL, page INTEGER, label TEXT NOT NULL, key TEXT NOT NULL,'
+            ' is_total INTEGER NOT NULL, period INTEGER NOT NULL, value REAL NOT NULL, text TEXT NOT NULL, unit TEXT NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_facts_source ON facts(source_file)')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS issuers (source_file TEXT PRIMARY KEY, issuer TEXT NOT NULL)')
+        self._conn.commit()
+        self._cols: Optional[Dict[str, Any]] = None
+        self._version = None
+
+    # ---------------- writes ----------------
+    def add_tables(self, source_file: str, tables: Iterable[Tuple[str, Optional[int], List[List[str]], str]]) -> int:
+        """Extract and store facts from (table_id, page, rows, unit) entries; returns the number of facts."""
+        records = []
+        for table_id, page, rows, unit in tables:
+            for f in extract_facts(rows or [], unit or ''):
+                records.append((source_file, table_id, page, f['label'], f['key'], int(f['is_total']), f['period'],
+                                f['value'], f['text'], f['unit']))
+        if not records:
+            return 0
+        with self._lock:
+            self._conn.executemany('INSERT INTO facts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', records)
+            self._conn.commit()
+            self._cols = None
+        return len(records)
+
+    def set_issuer(self, source_file: str, issuer: Optional[str]):
+        with self._lock:
+            self._conn.execute('INSERT OR REPLACE INTO issuers (source_file, issuer) VALUES (?, ?)',
+                               (source_file, issuer or ''))
+            self._conn.commit()
+            self._cols = None
+
+    def remove_file(self, source_file: str):
+        with self._lock:
+            self._conn.execute('DELETE FROM facts WHERE source_file=?', (source_file,))
+            self._conn.execute('DELETE FROM issuers WHERE source_file=?', (source_file,))
+            self._conn.commit()
+            self._cols = None
+
+    # ---------------- columns ----------------
+    def _columns(self) -> Dict[str, Any]:
+        with self._lock:
+            version = self._conn.execute('PRAGMA data_version').fetchone()[0]
+            if self._cols is not None and version == self._version:
+                return self._cols
+            rows = self._conn.execute(
+                'SELECT source_file, table_id, page, label, key, is_total, period, value, text, unit FROM facts'
+            ).fetchall()
+            issuers = dict(self._conn.execute('SELECT source_file, issuer FROM issuers').fetchall())
+            self._version = version
+        files = sorted({r[0] for r in rows} | set(issuers))
+        file_idx = {f: i for i, f in enumerate(files)}
+        keys = sorted({r[4] for r in rows})
+        key_idx = {k: i for i, k in enumerate(keys)}
+        cols = {
+            'files': files,
+            'issuers': [issuers.get(f) or os.path.splitext(f)[0] for f in files],
+            'keys': keys,
+            'file': np.array([file_idx[r[0]] for r in rows], dtype=np.int32),
+            'key': np.array([key_idx[r[4]] for r in rows], dtype=np.int32),
+            'is_total': np.array([bool(r[5]) for r in rows], dtype=bool),
+            'period': np.array([r[6] for r in rows], dtype=np.int16),
+            'value': np.array([r[7] for r in rows], dtype=np.float64),
+            'rows': rows,
+        }
+        with self._lock:
+            self._cols = cols
+        return cols
+
+    def stats(self) -> Dict[str, int]:
+        cols = self._columns()
+        return {'facts': len(cols['rows']), 'metrics': len(cols['keys']), 'files': len(cols['files'])}
+
+    # ---------------- lookup ----------------
+    def _match_files(self, cols: Dict[str, Any], question: str, source_files: Optional[Iterable[str]]) -> List[int]:
+        allowed = set(source_files) if source_files else None
+        candidates = [i for i, f in enumerate(cols['files']) if allowed is None or f in allowed]
+        named = set(match_issuers(question, [{'filename': f, 'issuer': cols['issuers'][i]} for i, f in enumerate(cols['files'])]))
+        matched = [i for i in candidates if cols['files'][i] in named]
+        if matched:
+            return matched
+        # nothing in scope named: fine for a single filing in scope, unless the question names another catalogued issuer
+        # (an issuer outside the corpus is left to the 'direct' check: its name is an extra term)
+        return candidates if len(candidates) == 1 and not named else []
+
+    def lookup(self, question: str, source_files: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """Facts answering a metric / fiscal-year question.
+
+        The metric is the longest stored label key contained in the question,
+        periods are the years it mentions and the issuer is matched against
+        registrant names and filenames. Returns {'metric', 'periods', 'files',
+        'facts', 'unambiguous', 'direct', 'extra_terms'}; facts is empty when
+        any part is missing. direct is False when the question asks more than
+        the stored figure ('revenue growth', 'share of revenue from cloud'):
+        extra_terms are its words not covered by metric, issuer or year.
+        """
+        out = {'metric': None, 'periods': [], 'files': [], 'facts': [], 'unambiguous': False, 'direct': False,
+               'extra_terms': []}
+        periods = sorted({int(m.group(1)) for m in _YEAR_RE.finditer(question)})
+        cols = self._columns()
+        if not periods or not cols['rows']:
+            return out
+        out['periods'] = periods
+        q = f" {normalize_text(question)} "
+        matches = [k for k in cols['keys'] if k not in _GENERIC_LABELS and f" {k} " in q]
+        if not matches:
+            return out
+        longest = max(len(k.split()) for k in matches)
+        metric_ids = [i for i, k in enumerate(cols['keys']) if k in matches and len(k.split()) == longest]
+        out['metric'] = cols['keys'][metric_ids[0]]
+        files = self._match_files(cols, question, source_files)
+        out['files'] = [cols['files'][i] for i in files]
+        if not files:
+            return out
+        mask = np.isin(cols['key'], metric_ids) & np.isin(cols['period'], periods) & np.isin(cols['file'], files)
+        idx = np.flatnonzero(mask)
+        # totals first, then by page: the first fact per (file, period) is the best candidate
+        idx = idx[np.lexsort((np.array([cols['rows'][i][2] or 0 for i in idx], dtype=np.int64), ~cols['is_total'][idx]))]
+        facts = []
+        for i in idx:
+            source_file, table_id, page, label, key, is_total, period, value, text, unit = cols['rows'][i]
+            facts.append({'issuer': cols['issuers'][cols['file'][i]], 'source_file': source_file, 'table_id': table_id,
+                          'page': page, 'label': label, 'metric': key, 'is_total': bool(is_total), 'period': period,
+                          'value': value, 'text': text, 'unit': unit})
+        out['facts'] = facts
+        # one filing, one year and every candidate row agreeing on the figure
+        values = {(f['value'], f['unit']) for f in facts if f['is_total'] == facts[0]['is_total']} if facts else set()
+        out['unambiguous'] = len(files) == 1 and len(periods) == 1 and len(values) == 1
+        out['extra_terms'] = self._extra_terms(question, q, out['metric'], cols, files)
+        percent_ok = '%' not in question or (bool(facts) and facts[0]['unit'] == '%')
+        out['direct'] = bool(facts) and not out['extra_terms'] and percent_ok
+        return out
+
+    def _extra_terms(self, question: str, normalized: str, metric: str, cols: Dict[str, Any], files: List[int]) -> List[str]:
+        """Question words beyond the metric key, the issuer, the years and filler (derivation terms always count)."""
+        words = normalized.replace(f" {metric} ", ' ').split()
+        named = issuer_words(question, [{'filename': cols['files'][i], 'issuer': cols['issuers'][i]} for i in files])
+        named = {_stem(w) for w in named}
+        extra = [w for w in words if w in _DERIVATION_TERMS or
+                 (w not in _QUESTION_STOPWORDS and w not in named and not _YEAR_CELL_RE.match(w)
+                  and not (w.isdigit() and len(w) <= 2))]  # day of a period end date
+        return list(dict.fromkeys(extra))
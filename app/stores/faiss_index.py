@@ -0,0 +1,378 @@
+import json
+import math
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import get_settings
+
+try:
+    import faiss
+except ImportError:  # optional: only needed with retrieval_backend='faiss'
+    faiss = None
+
+settings = get_settings()
+
+_MIN_CAPACITY = 1024
+_IVF_TRAIN_PER_LIST = 39  # faiss warns below ~39 training points per centroid
+_SQ_TRAIN_MIN = 1000  # rows needed before the int8 codebook (per-dim ranges) is trained
+_QUANTIZATIONS = ('none', 'int8', 'binary')
+
+
+def _ivf_nlist(n: int) -> int:
+    return settings.faiss_ivf_nlist or max(16, int(4 * math.sqrt(max(n, 1))))
+
+
+class FaissIndex:
+    """FAISS search mirror of one collection.
+
+    Layout under persist_dir/faiss/<name>/:
+    - vectors.f32: L2-normalised float32 rows in a memory-mapped file (row = FAISS id)
+    - payload.sqlite: row -> point id, source_file, LangChain payload, live flag
+    - index.faiss + meta.json: the ANN index (hnsw / ivf / flat) and how many rows it covers
+
+    Adds are incremental (append rows, add_with_ids). Deletes and re-upserts
+    tombstone rows in the sidecar; tombstoned hits are skipped at search time
+    and the index is rebuilt from live rows once they pass faiss_rebuild_dead_ratio.
+    Searches restricted to a few source files are answered exactly from the
+    memmapped rows of those files.
+
+    With quantization ('int8' scalar codes or 'binary' sign bits) the index
+    holds only compressed codes: it returns top_k * quantization_oversample
+    candidates, which are rescored exactly against the float rows on disk.
+    With coarse_dim the index is built over the first coarse_dim components of
+    each vector (a matryoshka prefix, renormalised) and the best
+    coarse_candidates are reranked with the full-width rows the same way.
+    """
+
+    def __init__(self, name: str, dim: int, root: Optional[str] = None, kind: Optional[str] = None,
+                 quantization: Optional[str] = None, coarse_dim: Optional[int] = None):
+        if faiss is None:
+            raise ImportError("faiss-cpu is required for retrieval_backend='faiss'")
+        self.name = name
+        self.dim = dim
+        self.kind = kind or settings.faiss_index_type
+        self.quant = quantization or settings.vector_quantization
+        if self.quant not in _QUANTIZATIONS:
+            print(f"[FAISS] unknown quantization={self.quant!r}; using none")
+            self.quant = 'none'
+        coarse = settings.coarse_dim if coarse_dim is None else coarse_dim
+        self.coarse_dim = coarse if 0 < coarse < dim else 0
+        self.index_dim = self.coarse_dim or dim  # width of the vectors the ANN index sees
+        if self.quant == 'binary' and self.index_dim % 8:
+            raise ValueError(f"binary quantization needs an index width divisible by 8 (got {self.index_dim})")
+        self.dir = os.path.join(root or os.path.join(settings.persist_dir, 'faiss'), name)
+        os.makedirs(self.dir, exist_ok=True)
+        self._vec_path = os.path.join(self.dir, 'vectors.f32')
+        self._idx_path = os.path.join(self.dir, 'index.faiss')
+        self._meta_path = os.path.join(self.dir, 'meta.json')
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(os.path.join(self.dir, 'payload.sqlite'), check_same_thread=False)
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS rows ('
+            ' row INTEGER PRIMARY KEY, point_id TEXT NOT NULL, source_file TEXT,'
+            ' payload TEXT NOT NULL, live INTEGER NOT NULL DEFAULT 1)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_rows_point ON rows(point_id)')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_rows_source ON rows(source_file)')
+        self._conn.commit()
+        self._n, self._live = self._conn.execute('SELECT COALESCE(MAX(row) + 1, 0), COALESCE(SUM(live), 0) FROM rows').fetchone()
+        self._vecs: Optional[np.memmap] = None
+        self._open_vectors(max(self._n, _MIN_CAPACITY))
+        self._unsaved = 0
+        self._index, self._indexed = self._load_index()
+
+    # ---------------- storage ----------------
+    def _open_vectors(self, capacity: int):
+        need = capacity * self.dim * 4
+        if not os.path.exists(self._vec_path) or os.path.getsize(self._vec_path) < need:
+            with open(self._vec_path, 'ab') as f:
+                f.truncate(need)
+        if self._vecs is not None:
+            self._vecs.flush()
+        rows = os.path.getsize(self._vec_path) // (self.dim * 4)
+        self._vecs = np.memmap(self._vec_path, dtype=np.float32, mode='r+', shape=(rows, self.dim))
+
+    def _ensure_capacity(self, rows: int):
+        if rows > self._vecs.shape[0]:
+            self._open_vectors(max(rows, self._vecs.shape[0] * 2))
+
+    # ---------------- index ----------------
+    def _train_sample(self, live_rows: np.ndarray, n: int) -> np.ndarray:
+        sample = live_rows
+        if len(sample) > n:
+            sample = np.sort(np.random.default_rng(0).choice(live_rows, n, replace=False))
+        return self._encode(self._vecs[sample])
+
+    def _new_index(self, live_rows: np.ndarray):
+        kind = self.kind
+        if self.quant == 'binary':
+            # Hamming search over packed sign bits; no training needed
+            if kind == 'hnsw':
+                inner = faiss.IndexBinaryHNSW(self.index_dim, settings.faiss_hnsw_m)
+                inner.hnsw.efConstruction = settings.faiss_hnsw_ef_construction
+                inner.hnsw.efSearch = settings.faiss_hnsw_ef_search
+                return faiss.IndexBinaryIDMap2(inner), 'hnsw+binary'
+            return faiss.IndexBinaryIDMap2(faiss.IndexBinaryFlat(self.index_dim)), 'flat+binary'
+        # int8 codes need per-dimension ranges from a sample; float index until there is one
+        sq = self.quant == 'int8' and len(live_rows) >= _SQ_TRAIN_MIN
+        qtype = faiss.ScalarQuantizer.QT_8bit
+        if kind == 'ivf':
+            nlist = _ivf_nlist(len(live_rows))
+            if len(live_rows) < nlist * _IVF_TRAIN_PER_LIST:
+                kind = 'flat'  # too few vectors to train yet; retrained by a later rebuild
+            else:
+                quantizer = faiss.IndexFlatIP(self.index_dim)
+                if sq:
+                    index = faiss.IndexIVFScalarQuantizer(quantizer, self.index_dim, nlist, qtype, faiss.METRIC_INNER_PRODUCT)
+                else:
+                    index = faiss.IndexIVFFlat(quantizer, self.index_dim, nlist, faiss.METRIC_INNER_PRODUCT)
+                index.train(self._train_sample(live_rows, nlist * 256))
+                index.nprobe = settings.faiss_nprobe
+                return index, 'ivf+int8' if sq else 'ivf'
+        if kind == 'hnsw':
+            if sq:
+                inner = faiss.IndexHNSWSQ(self.index_dim, qtype, settings.faiss_hnsw_m, faiss.METRIC_INNER_PRODUCT)
+                inner.train(self._train_sample(live_rows, 100_000))
+            else:
+                inner = faiss.IndexHNSWFlat(self.index_dim, settings.faiss_hnsw_m, faiss.METRIC_INNER_PRODUCT)
+            inner.hnsw.efConstruction = settings.faiss_hnsw_ef_construction
+            inner.hnsw.efSearch = settings.faiss_hnsw_ef_search
+            return faiss.IndexIDMap2(inner), 'hnsw+int8' if sq else 'hnsw'
+        if sq:
+            inner = faiss.IndexScalarQuantizer(self.index_dim, qtype, faiss.METRIC_INNER_PRODUCT)
+            inner.train(self._train_sample(live_rows, 100_000))
+            return faiss.IndexIDMap2(inner), 'flat+int8'
+        return faiss.IndexIDMap2(faiss.IndexFlatIP(self.index_dim)), 'flat'
+
+    def _encode(self, mat: np.ndarray) -> np.ndarray:
+        """Rows as the index expects them (renormalised prefix for coarse, packed sign bits for binary)."""
+        if self.coarse_dim:
+            mat = np.asarray(mat[:, :self.coarse_dim], dtype=np.float32)
+            norms = np.linalg.norm(mat, axis=1, keepdims=True)
+            mat = mat / np.where(norms > 0, norms, 1.0)
+        if self.quant == 'binary':
+            return np.packbits(mat > 0, axis=1)
+        return np.ascontiguousarray(mat)
+
+    def _quantized(self) -> bool:
+        return '+' in (self._built_kind or '')
+
+    def _rescored(self) -> bool:
+        """Index scores are approximate (codes or a coarse prefix) and get recomputed from the float rows."""
+        return self.coarse_dim > 0 or self._quantized()
+
+    def _add_rows(self, index, rows: np.ndarray, batch: int = 65536):
+        for i in range(0, len(rows), batch):
+            part = rows[i:i + batch]
+            index.add_with_ids(self._encode(self._vecs[part]), part.astype(np.int64))
+
+    def _live_rows(self) -> np.ndarray:
+        return np.fromiter((r for (r,) in self._conn.execute('SELECT row FROM rows WHERE live=1 ORDER BY row')), dtype=np.int64)
+
+    def _rebuild(self):
+        """Compact out tombstoned rows, then build a fresh index over the live ones."""
+        live = self._live_rows()
+        if len(live) < self._n:
+            self._compact(live)
+            live = np.arange(len(live), dtype=np.int64)
+        self._index, self._built_kind = self._new_index(live)
+        self._add_rows(self._index, live)
+        self._indexed = self._n
+        self.save()
+
+    def _compact(self, live: np.ndarray):
+        tmp = self._vec_path + '.compact'
+        capacity = max(len(live), _MIN_CAPACITY)
+        with open(tmp, 'wb') as f:
+            f.truncate(capacity * self.dim * 4)
+        out = np.memmap(tmp, dtype=np.float32, mode='r+', shape=(capacity, self.dim))
+        for i in range(0, len(live), 65536):
+            out[i:i + 65536] = self._vecs[live[i:i + 65536]]
+        out.flush()
+        del out
+        self._conn.execute('DELETE FROM rows WHERE live=0')
+        # ascending renumbering never collides: each live row moves to its rank, which is <= its old row
+        self._conn.executemany('UPDATE rows SET row=? WHERE row=?', [(i, int(r)) for i, r in enumerate(live) if i != r])
+        self._conn.commit()
+        self._vecs = None
+        os.replace(tmp, self._vec_path)
+        self._open_vectors(capacity)
+        self._n = len(live)
+
+    def _load_index(self) -> Tuple[Any, int]:
+        meta = {}
+        if os.path.exists(self._meta_path):
+            with open(self._meta_path, 'r') as f:
+                meta = json.load(f)
+        self._built_kind = meta.get('kind')
+        usable = (meta.get('dim') == self.dim and meta.get('requested') == self.kind
+                  and meta.get('quantization', 'none') == self.quant and meta.get('coarse_dim', 0) == self.coarse_dim and int(meta.get('indexed_rows', 0)) <= self._n)
+        if os.path.exists(self._idx_path) and usable:
+            try:
+                if self.quant == 'binary':
+                    index = faiss.read_index_binary(self._idx_path)
+                    if self._built_kind == 'hnsw+binary':
+                        faiss.downcast_IndexBinary(index.index).hnsw.efSearch = settings.faiss_hnsw_ef_search
+                else:
+                    index = faiss.read_index(self._idx_path)
+                if self._built_kind in ('ivf', 'ivf+int8'):
+                    index.nprobe = settings.faiss_nprobe
+                elif self._built_kind in ('hnsw', 'hnsw+int8'):
+                    faiss.downcast_index(index.index).hnsw.efSearch = settings.faiss_hnsw_ef_search
+                indexed = int(meta.get('indexed_rows', 0))
+                if indexed < self._n:
+                    # rows appended after the last save: catch up from the memmap
+                    missing = np.fromiter((r for (r,) in self._conn.execute(
+                        'SELECT row FROM rows WHERE live=1 AND row>=? ORDER BY row', (indexed,))), dtype=np.int64)
+                    self._add_rows(index, missing)
+                    self._unsaved += len(missing)
+                return index, self._n
+            except Exception as e:
+                print(f"[FAISS] {self.name}: unreadable index, rebuilding: {e}")
+        self._index = None
+        self._rebuild()
+        return self._index, self._indexed
+
+    def save(self):
+        with self._lock:
+            self._vecs.flush()
+            tmp = self._idx_path + '.tmp'
+            if self.quant == 'binary':
+                faiss.write_index_binary(self._index, tmp)
+            else:
+                faiss.write_index(self._index, tmp)
+            os.replace(tmp, self._idx_path)
+            with open(self._meta_path + '.tmp', 'w') as f:
+                json.dump({'dim': self.dim, 'requested': self.kind, 'quantization': self.quant, 'coarse_dim': self.coarse_dim,
+                           'kind': self._built_kind, 'indexed_rows': self._indexed}, f)
+            os.replace(self._meta_path + '.tmp', self._meta_path)
+            self._unsaved = 0
+
+    # ---------------- writes ----------------
+    def add(self, ids: Sequence[str], vectors: Sequence[Sequence[float]], texts: Sequence[str], metadatas: Sequence[Dict[str, Any]]):
+        """Append points (re-upserted point ids tombstone their previous row)."""
+        if not ids:
+            return
+        mat = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(mat, axis=1, keepdims=True)
+        mat = mat / np.where(norms > 0, norms, 1.0)
+        with self._lock:
+            replaced = self._conn.execute(
+                f"UPDATE rows SET live=0 WHERE live=1 AND point_id IN ({','.join('?' * len(ids))})", list(ids)
+            ).rowcount
+            rows = np.arange(self._n, self._n + len(ids), dtype=np.int64)
+            self._ensure_capacity(self._n + len(ids))
+            self._vecs[rows[0]:rows[-1] + 1] = mat
+            self._conn.executemany(
+                'INSERT INTO rows (row, point_id, source_file, payload, live) VALUES (?, ?, ?, ?, 1)',
+                [(int(r), pid, meta.get('source_file'), json.dumps({'page_content': txt, 'metadata': meta}))
+                 for r, pid, txt, meta in zip(rows, ids, texts, metadatas)]
+            )
+            self._conn.commit()
+            self._index.add_with_ids(self._encode(mat), rows)
+            self._n += len(ids)
+            self._indexed = self._n
+            self._live += len(ids) - replaced
+            self._unsaved += len(ids)
+            self._maybe_rebuild()
+            if self._unsaved >= settings.faiss_save_every:
+                self.save()
+
+    def reset(self):
+        """Drop every row (used to resync the mirror from its collection)."""
+        with self._lock:
+            self._conn.execute('DELETE FROM rows')
+            self._conn.commit()
+            self._n = self._live = 0
+            self._rebuild()
+
+    def remove_file(self, source_file: str) -> int:
+        with self._lock:
+            n = self._conn.execute('UPDATE rows SET live=0 WHERE live=1 AND source_file=?', (source_file,)).rowcount
+            self._conn.commit()
+            self._live -= n
+            self._maybe_rebuild()
+            self.save()
+        return n
+
+    def _trainable(self) -> bool:
+        """The built index is a stand-in for one that needed more rows to train, and there are enough now."""
+        built = self._built_kind or ''
+        if self.kind == 'ivf' and not built.startswith('ivf') and self._live >= _ivf_nlist(self._live) * _IVF_TRAIN_PER_LIST:
+            return True
+        return self.quant == 'int8' and not built.endswith('+int8') and self._live >= _SQ_TRAIN_MIN
+
+    def _maybe_rebuild(self):
+        dead = self._n - self._live
+        if self._trainable() or (dead > _MIN_CAPACITY and dead > settings.faiss_rebuild_dead_ratio * self._n):
+            if settings.rag_debug:
+                print(f"[FAISS] {self.name}: rebuilding live={self._live} dead={dead} kind={self.kind} quantization={self.quant}")
+            self._rebuild()
+
+    # ---------------- search ----------------
+    def __len__(self) -> int:
+        return self._live
+
+    def search(self, vector: Sequence[float], top_k: int, source_files: Optional[Iterable[str]] = None) -> List[Tuple[float, str, Dict[str, Any]]]:
+        """Top-k (cosine score, page_content, metadata), best first."""
+        q = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(q))
+        if norm > 0:
+            q = q / norm
+        with self._lock:
+            if self._live == 0 or top_k <= 0:
+                return []
+            files = sorted(set(source_files)) if source_files else None
+            if files is not None:
+                rows = np.fromiter((r for (r,) in self._conn.execute(
+                    f"SELECT row FROM rows WHERE live=1 AND source_file IN ({','.join('?' * len(files))})", files)), dtype=np.int64)
+                if len(rows) <= settings.faiss_exact_filter_max:
+                    # selective filter: exact scores over the selected files' rows
+                    if len(rows) == 0:
+                        return []
+                    scores = np.asarray(self._vecs[rows] @ q)
+                    k = min(top_k, len(rows))
+                    top = np.argpartition(-scores, k - 1)[:k] if k < len(rows) else np.arange(len(rows))
+                    top = top[np.argsort(-scores[top])]
+                    return self._hydrate([(float(scores[i]), int(rows[i])) for i in top])
+            dead = self._n - self._live
+            fetch = math.ceil(top_k * (settings.quantization_oversample if self._quantized() else 1))
+            if self.coarse_dim:
+                fetch = max(fetch, settings.coarse_candidates)
+            fetch *= (2 if dead else 1) * (4 if files is not None else 1)
+            D, I = self._index.search(self._encode(q.reshape(1, -1)), min(fetch, self._n))
+            hits = [(float(d), int(i)) for d, i in zip(D[0], I[0]) if i >= 0]
+            if self._rescored() and hits:
+                # rescore the oversampled candidates with the full-precision, full-width rows from disk
+                rows = np.array([r for _, r in hits], dtype=np.int64)
+                exact = np.asarray(self._vecs[rows] @ q)
+                hits = [(float(exact[i]), int(rows[i])) for i in np.argsort(-exact)]
+            return self._hydrate(hits, top_k, files)
+
+    def _hydrate(self, hits: List[Tuple[float, int]], top_k: Optional[int] = None, files: Optional[List[str]] = None) -> List[Tuple[float, str, Dict[str, Any]]]:
+        if not hits:
+            return []
+        rows = [r for _, r in hits]
+        payloads = {r: (p, live, src) for r, p, live, src in self._conn.execute(
+            f"SELECT row, payload, live, source_file FROM rows WHERE row IN ({','.join('?' * len(rows))})", rows)}
+        out = []
+        for score, r in hits:
+            entry = payloads.get(r)
+            if entry is None or not entry[1] or (files is not None and entry[2] not in files):
+                continue
+            payload = json.loads(entry[0])
+            out.append((score, payload.get('page_content', ''), payload.get('metadata') or {}))
+            if top_k is not None and len(out) >= top_k:
+                break
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'live': self._live, 'rows': self._n, 'dead': self._n - self._live,
+                    'kind': self._built_kind, 'requested': self.kind, 'quantization': self.quant,
+                    'coarse_dim': self.coarse_dim,
+                    'unsaved': self._unsaved}
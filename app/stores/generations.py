@@ -0,0 +1,220 @@
+"""Index generations: immutable, self-contained builds of the derived stores.
+
+Each generation lives in persist_dir/generations/<id>/ and holds its own
+qdrant/ (embedded mode), faiss/, catalog.sqlite, dedup.sqlite, tables.sqlite,
+facts.sqlite and ingest_manifest.json plus generation.json (status, ingest
+fingerprint, embedding model / width, counts). persist_dir/CURRENT names the active one
+and is replaced atomically; without it the stores sit directly under
+persist_dir (the pre-generation layout, reported as 'legacy').
+With a shared index (qdrant_url) a generation's collections are
+prefixed with its id instead of living in its directory.
+
+The embedding cache and parse cache stay shared under persist_dir, so a
+rebuild only pays for texts that actually changed.
+
+Usage (from the repo root):
+    python -m app.stores.generations list
+    python -m app.stores.generations build [--activate]
+    python -m app.stores.generations activate <id>
+    python -m app.stores.generations gc [--keep 2]
+
+`build` opens the active generation, whose embedded Qdrant directory is
+locked by a running server: stop the server first, or ask the server to
+rebuild itself with POST /generations/rebuild (which also catches up on
+writes made during the build and swaps without downtime).
+"""
+
+import json
+import os
+import shutil
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+LEGACY = 'legacy'
+_META = 'generation.json'
+# per-generation entries of the legacy layout (removed when the legacy generation is collected)
+_LEGACY_ENTRIES = ('qdrant', 'faiss', 'catalog.sqlite', 'catalog.sqlite-wal', 'catalog.sqlite-shm',
+                   'dedup.sqlite', 'dedup.sqlite-wal', 'dedup.sqlite-shm', 'tables.sqlite', 'facts.sqlite',
+                   'ingest_manifest.json', _META)
+
+
+def generations_dir() -> str:
+    return os.path.join(settings.persist_dir, 'generations')
+
+
+def _current_path() -> str:
+    return os.path.join(settings.persist_dir, 'CURRENT')
+
+
+def active_generation() -> str:
+    """Id of the generation readers should open (LEGACY when none was ever activated)."""
+    try:
+        with open(_current_path(), 'r') as f:
+            gen = f.read().strip()
+    except FileNotFoundError:
+        return LEGACY
+    return gen or LEGACY
+
+
+def generation_root(gen: str) -> str:
+    if gen == LEGACY:
+        return settings.persist_dir
+    return os.path.join(generations_dir(), gen)
+
+
+def collection_prefix(gen: str) -> str:
+    """Shared-index collections are namespaced per generation; embedded ones are isolated by directory."""
+    if gen == LEGACY or not settings.qdrant_url:
+        return ''
+    return f"{gen}__"
+
+
+def new_generation_id() -> str:
+    return time.strftime('g%Y%m%d-%H%M%S-') + uuid.uuid4().hex[:6]
+
+
+def read_meta(gen: str) -> Dict[str, Any]:
+    path = os.path.join(generation_root(gen), _META)
+    if not os.path.exists(path):
+        return {'id': gen}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def write_meta(gen: str, **fields) -> Dict[str, Any]:
+    meta = {**read_meta(gen), **fields, 'id': gen}
+    root = generation_root(gen)
+    os.makedirs(root, exist_ok=True)
+    tmp = os.path.join(root, _META + '.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(meta, f, indent=1)
+    os.replace(tmp, os.path.join(root, _META))
+    return meta
+
+
+def set_active(gen: str):
+    """Atomically point CURRENT at a generation."""
+    previous = active_generation()
+    tmp = _current_path() + '.tmp'
+    with open(tmp, 'w') as f:
+        f.write(gen)
+    os.replace(tmp, _current_path())
+    write_meta(gen, status='active', activated_at=time.time())
+    if previous != gen:
+        write_meta(previous, status='ready', deactivated_at=time.time())
+    print(f"[GENERATION] active={gen}")
+
+
+def list_generations() -> List[Dict[str, Any]]:
+    """Known generations, oldest first, each flagged with whether it is active."""
+    active = active_generation()
+    gens = []
+    if os.path.exists(os.path.join(settings.persist_dir, 'qdrant')) or os.path.exists(os.path.join(settings.persist_dir, 'catalog.sqlite')):
+        gens.append({**read_meta(LEGACY), 'created_at': 0})
+    if os.path.isdir(generations_dir()):
+        for name in sorted(os.listdir(generations_dir())):
+            if os.path.isdir(os.path.join(generations_dir(), name)):
+                gens.append(read_meta(name))
+    for g in gens:
+        g['active'] = g['id'] == active
+    return gens
+
+
+def collect_garbage(keep: Optional[int] = None, protect: Optional[List[str]] = None, qdrant=None) -> List[str]:
+    """Delete all but the newest `keep` finished generations (never the active or a protected one).
+
+    Failed or abandoned builds are always removed. `qdrant` is a shared-index
+    client whose prefixed collections are dropped with their generation.
+    """
+    keep = settings.generation_keep if keep is None else keep
+    protect = set(protect or []) | {active_generation()}
+    gens = list_generations()
+    finished = [g for g in gens if g.get('status') not in ('building', 'failed') or g['id'] == LEGACY]
+    kept = {g['id'] for g in finished[-keep:]} if keep > 0 else set()
+    removed, failed = [], {}
+    for g in gens:
+        gen = g['id']
+        if gen in protect or gen in kept:
+            continue
+        if g.get('status') == 'building' and time.time() - g.get('created_at', 0) < settings.generation_stale_build_seconds:
+            continue  # possibly still being built by another process
+        try:
+            _remove(gen, qdrant)
+        except Exception as e:
+            failed[gen] = str(e)
+            print(f"[GENERATION] ERROR collecting {gen}: {e}")
+            continue
+        removed.append(gen)
+    if removed:
+        print(f"[GENERATION] collected={removed}")
+    if failed:
+        raise RuntimeError(f"generation GC failed for {sorted(failed)}: {failed}")
+    return removed
+
+
+def _remove(gen: str, qdrant=None):
+    # collections go first: if dropping one fails the directory stays, so the next GC retries it
+    if qdrant is not None and collection_prefix(gen):
+        prefix = collection_prefix(gen)
+        for c in qdrant.get_collections().collections:
+            if c.name.startswith(prefix):
+                qdrant.delete_collection(c.name)
+    root = generation_root(gen)
+    if gen == LEGACY:
+        for name in _LEGACY_ENTRIES:
+            path = os.path.join(root, name)
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            elif os.path.exists(path):
+                os.remove(path)
+        return
+    shutil.rmtree(root, ignore_errors=True)
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    sub.add_parser('list')
+    build = sub.add_parser('build', help='build a generation from the active catalog under the current settings')
+    build.add_argument('--activate', action='store_true')
+    act = sub.add_parser('activate')
+    act.add_argument('generation')
+    gc = sub.add_parser('gc')
+    gc.add_argument('--keep', type=int, default=None)
+    args = parser.parse_args()
+
+    if args.cmd == 'list':
+        for g in list_generations():
+            print(json.dumps(g))
+    elif args.cmd == 'build':
+        from app.stores.main_store import MainStore
+        try:
+            current = MainStore()
+        except RuntimeError as e:  # embedded Qdrant already opened by the server
+            raise SystemExit(f"cannot open the active generation: {e}\n"
+                             "Stop the server first, or use POST /generations/rebuild on the running server.")
+        new = current.build_generation()
+        if args.activate:
+            set_active(new.generation)
+        new.close()
+        current.close()
+    elif args.cmd == 'activate':
+        if read_meta(args.generation).get('status') not in ('ready', 'active', None) or not os.path.isdir(generation_root(args.generation)):
+            raise SystemExit(f"generation {args.generation} is not a finished build")
+        set_active(args.generation)
+    elif args.cmd == 'gc':
+        qdrant = None
+        if settings.qdrant_url:
+            from qdrant_client import QdrantClient
+            qdrant = QdrantClient(url=settings.qdrant_url, api_key=settings.qdrant_api_key or None)
+        collect_garbage(args.keep, qdrant=qdrant)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from app.core.config import get_settings
+from app.core.hashing import file_sha256, config_fingerprint
+from app.services.filing_metadata import FILING_METADATA_VERSION
+from app.services.openai_client import embeddings_are_fake
+from app.services.pdf_loader import PARSER_VERSION
+
+settings = get_settings()
+
+
+def ingest_fingerprint() -> str:
+    """Digest of every setting that changes what ingestion writes to the stores."""
+    config = {
+        'parser_version': PARSER_VERSION,
+        'filing_metadata_version': FILING_METADATA_VERSION,
+        'simple_pdf_parser': settings.simple_pdf_parser,
+        'enable_table_extraction': settings.enable_table_extraction,
+        'chunk_strategy': settings.chunk_strategy,
+        'chunk_size': settings.chunk_size,
+        'chunk_overlap': settings.chunk_overlap,
+        'max_chunk_size': settings.max_chunk_size,
+        'sentence_split_regex': settings.sentence_split_regex,
+        'summary_chars': settings.summary_chars,
+        'table_store_enabled': settings.table_store_enabled,
+        'fact_store_enabled': settings.fact_store_enabled,
+        'embedding_model': settings.embedding_model,
+        'embedding_dim': settings.embedding_dim,
+        'dedup_enabled': settings.dedup_enabled,
+        'dedup_max_hamming': settings.dedup_max_hamming,
+    }
+    if embeddings_are_fake():
+        # pseudo vectors: stale as soon as a real key is configured (key absent otherwise, so real fingerprints are unchanged)
+        config['fake_embeddings'] = True
+    return config_fingerprint(config)
+
+
+class IngestManifest:
+    """Persistent record of which file contents were ingested under which config.
+
+    Entries are keyed by filename and hold the content sha256, the ingest
+    fingerprint and the file stat seen at ingest time. An unchanged stat skips
+    hashing entirely; otherwise the file is hashed and compared, so a touched
+    but identical file is still skipped.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.path.join(settings.persist_dir, 'ingest_manifest.json')
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r') as f:
+                self._entries = json.load(f).get('files', {})
+        except Exception as e:
+            print(f"[MANIFEST] unreadable manifest {self.path}, starting empty: {e}")
+            self._entries = {}
+
+    def _save(self):
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'files': self._entries}, f)
+        os.replace(tmp, self.path)
+
+    def check(self, path: str, fingerprint: Optional[str] = None) -> Dict[str, Any]:
+        """Decide whether a file needs ingestion.
+
+        Returns {'needs_ingest': bool, 'sha256': str | None, 'reason': str}.
+        sha256 is filled whenever the file had to be hashed so callers can pass it to record().
+        """
+        fingerprint = fingerprint or ingest_fingerprint()
+        name = os.path.basename(path)
+        st = os.stat(path)
+        with self._lock:
+            entry = self._entries.get(name)
+        if entry is None:
+            return {'needs_ingest': True, 'sha256': None, 'reason': 'new'}
+        if entry.get('fingerprint') != fingerprint:
+            return {'needs_ingest': True, 'sha256': None, 'reason': 'config_changed'}
+        if entry.get('size') == st.st_size and entry.get('mtime_ns') == st.st_mtime_ns:
+            return {'needs_ingest': False, 'sha256': entry.get('sha256'), 'reason': 'unchanged'}
+        digest = file_sha256(path)
+        if digest == entry.get('sha256'):
+            # content identical, only the stat moved: refresh stat so next check is O(1)
+            with self._lock:
+                entry.update(size=st.st_size, mtime_ns=st.st_mtime_ns)
+                self._save()
+            return {'needs_ingest': False, 'sha256': digest, 'reason': 'unchanged'}
+        return {'needs_ingest': True, 'sha256': digest, 'reason': 'modified'}
+
+    def record(self, path: str, sha256: Optional[str] = None, fingerprint: Optional[str] = None, **meta):
+        st = os.stat(path)
+        entry = {
+            'sha256': sha256 or file_sha256(path),
+            'fingerprint': fingerprint or ingest_fingerprint(),
+            'size': st.st_size,
+            'mtime_ns': st.st_mtime_ns,
+            'ingested_at': time.time(),
+            **meta,
+        }
+        with self._lock:
+            self._entries[os.path.basename(path)] = entry
+            self._save()
+
+    def forget(self, filename: str):
+        with self._lock:
+            if self._entries.pop(filename, None) is not None:
+                self._save()
+
+    def get(self, filename: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._entries.get(filename)
+
+    def filenames(self) -> List[str]:
+        with self._lock:
+            return sorted(self._entries)
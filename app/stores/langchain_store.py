@@ -1,17 +1,61 @@
 import os
+import threading
 import uuid
-from typing import List, Dict, Any
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Iterable, Optional
 
 from app.core.config import get_settings
 from app.services.openai_client import OpenAIClient
+from app.stores.dedup_index import DedupIndex, simhash, numeric_signature
+from app.stores.doc_catalog import DocCatalog
+from app.services.filing_metadata import extract_filing_metadata, resolve_filings
+from app.stores.fact_store import FactStore
+from app.stores.summary_index import SummaryIndex
+from app.stores.table_store import TableStore
+from app.stores import faiss_index
 
 settings = get_settings()
 
-from langchain_community.embeddings import OpenAIEmbeddings
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
 from langchain_community.vectorstores import Qdrant as LCQdrant
 from qdrant_client import QdrantClient
 from qdrant_client.http import models as qmodels
 
+# LangChain's Qdrant wrapper nests metadata under the 'metadata' payload key
+SOURCE_FILE_KEY = 'metadata.source_file'
+# filing metadata on document summaries (see record_filing)
+FILING_INDEXES = (('metadata.issuer', qmodels.PayloadSchemaType.KEYWORD), ('metadata.form_type', qmodels.PayloadSchemaType.KEYWORD),
+                  ('metadata.fiscal_year', qmodels.PayloadSchemaType.INTEGER))
+
+
+class ClientEmbeddings(Embeddings):
+    """LangChain embeddings adapter over OpenAIClient.
+
+    Routes every store embedding through the client's cache and the shared
+    rate-limit-aware EmbeddingScheduler instead of a separate OpenAI client.
+    """
+
+    def __init__(self, client: OpenAIClient):
+        self.client = client
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [v.tolist() for v in self.client.embed_texts(texts)]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.client.embed_texts([text])[0].tolist()
+
+
+@dataclass
+class PointBatch:
+    """Embedded points for one collection, ready to upsert (see LangChainStore.write)."""
+    collection: str
+    texts: List[str] = field(default_factory=list)
+    metadatas: List[Dict[str, Any]] = field(default_factory=list)
+    ids: List[str] = field(default_factory=list)
+    vectors: List[List[float]] = field(default_factory=list)
+    rows: List[Optional[List[List[str]]]] = field(default_factory=list)  # tables: full rows for the table store
+
 
 class LangChainStore:
     """Simple dense vector retrieval using Qdrant.
@@ -20,22 +64,79 @@ class LangChainStore:
     Each uses OpenAI embeddings for dense semantic search.
     """
 
-    def __init__(self):
-        self.emb_client = OpenAIClient()
-        self.embedding = OpenAIEmbeddings(model=settings.embedding_model, openai_api_key=settings.openai_api_key)
-        # persistence directory & embedded Qdrant
-        self.persist_dir = os.path.join(settings.persist_dir, 'qdrant')
-        os.makedirs(self.persist_dir, exist_ok=True)
-        self.qdrant = QdrantClient(path=self.persist_dir)
-        self.col_docs = 'docs'
-        self.col_chunks = 'chunks'
-        self.col_tables = 'tables'
+    def __init__(self, root: Optional[str] = None, collection_prefix: str = '',
+                 embedding_model: Optional[str] = None, embedding_dim: Optional[int] = None):
+        # root: directory of this index generation's stores (see app.stores.generations)
+        self.root = root or settings.persist_dir
+        self.emb_client = OpenAIClient(embedding_model, embedding_dim)
+        self.embedding = ClientEmbeddings(self.emb_client)
+        # persistence directory & embedded Qdrant, or a shared index other workers also use
+        self.persist_dir = os.path.join(self.root, 'qdrant')
+        self.shared = bool(settings.qdrant_url)
+        if self.shared:
+            self.qdrant = QdrantClient(url=settings.qdrant_url, api_key=settings.qdrant_api_key or None)
+        else:
+            os.makedirs(self.persist_dir, exist_ok=True)
+            self.qdrant = QdrantClient(path=self.persist_dir)
+        # the embedded client is not safe for concurrent writes (parallel ingestion embeds in threads)
+        self._write_lock = threading.Lock()
+        self.col_docs = f'{collection_prefix}docs'
+        self.col_chunks = f'{collection_prefix}chunks'
+        self.col_tables = f'{collection_prefix}tables'
+        self.dim = self.emb_client.embedding_dim
         # vectorstore instances
         self._docs_vs = None
         self._chunks_vs = None
         self._tables_vs = None
         self._ensure_collections()
         self._load_persisted()
+        # near-duplicate fingerprints of stored chunks (persisted next to the collections)
+        self.dedup = DedupIndex(os.path.join(self.root, 'dedup.sqlite')) if settings.dedup_enabled else None
+        # per-file rows and point ids; list/count/delete never scan the collections
+        self.catalog = DocCatalog(os.path.join(self.root, 'catalog.sqlite'))
+        # full table rows; vector payloads only carry the short projection that is embedded
+        self.tables = TableStore(os.path.join(self.root, 'tables.sqlite')) if settings.table_store_enabled else None
+        # numeric facts parsed from those rows, for direct metric / fiscal-year lookups
+        self.facts = FactStore(os.path.join(self.root, 'facts.sqlite')) if settings.fact_store_enabled else None
+        if self.catalog.is_empty():
+            self._backfill_catalog()
+        self._catalog_version = self.catalog.data_version()
+        # doc routing is an in-memory matmul over all summary vectors
+        self.summary_index = None
+        if settings.doc_index_in_memory:
+            self.summary_index = SummaryIndex()
+            self.summary_index.load(self.qdrant, self.col_docs)
+        # optional FAISS search mirror of chunks/tables (Qdrant keeps payloads, vectors for dedup, deletes)
+        self.faiss: Dict[str, 'faiss_index.FaissIndex'] = {}
+        if settings.retrieval_backend == 'faiss':
+            if self.shared:
+                # the mirror is per-process and only sees this worker's writes
+                print("[FAISS] mirror disabled with a shared index (qdrant_url); searching Qdrant")
+            elif faiss_index.faiss is None:
+                print("[FAISS] faiss-cpu not installed; falling back to Qdrant search")
+            else:
+                self._open_faiss()
+
+    def _open_faiss(self):
+        for name in [self.col_chunks, self.col_tables]:
+            mirror = faiss_index.FaissIndex(name, self.dim, root=os.path.join(self.root, 'faiss'))
+            expected = self.qdrant.count(collection_name=name, exact=True).count
+            if len(mirror) != expected:
+                # first start with FAISS, or the mirror missed writes: resync from the collection
+                print(f"[FAISS] resync {name}: mirror={len(mirror)} collection={expected}")
+                mirror.reset()
+                offset = None
+                while True:
+                    points, offset = self.qdrant.scroll(collection_name=name, limit=1000, offset=offset,
+                                                        with_payload=True, with_vectors=True)
+                    if points:
+                        mirror.add([str(p.id) for p in points], [p.vector for p in points],
+                                   [(p.payload or {}).get('page_content', '') for p in points],
+                                   [(p.payload or {}).get('metadata') or {} for p in points])
+                    if offset is None:
+                        break
+                mirror.save()
+            self.faiss[name] = mirror
 
     # ---------------- Persistence ----------------
     def _save_persisted(self):
@@ -48,17 +149,203 @@ class LangChainStore:
         self._chunks_vs = LCQdrant(client=self.qdrant, collection_name=self.col_chunks, embeddings=self.embedding)
         self._tables_vs = LCQdrant(client=self.qdrant, collection_name=self.col_tables, embeddings=self.embedding)
 
+    def _quantization_config(self, collection: str):
+        """Qdrant quantization for chunks/tables (docs stay float; they are searched in memory)."""
+        if collection == self.col_docs or settings.vector_quantization == 'none':
+            return None
+        if settings.vector_quantization == 'binary':
+            return qmodels.BinaryQuantization(binary=qmodels.BinaryQuantizationConfig(always_ram=True))
+        return qmodels.ScalarQuantization(scalar=qmodels.ScalarQuantizationConfig(
+            type=qmodels.ScalarType.INT8, quantile=0.99, always_ram=True))
+
+    def _search_params(self, collection: str) -> Optional[qmodels.SearchParams]:
+        if self._quantization_config(collection) is None:
+            return None
+        # oversampled search on the codes, rescored with the original vectors (kept on disk)
+        return qmodels.SearchParams(quantization=qmodels.QuantizationSearchParams(
+            rescore=True, oversampling=settings.quantization_oversample))
+
     def _ensure_collections(self):
-        dim = 1536  # OpenAI text-embedding-3-small dimension
+        dim = self.dim
         existing = {c.name for c in self.qdrant.get_collections().collections}
         for name in [self.col_docs, self.col_chunks, self.col_tables]:
+            quantization = self._quantization_config(name)
             if name not in existing:
                 self.qdrant.create_collection(
                     collection_name=name,
-                    vectors_config=qmodels.VectorParams(size=dim, distance=qmodels.Distance.COSINE)
+                    vectors_config=qmodels.VectorParams(size=dim, distance=qmodels.Distance.COSINE,
+                                                        on_disk=quantization is not None),
+                    quantization_config=quantization
+                )
+            else:
+                size = self.qdrant.get_collection(name).config.params.vectors.size
+                if size != dim:
+                    raise ValueError(f"collection {name} stores {size}-dim vectors but embedding_dim={dim}; "
+                                     f"rebuild the index generation after changing the embedding width")
+            if name in existing and quantization is not None:
+                # switch an existing collection over (no-op in embedded mode, which always searches floats)
+                try:
+                    if self.qdrant.get_collection(name).config.quantization_config != quantization:
+                        self.qdrant.update_collection(collection_name=name, quantization_config=quantization)
+                except Exception as e:
+                    print(f"[ENSURE] quantization update failed collection={name}: {e}")
+            # keyword index so per-document filters are resolved inside Qdrant (idempotent)
+            try:
+                self.qdrant.create_payload_index(
+                    collection_name=name,
+                    field_name=SOURCE_FILE_KEY,
+                    field_schema=qmodels.PayloadSchemaType.KEYWORD
                 )
+            except Exception as e:
+                if settings.rag_debug:
+                    print(f"[ENSURE] payload index skipped collection={name}: {e}")
+        for field_name, schema in FILING_INDEXES:
+            try:
+                self.qdrant.create_payload_index(collection_name=self.col_docs, field_name=field_name, field_schema=schema)
+            except Exception as e:
+                if settings.rag_debug:
+                    print(f"[ENSURE] payload index skipped collection={self.col_docs} field={field_name}: {e}")
+
+    def _source_filter(self, source_files: Optional[Iterable[str]]) -> Optional[qmodels.Filter]:
+        """Build a Qdrant filter restricting hits to the given source files (None = no restriction)."""
+        if not source_files:
+            return None
+        return qmodels.Filter(must=[
+            qmodels.FieldCondition(key=SOURCE_FILE_KEY, match=qmodels.MatchAny(any=sorted(set(source_files))))
+        ])
 
     # ---------------- Adding Documents ----------------
+    def _upsert(self, collection: str, texts: List[str], metadatas: List[Dict[str, Any]], ids: List[str], vectors: List[List[float]]):
+        """Write points in LangChain's payload layout so LCQdrant reads them back unchanged."""
+        points = [
+            qmodels.PointStruct(id=pid, vector=list(vec), payload={'page_content': txt, 'metadata': meta})
+            for pid, vec, txt, meta in zip(ids, vectors, texts, metadatas)
+        ]
+        with self._write_lock:
+            self.qdrant.upsert(collection_name=collection, points=points)
+
+    def write(self, batch: 'PointBatch') -> int:
+        """Upsert a prepared batch; returns the number of points written."""
+        if not batch.ids:
+            return 0
+        self._upsert(batch.collection, batch.texts, batch.metadatas, batch.ids, batch.vectors)
+        self.catalog.add_points(batch.metadatas[0]['source_file'], batch.collection, batch.ids)
+        if batch.rows and self.tables is not None:
+            self.tables.add(batch.metadatas[0]['source_file'],
+                            [(m['original_id'], m.get('page'), rows) for m, rows in zip(batch.metadatas, batch.rows) if rows])
+        if batch.rows and self.facts is not None:
+            self.facts.add_tables(batch.metadatas[0]['source_file'],
+                                  [(m['original_id'], m.get('page'), rows, m.get('unit', ''))
+                                   for m, rows in zip(batch.metadatas, batch.rows) if rows])
+        if batch.collection == self.col_docs and self.summary_index is not None:
+            self.summary_index.upsert(batch.ids, batch.vectors, batch.texts, batch.metadatas)
+        mirror = self.faiss.get(batch.collection)
+        if mirror is not None:
+            mirror.add(batch.ids, batch.vectors, batch.texts, batch.metadatas)
+        return len(batch.ids)
+
+    def prepare_summary(self, filename: str, summary: str, filing: Optional[Dict[str, Any]] = None) -> 'PointBatch':
+        """Embed a document summary without writing it (see write); filing metadata goes into its payload."""
+        if not summary:
+            return PointBatch(self.col_docs)
+        doc_uuid = str(uuid.uuid5(uuid.NAMESPACE_DNS, f'doc-{filename}'))
+        meta = {**(filing or {}), 'source_file': filename, 'type': 'summary', 'original_id': f'doc-{filename}'}
+        return PointBatch(self.col_docs, [summary], [meta], [doc_uuid], self.embedding.embed_documents([summary]))
+
+    def prepare_chunks(self, filename: str, chunks: List[Dict[str, Any]]) -> 'PointBatch':
+        """Embed one batch of chunks without writing it (see write).
+
+        Near-duplicates of an already stored chunk reuse its vector instead of
+        being embedded and are tagged with is_duplicate / dup_group.
+        """
+        if not chunks:
+            return PointBatch(self.col_chunks)
+        texts = [c['text'] for c in chunks]
+        metadatas = [{**c.get('metadata', {}), 'source_file': filename, 'original_id': c['id']} for c in chunks]
+        # Generate UUIDs for chunk IDs
+        ids = [str(uuid.uuid5(uuid.NAMESPACE_DNS, c['id'])) for c in chunks]
+        vectors = self._chunk_vectors(filename, texts, metadatas, ids)
+        return PointBatch(self.col_chunks, texts, metadatas, ids, vectors)
+
+    def prepare_tables(self, filename: str, tables: List[Dict[str, Any]]) -> 'PointBatch':
+        """Embed one batch of tables without writing it (see write)."""
+        if not tables:
+            return PointBatch(self.col_tables)
+        texts = [t['text'] for t in tables]
+        metadatas = [{**t.get('metadata', {}), 'source_file': filename, 'type': 'table', 'original_id': t['id']} for t in tables]
+        # Generate UUIDs for table IDs
+        ids = [str(uuid.uuid5(uuid.NAMESPACE_DNS, t['id'])) for t in tables]
+        return PointBatch(self.col_tables, texts, metadatas, ids, self.embedding.embed_documents(texts),
+                          [t.get('raw') for t in tables])
+
+    def add_summary(self, filename: str, summary: str, filing: Optional[Dict[str, Any]] = None) -> int:
+        return self.write(self.prepare_summary(filename, summary, filing))
+
+    def add_chunks(self, filename: str, chunks: List[Dict[str, Any]]) -> int:
+        """Embed and upsert one batch of chunks; returns the number written."""
+        return self.write(self.prepare_chunks(filename, chunks))
+
+    def _chunk_vectors(self, filename: str, texts: List[str], metadatas: List[Dict[str, Any]], ids: List[str]) -> List[List[float]]:
+        if self.dedup is None:
+            return self.embedding.embed_documents(texts)
+        canonical_of: Dict[int, str] = {}
+        entries = []
+        batch_canon: List[tuple] = []  # (simhash, numsig, point_id) of canonicals in this batch
+        for i, text in enumerate(texts):
+            h = simhash(text)
+            metadatas[i]['dup_group'] = ids[i]
+            metadatas[i]['is_duplicate'] = False
+            if h is None:
+                continue
+            ns = numeric_signature(text)
+            canon = self.dedup.find(h, ns)
+            if canon is None:
+                for bh, bns, bid in batch_canon:
+                    if bns == ns and bin(h ^ bh).count('1') <= self.dedup.max_hamming:
+                        canon = bid
+                        break
+            if canon is not None and canon != ids[i]:
+                canonical_of[i] = canon
+                metadatas[i]['dup_group'] = canon
+                metadatas[i]['is_duplicate'] = True
+                entries.append((ids[i], h, ns, filename, canon))
+            else:
+                batch_canon.append((h, ns, ids[i]))
+                entries.append((ids[i], h, ns, filename, ids[i]))
+        # vectors of canonicals already in the collection
+        stored: Dict[str, List[float]] = {}
+        outside = sorted(set(canonical_of.values()) - set(ids))
+        if outside:
+            with self._write_lock:
+                points = self.qdrant.retrieve(collection_name=self.col_chunks, ids=outside, with_vectors=True)
+            for p in points:
+                stored[str(p.id)] = p.vector
+        # canonical vanished (e.g. its file was deleted): embed the chunk itself
+        for i, canon in list(canonical_of.items()):
+            if canon not in ids and canon not in stored:
+                del canonical_of[i]
+                metadatas[i]['dup_group'] = ids[i]
+                metadatas[i]['is_duplicate'] = False
+                entries = [e if e[0] != ids[i] else (e[0], e[1], e[2], e[3], ids[i]) for e in entries]
+        to_embed = [i for i in range(len(texts)) if i not in canonical_of]
+        embedded = dict(zip(to_embed, self.embedding.embed_documents([texts[i] for i in to_embed]))) if to_embed else {}
+        by_id = {ids[i]: v for i, v in embedded.items()}
+        vectors = []
+        for i in range(len(texts)):
+            if i in embedded:
+                vectors.append(embedded[i])
+            else:
+                canon = canonical_of[i]
+                vectors.append(by_id[canon] if canon in by_id else stored[canon])
+        self.dedup.add(entries)
+        if settings.rag_debug and canonical_of:
+            print(f"[DEDUP] file={filename} batch={len(texts)} near_duplicates={len(canonical_of)} embedded={len(to_embed)}")
+        return vectors
+
+    def add_tables(self, filename: str, tables: List[Dict[str, Any]]) -> int:
+        """Embed and upsert one batch of tables; returns the number written."""
+        return self.write(self.prepare_tables(filename, tables))
+
     def add_document(self, filename: str, summary: str, chunks: List[Dict[str, Any]], tables: List[Dict[str, Any]]):
         if settings.rag_debug:
             print(f"[ADD_DOC] filename={filename} summary_len={len(summary) if summary else 0} chunks={len(chunks)} tables={len(tables)}")
@@ -66,12 +353,7 @@ class LangChainStore:
         # Add document summary
         if summary:
             try:
-                doc_uuid = str(uuid.uuid5(uuid.NAMESPACE_DNS, f'doc-{filename}'))
-                self._docs_vs.add_texts(
-                    texts=[summary],
-                    metadatas=[{'source_file': filename, 'type': 'summary', 'original_id': f'doc-{filename}'}],
-                    ids=[doc_uuid]
-                )
+                self.add_summary(filename, summary)
                 if settings.rag_debug:
                     print(f"[ADD_DOC] Added summary for {filename}")
             except Exception as e:
@@ -80,11 +362,7 @@ class LangChainStore:
         # Add chunks
         if chunks:
             try:
-                texts = [c['text'] for c in chunks]
-                metadatas = [{**c.get('metadata', {}), 'source_file': filename, 'original_id': c['id']} for c in chunks]
-                # Generate UUIDs for chunk IDs
-                ids = [str(uuid.uuid5(uuid.NAMESPACE_DNS, c['id'])) for c in chunks]
-                self._chunks_vs.add_texts(texts=texts, metadatas=metadatas, ids=ids)
+                self.add_chunks(filename, chunks)
                 if settings.rag_debug:
                     print(f"[ADD_DOC] Added {len(chunks)} chunks for {filename}")
             except Exception as e:
@@ -93,40 +371,68 @@ class LangChainStore:
         # Add tables
         if tables:
             try:
-                texts = [t['text'] for t in tables]
-                metadatas = [{**t.get('metadata', {}), 'source_file': filename, 'type': 'table', 'original_id': t['id']} for t in tables]
-                # Generate UUIDs for table IDs
-                ids = [str(uuid.uuid5(uuid.NAMESPACE_DNS, t['id'])) for t in tables]
-                self._tables_vs.add_texts(texts=texts, metadatas=metadatas, ids=ids)
+                self.add_tables(filename, tables)
                 if settings.rag_debug:
                     print(f"[ADD_DOC] Added {len(tables)} tables for {filename}")
             except Exception as e:
                 print(f"[ADD_DOC] ERROR adding tables for {filename}: {e}")
 
-    def delete_file(self, filename: str):
-        # Delete from each vectorstore by filtering metadata
-        # Note: LangChain Qdrant doesn't have direct delete by metadata
-        # This is a limitation - would need custom implementation or rebuild
-        pass
-    
+    def delete_file(self, filename: str) -> Optional[Dict[str, Any]]:
+        """Delete every point of a source file from the three collections.
+
+        Also drops its dedup fingerprints and catalog entry; returns the removed
+        catalog row (None if the file was not catalogued).
+        """
+        selector = qmodels.FilterSelector(filter=self._source_filter([filename]))
+        with self._write_lock:
+            for name in [self.col_docs, self.col_chunks, self.col_tables]:
+                self.qdrant.delete(collection_name=name, points_selector=selector)
+        if self.dedup is not None:
+            self.dedup.remove_file(filename)
+        if self.tables is not None:
+            self.tables.remove_file(filename)
+        if self.facts is not None:
+            self.facts.remove_file(filename)
+        if self.summary_index is not None:
+            self.summary_index.remove_file(filename)
+        for mirror in self.faiss.values():
+            mirror.remove_file(filename)
+        removed = self.catalog.remove(filename)
+        if settings.rag_debug:
+            print(f"[DELETE] file={filename} catalogued={removed is not None}")
+        return removed
+
     def list_files(self) -> List[str]:
-        # Get unique source files from any collection
-        try:
-            points, _ = self.qdrant.scroll(collection_name=self.col_chunks, limit=1000)
-            files = set()
-            for p in points:
-                payload = p.payload or {}
-                source_file = payload.get('source_file')
-                if source_file:
-                    files.add(source_file)
-                if settings.rag_debug and len(files) < 3:  # Debug first few
-                    print(f"[LIST_FILES_DEBUG] payload keys: {list(payload.keys())}, source_file: {source_file}")
-            print(f"[LIST_FILES] found {len(files)} files: {list(files)}")
-            return sorted(list(files))
-        except Exception as e:
-            print(f"[LIST_FILES] ERROR: {e}")
-            return []
-    
+        return self.catalog.filenames()
+
+    def _backfill_catalog(self):
+        """One-off catalog build from collections ingested before the catalog existed."""
+        per_file: Dict[str, Dict[str, List[str]]] = {}
+        for name in [self.col_docs, self.col_chunks, self.col_tables]:
+            offset = None
+            while True:
+                points, offset = self.qdrant.scroll(collection_name=name, limit=1000, offset=offset,
+                                                    with_payload=['metadata'], with_vectors=False)
+                for p in points:
+                    source_file = ((p.payload or {}).get('metadata') or {}).get('source_file')
+                    if source_file:
+                        per_file.setdefault(source_file, {}).setdefault(name, []).append(str(p.id))
+                if offset is None:
+                    break
+        for filename, cols in per_file.items():
+            for name, ids in cols.items():
+                self.catalog.add_points(filename, name, ids)
+            self.catalog.record(filename, num_chunks=len(cols.get(self.col_chunks, [])),
+                                num_tables=len(cols.get(self.col_tables, [])), has_summary=self.col_docs in cols)
+        if per_file:
+            print(f"[CATALOG] backfilled files={len(per_file)} from existing collections")
+
+    def close(self):
+        """Release the embedded store's directory lock and snapshot the FAISS mirrors."""
+        for mirror in self.faiss.values():
+            mirror.save()
+        self.qdrant.close()
+
     def get_collection_info(self):
         """Debug method to check collection status"""
         info = {}
@@ -149,53 +455,193 @@ class LangChainStore:
 
 
     # ---------------- Retrieval API ----------------
-    def retrieve_docs(self, query: str, top_k: int) -> List[Dict[str, Any]]:
-        docs = self._docs_vs.similarity_search(query, k=top_k)
-        if settings.rag_debug:
-            print(f"[RETRIEVE] docs raw_count={len(docs)} requested_top_k={top_k}")
-        
+    def embed_query(self, query: str) -> List[float]:
+        """Embed a query once so it can be reused across docs/chunks/tables searches."""
+        return self.embedding.embed_query(query)
+
+    def _vectorstore(self, collection: str) -> LCQdrant:
+        return {
+            self.col_docs: self._docs_vs,
+            self.col_chunks: self._chunks_vs,
+            self.col_tables: self._tables_vs,
+        }[collection]
+
+    def _similarity(self, collection: str, vector: List[float], k: int, source_files: Optional[Iterable[str]] = None):
+        """(Document, cosine score) pairs from the FAISS mirror when enabled, else from Qdrant."""
+        mirror = self.faiss.get(collection)
+        if mirror is not None:
+            return [(Document(page_content=txt, metadata=meta), score) for score, txt, meta in mirror.search(vector, k, source_files)]
+        return self._vectorstore(collection).similarity_search_with_score_by_vector(
+            vector, k=k, filter=self._source_filter(source_files), search_params=self._search_params(collection))
+
+    def _doc_records(self, hits) -> List[Dict[str, Any]]:
+        """hits: (score, page_content, metadata) tuples."""
         out = []
-        for d in docs:
-            doc_id = d.metadata.get('original_id', d.metadata.get('id', 'unknown'))
-            txt = d.page_content
+        for score, txt, metadata in hits:
+            doc_id = metadata.get('original_id', metadata.get('id', 'unknown'))
             trunc = txt if len(txt) <= settings.doc_summary_max_chars else txt[:settings.doc_summary_max_chars] + '…'
             out.append({
                 'id': doc_id, 
                 'text': txt, 
-                'metadata': d.metadata, 
-                'score': 0.0,  # similarity_search doesn't return scores by default
+                'metadata': metadata, 
+                'score': score,
                 'summary': txt, 
                 'summary_short': trunc
             })
         return out
 
-    def retrieve_chunks(self, query: str, top_k: int) -> List[Dict[str, Any]]:
-        docs = self._chunks_vs.similarity_search(query, k=top_k)
-        if settings.rag_debug:
-            print(f"[RETRIEVE] chunks raw_count={len(docs)} requested_top_k={top_k}")
-        
+    def _chunk_records(self, pairs) -> List[Dict[str, Any]]:
+        """pairs: (Document, cosine score) as returned by similarity_search_with_score_by_vector."""
         out = []
-        for d in docs:
+        for d, score in pairs:
             out.append({
                 'id': d.metadata.get('original_id', d.metadata.get('id', 'unknown')), 
                 'text': d.page_content, 
                 'metadata': d.metadata, 
-                'score': 0.0
+                'score': float(score)
             })
         return out
 
-    def retrieve_tables(self, query: str, top_k: int) -> List[Dict[str, Any]]:
-        docs = self._tables_vs.similarity_search(query, k=top_k)
+    def _apply_cutoff(self, records: List[Dict[str, Any]], label: str) -> List[Dict[str, Any]]:
+        """Adaptive top-k: drop hits below retrieval_min_score or more than
+        retrieval_relative_drop below the best hit (records are sorted best first).
+        At least retrieval_min_keep hits are kept.
+        """
+        min_score = settings.retrieval_min_score
+        drop = settings.retrieval_relative_drop
+        if not records or (min_score <= 0.0 and drop <= 0.0):
+            return records
+        floor = min_score
+        if drop > 0.0:
+            floor = max(floor, records[0]['score'] * (1.0 - drop))
+        kept = [r for i, r in enumerate(records) if r['score'] >= floor or i < settings.retrieval_min_keep]
+        if settings.rag_debug and len(kept) < len(records):
+            print(f"[RETRIEVE] {label} cutoff floor={floor:.3f} kept={len(kept)}/{len(records)}")
+        return kept
+
+    def retrieve_docs_by_vector(self, vector: List[float], top_k: int, source_files: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """Top-k document summaries with cosine scores (in-memory index unless doc_index_in_memory=False),
+        optionally restricted to the given source files."""
+        self._refresh_shared()
+        if self.summary_index is not None:
+            hits = self.summary_index.search(vector, top_k, source_files)
+        else:
+            pairs = self._docs_vs.similarity_search_with_score_by_vector(vector, k=top_k, filter=self._source_filter(source_files))
+            hits = [(float(score), d.page_content, d.metadata) for d, score in pairs]
         if settings.rag_debug:
-            print(f"[RETRIEVE] tables raw_count={len(docs)} requested_top_k={top_k}")
-        
+            print(f"[RETRIEVE] docs raw_count={len(hits)} requested_top_k={top_k} in_memory={self.summary_index is not None}")
+        return self._apply_cutoff(self._doc_records(hits), 'docs')
+
+    def _refresh_shared(self):
+        """Shared index: reload the in-memory summaries once another worker has changed the catalog."""
+        if not self.shared or self.summary_index is None:
+            return
+        version = self.catalog.data_version()
+        if version == self._catalog_version:
+            return
+        self._catalog_version = version
+        fresh = SummaryIndex()
+        fresh.load(self.qdrant, self.col_docs)
+        self.summary_index = fresh
+        if settings.rag_debug:
+            print(f"[RETRIEVE] summary index reloaded docs={len(fresh)}")
+
+    def _collapse_duplicates(self, records: List[Dict[str, Any]], top_k: int) -> List[Dict[str, Any]]:
+        """Keep the best hit per near-duplicate group so clones don't fill top-k."""
+        seen = set()
         out = []
-        for d in docs:
-            out.append({
-                'id': d.metadata.get('original_id', d.metadata.get('id', 'unknown')), 
-                'text': d.page_content, 
-                'metadata': d.metadata, 
-                'score': 0.0
-            })
+        for r in records:
+            group = r['metadata'].get('dup_group', r['id'])
+            if group in seen:
+                continue
+            seen.add(group)
+            out.append(r)
+            if len(out) >= top_k:
+                break
+        return out
+
+    def _search_chunks(self, vector: List[float], top_k: int, source_files: Optional[Iterable[str]]) -> List[Dict[str, Any]]:
+        fetch_k = top_k * settings.dedup_oversample if self.dedup is not None else top_k
+        docs = self._similarity(self.col_chunks, vector, fetch_k, source_files)
+        out = self._chunk_records(docs)
+        if self.dedup is not None:
+            out = self._collapse_duplicates(out, top_k)
+        out = self._apply_cutoff(out, 'chunks')
+        if settings.rag_debug:
+            print(f"[RETRIEVE] chunks raw_count={len(docs)} kept={len(out)} requested_top_k={top_k} filtered={bool(source_files)}")
         return out
 
+    def retrieve_chunks_by_vector(self, vector: List[float], top_k: int, source_files: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """Top-k chunks for a precomputed query vector, optionally restricted to the given source files."""
+        return self._search_chunks(vector, top_k, source_files)
+
+    def retrieve_tables_by_vector(self, vector: List[float], top_k: int, source_files: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """Top-k tables for a precomputed query vector, optionally restricted to the given source files."""
+        docs = self._similarity(self.col_tables, vector, top_k, source_files)
+        if settings.rag_debug:
+            print(f"[RETRIEVE] tables raw_count={len(docs)} requested_top_k={top_k} filtered={bool(source_files)}")
+        return self._apply_cutoff(self._chunk_records(docs), 'tables')
+
+    def retrieve_multi(self, vector: List[float], top_ks: Dict[str, int], source_files: Optional[Iterable[str]] = None) -> Dict[str, List[Dict[str, Any]]]:
+        """Search several collections with one query vector.
+
+        Args:
+            vector: precomputed query embedding (see embed_query)
+            top_ks: logical collection ('docs' | 'chunks' | 'tables') -> k, e.g. {'chunks': 12, 'tables': 12}
+            source_files: optional source_file restriction (ignored for the docs collection)
+        Returns logical collection -> result records. The logical names map to
+        this generation's (possibly prefixed) collections; full names are accepted too.
+        """
+        collections = {'docs': self.col_docs, 'chunks': self.col_chunks, 'tables': self.col_tables}
+        out: Dict[str, List[Dict[str, Any]]] = {}
+        for name, k in top_ks.items():
+            collection = collections.get(name, name)
+            if collection == self.col_docs:
+                out[name] = self.retrieve_docs_by_vector(vector, k)
+                continue
+            if collection == self.col_chunks:
+                out[name] = self._search_chunks(vector, k, source_files)
+                continue
+            docs = self._similarity(collection, vector, k, source_files)
+            if settings.rag_debug:
+                print(f"[RETRIEVE] {name} raw_count={len(docs)} requested_top_k={k} filtered={bool(source_files)}")
+            out[name] = self._apply_cutoff(self._chunk_records(docs), name)
+        return out
+
+    def record_filing(self, filename: str, cover_text: str) -> Dict[str, Any]:
+        """Extract and catalog a filing's issuer, form type, fiscal year and tickers from its first pages."""
+        filing = extract_filing_metadata(cover_text, filename)
+        self.catalog.set_filing(filename, **filing)
+        if self.facts is not None:
+            self.facts.set_issuer(filename, filing['issuer'])
+        if settings.parse_debug:
+            print(f"[FILING] file={filename} issuer={filing['issuer']} form={filing['form_type']} fiscal_year={filing['fiscal_year']} tickers={filing['tickers']}")
+        return filing
+
+    def resolve_filings(self, question: str) -> Dict[str, Any]:
+        """Catalogued filings a question is constrained to by issuer / fiscal year / form (see filing_metadata.resolve_filings)."""
+        return resolve_filings(question, self.catalog.filings())
+
+    def lookup_facts(self, question: str, source_files: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """Stored facts answering a metric / fiscal-year question (see FactStore.lookup)."""
+        if self.facts is None:
+            return {'metric': None, 'periods': [], 'files': [], 'facts': [], 'unambiguous': False, 'direct': False,
+                    'extra_terms': []}
+        return self.facts.lookup(question, source_files)
+
+    def table_rows(self, table_ids: Iterable[str]) -> Dict[str, List[List[str]]]:
+        """Full rows of the given tables (by record id); tables without stored rows are absent."""
+        if self.tables is None:
+            return {}
+        return self.tables.get_many(table_ids)
+
+    def retrieve_docs(self, query: str, top_k: int) -> List[Dict[str, Any]]:
+        return self.retrieve_docs_by_vector(self.embed_query(query), top_k)
+
+    def retrieve_chunks(self, query: str, top_k: int, source_files: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """Top-k chunks, optionally restricted (inside Qdrant) to the given source files."""
+        return self.retrieve_chunks_by_vector(self.embed_query(query), top_k, source_files=source_files)
+
+    def retrieve_tables(self, query: str, top_k: int, source_files: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """Top-k tables, optionally restricted (inside Qdrant) to the given source files."""
+        return self.retrieve_tables_by_vector(self.embed_query(query), top_k, source_files=source_files)
@@ -1,131 +1,206 @@
+import multiprocessing
 import os
-from typing import List, Dict, Any
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import List, Dict, Any, Iterable, Optional
 
 from app.core.config import get_settings
+from app.stores import generations
 from app.stores.langchain_store import LangChainStore
-from app.services.pdf_loader import PDFLoader
+from app.stores.ingest_manifest import IngestManifest, ingest_fingerprint
+from app.core.hashing import file_sha256
+from app.services.pdf_loader import PDFLoader, read_spool, spool_file
 from app.services.openai_client import OpenAIClient
 
 settings = get_settings()
 
+_PARSE_DONE = object()  # end-of-stream marker on the page queue
+_EMBED_DONE = object()  # one per embed thread on the write queue
+
+
+def _put(out: "queue.Queue", item: Any, stop: threading.Event) -> bool:
+    """Put into a bounded queue unless `stop` is set first; False when abandoned."""
+    while not stop.is_set():
+        try:
+            out.put(item, timeout=0.2)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
 class MainStore:
-    def __init__(self):
+    # Process-wide (shared by every generation's store): writers -- endpoints, the inbox
+    # watcher, the startup scan -- hold it around load/sync/scan/delete, and a generation
+    # swap holds it so no write lands in the store being swapped out.
+    ingest_lock = threading.RLock()
+
+    def __init__(self, generation: Optional[str] = None):
+        # index generation (see app.stores.generations); default: the active one
+        self.generation = generation or generations.active_generation()
+        self.root = generations.generation_root(self.generation)
+        os.makedirs(self.root, exist_ok=True)
+        meta = generations.read_meta(self.generation)
         self.emb = OpenAIClient()
         self.pdf_loader = PDFLoader(settings.chunk_size, settings.chunk_overlap)
-        self.lc_store = LangChainStore()
+        self.lc_store = LangChainStore(root=self.root, collection_prefix=generations.collection_prefix(self.generation),
+                                       embedding_model=meta.get('embedding_model'), embedding_dim=meta.get('embedding_dim'))
+        self.manifest = IngestManifest(os.path.join(self.root, 'ingest_manifest.json'))
+        if 'fingerprint' not in meta:
+            self._adopt(meta)
+
+    def _adopt(self, meta: Dict[str, Any]):
+        """Record build settings for a generation that has none (the pre-generation layout)."""
+        prints = {(self.manifest.get(n) or {}).get('fingerprint') for n in self.manifest.filenames()}
+        if not prints:
+            fingerprint = ingest_fingerprint()  # nothing scanned yet
+        elif len(prints) == 1:
+            fingerprint = prints.pop()
+        else:
+            fingerprint = 'mixed'  # files ingested under different settings: always stale
+        generations.write_meta(self.generation, status=meta.get('status', 'active'), created_at=meta.get('created_at', 0),
+                               fingerprint=fingerprint, embedding_model=self.lc_store.emb_client.embedding_model,
+                               embedding_dim=self.lc_store.dim)
+
+    def stale_reason(self) -> Optional[str]:
+        """Why this generation no longer matches the current ingest settings (None = up to date)."""
+        meta = generations.read_meta(self.generation)
+        if meta.get('fingerprint') != ingest_fingerprint():
+            return 'config_changed'
+        if meta.get('embedding_model', settings.embedding_model) != settings.embedding_model:
+            return 'embedding_model_changed'
+        if meta.get('embedding_dim', settings.embedding_dim) != settings.embedding_dim:
+            return 'embedding_dim_changed'
+        return None
+
+    def close(self):
+        self.lc_store.close()
 
     def load_pdf(self, file_path: str) -> Dict[str, Any]:
-        parsed = self.pdf_loader.load(file_path)
-        filename = os.path.basename(file_path)
-        # summary
-        coverage_text = parsed['full_text'][:settings.summary_chars]
-        summary = self.emb.summarize(coverage_text)
-        # LangChain path only
-        # chunks
-        chunk_records = parsed['chunks']
-        # tables
-        table_records = parsed['tables']
-        # Commit to LangChain store directly
-        self.lc_store.add_document(
-            filename,
-            summary,
-            [ {'id': c.id + '-' + filename, 'text': c.text, 'metadata': c.metadata} for c in chunk_records ],
-            [ {'id': t.id + '-' + filename, 'text': t.text, 'metadata': t.metadata} for t in table_records ]
-        )
-        # Warmup retrieval indices immediately so first query isn't penalized by build cost
-        if settings.rag_debug:
-            import time as _time
-            _tw0 = _time.time()
-            self.lc_store.ensure_built()
-            _dtw = (_time.time() - _tw0) * 1000.0
-            print(f"[WARMUP] retrievers_built file={filename} ms={_dtw:.1f}")
-        return {
-            'filename': filename,
-            'summary': summary,
-            'num_chunks': len(chunk_records),
-            'num_tables': len(table_records)
-        }
+        return self.load_pdf_streaming(file_path)
+
+    def _parse_into(self, file_path: str, out: "queue.Queue", stop: threading.Event):
+        """Producer: parse pages into a bounded queue (blocks when the embedder falls behind).
 
-    def load_pdf_streaming(self, file_path: str, logger=None, batch_size: int = None) -> Dict[str, Any]:
-        """Streaming / staged ingestion with progress events.
+        Gives up once `stop` is set; closing the page iterator releases the
+        document, parse-cache writer and worker pool it holds.
+        """
+        pages = self.pdf_loader.iter_pages(file_path)
+        try:
+            for page in pages:
+                if not _put(out, page, stop):
+                    return
+        except BaseException as e:  # surfaced to the consumer
+            _put(out, e, stop)
+        finally:
+            pages.close()
+            _put(out, _PARSE_DONE, stop)
+
+    def load_pdf_streaming(self, file_path: str, logger=None, batch_size: int = None, sha256: Optional[str] = None) -> Dict[str, Any]:
+        """Pipelined ingestion with progress events.
 
-        Steps:
-        1. Parse PDF (text + tables)
-        2. Summarize coverage region
-        3. Embed & add summary
-        4. Embed chunks in batches (progress events)
-        5. Embed tables in batches
-        6. Rebuild hybrids at end
+        A parser thread yields pages into a bounded queue while this thread:
+        1. Collects the first summary_chars of text, summarizes and adds the summary
+        2. Embeds & upserts chunks per batch_size batch as pages arrive
+        3. Embeds & upserts tables per batch_size batch
+        Only a few pages plus one batch are held in memory at a time; progress
+        events report actual upserted counts.
         """
         # default batch size from settings if not provided
         if batch_size is None:
             batch_size = settings.embedding_batch_size
         filename = os.path.basename(file_path)
-        if logger: logger.info('parse_start', filename=filename)
-        if settings.parse_debug:
-            print(f"[INGEST] parse_start file={filename}")
-        parsed = self.pdf_loader.load(file_path)
-        if logger: logger.info('parse_complete', chunks=len(parsed['chunks']), tables=len(parsed['tables']))
-        if settings.parse_debug:
-            print(f"[INGEST] parse_complete chunks={len(parsed['chunks'])} tables={len(parsed['tables'])}")
-        # summary
-        coverage_text = parsed['full_text'][:settings.summary_chars]
-        if logger: logger.info('summary_start')
-        if settings.parse_debug:
-            print(f"[INGEST] summary_start file={filename} chars={len(coverage_text)}")
-        summary = self.emb.summarize(coverage_text)
-        # LangChain path only
-        if logger: logger.info('summary_done')
+        if self.lc_store.catalog.contains(filename):
+            # re-ingest: drop the previous version's points first
+            self.lc_store.delete_file(filename)
+        total_pages = self.pdf_loader.page_count(file_path)
+        if logger: logger.info('parse_start', filename=filename, pages=total_pages)
         if settings.parse_debug:
-            print(f"[INGEST] summary_done")
-        # chunks batched
-        chunks = parsed['chunks']
-        total_chunks = len(chunks)
-        if logger: logger.info('chunk_embedding_start', total=total_chunks)
-        if settings.parse_debug:
-            print(f"[INGEST] chunk_embedding_start total={total_chunks} batch_size={batch_size}")
-        chunk_records = []
-        for i in range(0, total_chunks, batch_size):
-            batch = chunks[i:i+batch_size]
-            texts = [c.text for c in batch]
-            # embeddings handled by LangChain retriever build later; store raw
-            for c in batch:
-                chunk_records.append(c)
-            # periodic progress
+            print(f"[INGEST] parse_start file={filename} pages={total_pages} batch_size={batch_size}")
+        pages: "queue.Queue" = queue.Queue(maxsize=settings.ingest_queue_pages)
+        stop = threading.Event()
+        producer = threading.Thread(target=self._parse_into, args=(file_path, pages, stop), daemon=True)
+        producer.start()
+
+        summary = None
+        coverage_parts: List[str] = []
+        coverage_len = 0
+        pending_chunks: List[Dict[str, Any]] = []
+        pending_tables: List[Dict[str, Any]] = []
+        counts = {'pages': 0, 'chunks': 0, 'tables': 0}
+
+        def emit_progress():
             if logger:
-                logger.progress('chunks', min(i+batch_size, total_chunks), total_chunks)
+                logger.progress('ingest', counts['pages'], total_pages, chunks_upserted=counts['chunks'], tables_upserted=counts['tables'])
+
+        def write_summary():
+            nonlocal summary
+            coverage_text = ''.join(coverage_parts)[:settings.summary_chars]
+            if logger: logger.info('summary_start')
             if settings.parse_debug:
-                print(f"[INGEST] chunk_batch_done upto={min(i+batch_size, total_chunks)}/{total_chunks}")
-        if logger: logger.info('chunk_embedding_done', count=total_chunks)
-        if settings.parse_debug:
-            print(f"[INGEST] chunk_embedding_done count={total_chunks}")
-        # tables batched
-        table_records = []
-        tables = parsed['tables']
-        total_tables = len(tables)
-        if tables:
-            if logger: logger.info('table_embedding_start', total=total_tables)
+                print(f"[INGEST] summary_start file={filename} chars={len(coverage_text)}")
+            summary = self.emb.summarize(coverage_text)
+            filing = self.lc_store.record_filing(filename, coverage_text)
+            self.lc_store.add_summary(filename, summary, filing)
+            coverage_parts.clear()
+            if logger: logger.info('summary_done')
             if settings.parse_debug:
-                print(f"[INGEST] table_embedding_start total={total_tables}")
-            for i in range(0, total_tables, batch_size):
-                batch = tables[i:i+batch_size]
-                texts = [t.text for t in batch]
-                for t in batch:
-                    table_records.append(t)
-                if logger:
-                    logger.progress('tables', min(i+batch_size, total_tables), total_tables)
+                print(f"[INGEST] summary_done")
+
+        def drain(final: bool):
+            # embeddings + upserts happen here, one bounded batch at a time
+            while len(pending_chunks) >= batch_size or (final and pending_chunks):
+                batch = pending_chunks[:batch_size]
+                del pending_chunks[:batch_size]
+                counts['chunks'] += self.lc_store.add_chunks(filename, batch)
+                emit_progress()
                 if settings.parse_debug:
-                    print(f"[INGEST] table_batch_done upto={min(i+batch_size, total_tables)}/{total_tables}")
-            if logger: logger.info('table_embedding_done', count=total_tables)
-            if settings.parse_debug:
-                print(f"[INGEST] table_embedding_done count={total_tables}")
-        # commit to LangChain store once at end
-        self.lc_store.add_document(
-            filename,
-            summary,
-            [ {'id': c.id + '-' + filename, 'text': c.text, 'metadata': c.metadata} for c in chunk_records ],
-            [ {'id': t.id + '-' + filename, 'text': t.text, 'metadata': t.metadata} for t in table_records ]
-        )
+                    print(f"[INGEST] chunk_batch_done upserted={counts['chunks']} pages={counts['pages']}/{total_pages}")
+            while len(pending_tables) >= batch_size or (final and pending_tables):
+                batch = pending_tables[:batch_size]
+                del pending_tables[:batch_size]
+                counts['tables'] += self.lc_store.add_tables(filename, batch)
+                emit_progress()
+                if settings.parse_debug:
+                    print(f"[INGEST] table_batch_done upserted={counts['tables']}")
+
+        try:
+            while True:
+                item = pages.get()
+                if item is _PARSE_DONE:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                counts['pages'] += 1
+                if summary is None:
+                    coverage_parts.append(item.text if not coverage_parts else "\n" + item.text)
+                    coverage_len += len(coverage_parts[-1])
+                pending_chunks.extend({'id': c.id + '-' + filename, 'text': c.text, 'metadata': c.metadata} for c in item.chunks)
+                pending_tables.extend({'id': t.id + '-' + filename, 'text': t.text, 'raw': t.raw, 'metadata': t.metadata} for t in item.tables)
+                if summary is None and coverage_len >= settings.summary_chars:
+                    write_summary()
+                if summary is not None:
+                    drain(final=False)
+                elif len(pending_chunks) > 0 and settings.parse_debug:
+                    print(f"[INGEST] waiting_for_summary pages={counts['pages']} buffered_chunks={len(pending_chunks)}")
+            if counts['pages'] == 0:
+                raise ValueError(f"no pages parsed from {filename}")
+            if summary is None:
+                # short document: whole text fits in the coverage window
+                write_summary()
+            drain(final=True)
+        finally:
+            # on failure the producer may be blocked on a full queue: stop it, unblock it and wait
+            stop.set()
+            while True:
+                try:
+                    pages.get_nowait()
+                except queue.Empty:
+                    break
+            producer.join()
+        if logger: logger.info('parse_complete', pages=counts['pages'], chunks=counts['chunks'], tables=counts['tables'])
         # Warmup retrieval indices after streaming ingestion
         if settings.rag_debug:
             import time as _time
@@ -133,34 +208,64 @@ class MainStore:
             self.lc_store.ensure_built()
             _dtw = (_time.time() - _tw0) * 1000.0
             print(f"[WARMUP] retrievers_built file={filename} ms={_dtw:.1f}")
-        if logger: logger.info('stores_flushed')
-        if settings.parse_debug:
-            print(f"[INGEST] stores_flushed")
         if logger: logger.info('langchain_store_updated')
         if settings.parse_debug:
             print(f"[INGEST] langchain_store_updated")
         meta = {
             'filename': filename,
             'summary': summary,
-            'num_chunks': len(chunk_records),
-            'num_tables': len(table_records)
+            'num_chunks': counts['chunks'],
+            'num_tables': counts['tables']
         }
+        self.lc_store.catalog.record(filename, sha256=sha256 or file_sha256(file_path), pages=counts['pages'],
+                                     num_chunks=counts['chunks'], num_tables=counts['tables'], has_summary=bool(summary),
+                                     source_path=os.path.abspath(file_path))
         if logger: logger.done(**meta)
         if settings.parse_debug:
-            print(f"[INGEST] done file={filename} chunks={len(chunk_records)} tables={len(table_records)}")
+            print(f"[INGEST] done file={filename} pages={counts['pages']} chunks={counts['chunks']} tables={counts['tables']}")
         return meta
 
-    def delete_file(self, filename: str):
-        # Delegate to langchain store
-        self.lc_store.delete_file(filename)
+    def delete_file(self, filename: str) -> Optional[Dict[str, Any]]:
+        """Remove a file's points, catalog row and manifest entry; returns the removed catalog row."""
+        removed = self.lc_store.delete_file(filename)
+        self.manifest.forget(filename)
+        return removed
 
     def list_files(self) -> List[str]:
         # Delegate to langchain store
         return self.lc_store.list_files()
 
+    def sync_file(self, path: str, logger=None) -> Dict[str, Any]:
+        """Bring one inbox file's points in line with the file on disk.
+
+        A missing file that was ingested before is deleted from the collections;
+        a new or changed one is (re-)ingested; an unchanged one is skipped.
+        Returns {'filename', 'status': ingested | skipped | deleted | absent, ...}.
+        """
+        name = os.path.basename(path)
+        if not os.path.exists(path):
+            if self.manifest.get(name) is None and not self.lc_store.catalog.contains(name):
+                return {'filename': name, 'status': 'absent'}
+            self.delete_file(name)
+            if logger: logger.info('file_deleted', filename=name)
+            return {'filename': name, 'status': 'deleted'}
+        fingerprint = ingest_fingerprint()
+        state = self.manifest.check(path, fingerprint)
+        if not state['needs_ingest']:
+            return {'filename': name, 'status': 'skipped', 'reason': state['reason']}
+        sha256 = state['sha256'] or file_sha256(path)
+        meta = self.load_pdf_streaming(path, logger=logger, sha256=sha256)
+        self.manifest.record(path, sha256=sha256, fingerprint=fingerprint,
+                             num_chunks=meta['num_chunks'], num_tables=meta['num_tables'])
+        return {**meta, 'status': 'ingested', 'reason': state['reason']}
+
     def scan_folder(self, logger=None, force: bool = False) -> Dict[str, Any]:
         """Scan the configured watch_dir and ingest any new PDFs.
 
+        Files whose content hash and ingest config match the manifest are skipped.
+        With scan_concurrent and more than one file to ingest, files go through
+        the staged pipeline in _ingest_concurrent; otherwise one at a time.
+
         Args:
             logger: optional EventLogger-like object for progress events
             force: if True, re-ingest even if file previously seen
@@ -168,29 +273,344 @@ class MainStore:
         """
         watch = settings.watch_dir
         if not os.path.isdir(watch):
-            return {"scanned": 0, "ingested": 0, "files": []}
-        pdfs = [f for f in os.listdir(watch) if f.lower().endswith('.pdf')]
-        ingested = []
+            return {"scanned": 0, "ingested": 0, "skipped": 0, "files": []}
+        pdfs = sorted(f for f in os.listdir(watch) if f.lower().endswith('.pdf'))
+        skipped = []
+        jobs = []
+        fingerprint = ingest_fingerprint()
         if logger: logger.info('scan_start', watch_dir=watch, total=len(pdfs))
         for name in pdfs:
             path = os.path.join(watch, name)
             try:
-                meta = self.load_pdf_streaming(path, logger=None)
+                state = {'needs_ingest': True, 'sha256': None, 'reason': 'forced'}
+                if not force:
+                    state = self.manifest.check(path, fingerprint)
+                if not state['needs_ingest']:
+                    skipped.append(name)
+                    if settings.parse_debug:
+                        print(f"[SCAN] skip file={name} reason={state['reason']}")
+                    continue
+                if settings.parse_debug:
+                    print(f"[SCAN] ingest file={name} reason={state['reason']}")
+                if self.lc_store.catalog.contains(name):
+                    # previous version's points would otherwise linger next to the new ones
+                    self.lc_store.delete_file(name)
+                jobs.append({'name': name, 'path': path, 'sha256': state['sha256'] or file_sha256(path)})
+            except Exception as e:
+                if logger: logger.error('file_failed', filename=name, error=str(e))
+        ingested = self._ingest_jobs(jobs, fingerprint, logger=logger)
+        if logger: logger.done(status='ok', ingested=len(ingested), skipped=len(skipped))
+        return {"scanned": len(pdfs), "ingested": len(ingested), "skipped": len(skipped), "files": ingested}
+
+    def _ingest_jobs(self, jobs: List[Dict[str, Any]], fingerprint: str, logger=None) -> List[Dict[str, Any]]:
+        """Ingest {'name', 'path', 'sha256'[, 'manifest']} jobs, concurrently when there are several.
+
+        The manifest (what the inbox scan / watcher consider theirs) is updated
+        unless a job sets 'manifest': False.
+        """
+        if settings.scan_concurrent and len(jobs) > 1:
+            return self._ingest_concurrent(jobs, fingerprint, logger=logger)
+        ingested = []
+        for job in jobs:
+            name = job['name']
+            try:
+                meta = self.load_pdf_streaming(job['path'], logger=None, sha256=job['sha256'])
+                if job.get('manifest', True):
+                    self.manifest.record(job['path'], sha256=job['sha256'], fingerprint=fingerprint,
+                                         num_chunks=meta['num_chunks'], num_tables=meta['num_tables'])
                 ingested.append({"filename": name, **meta})
                 if logger: logger.info('file_ingested', filename=name, chunks=meta['num_chunks'], tables=meta['num_tables'])
             except Exception as e:
                 if logger: logger.error('file_failed', filename=name, error=str(e))
-        if logger: logger.done(status='ok', ingested=len(ingested))
-        return {"scanned": len(pdfs), "ingested": len(ingested), "files": ingested}
+        return ingested
+
+    # ---------------- index generations ----------------
+    def _source_path(self, doc: Dict[str, Any]) -> Optional[str]:
+        """Where a catalogued document's PDF lives (older rows have no source_path)."""
+        candidates = [doc.get('source_path'), os.path.join(settings.watch_dir, doc['filename']),
+                      os.path.join('data', doc['filename'])]  # /upload destination
+        for path in candidates:
+            if path and os.path.exists(path):
+                return path
+        return None
+
+    def _sync_from(self, source: 'MainStore', logger=None) -> Dict[str, int]:
+        """Make this generation hold the same documents (by content hash) as `source`."""
+        wanted = {d['filename']: d for d in source.lc_store.catalog.documents()}
+        have = {d['filename']: d for d in self.lc_store.catalog.documents()}
+        removed = 0
+        for name in sorted(set(have) - set(wanted)):
+            self.delete_file(name)
+            removed += 1
+        jobs, unreadable = [], []
+        for name, doc in wanted.items():
+            if name in have and have[name].get('sha256') == doc.get('sha256'):
+                continue
+            path = self._source_path(doc)
+            if path is None:
+                unreadable.append(name)
+                if logger: logger.error('file_failed', filename=name, error='source file not found')
+                continue
+            if self.lc_store.catalog.contains(name):
+                self.lc_store.delete_file(name)
+            # only inbox files belong in the manifest; the watcher would treat others as deleted from the inbox
+            in_inbox = os.path.dirname(os.path.abspath(path)) == os.path.abspath(settings.watch_dir)
+            jobs.append({'name': name, 'path': path, 'sha256': file_sha256(path), 'manifest': in_inbox})
+        ingested = self._ingest_jobs(jobs, ingest_fingerprint(), logger=logger)
+        return {'ingested': len(ingested), 'removed': removed, 'unreadable': len(unreadable)}
+
+    def validate(self, expected: Iterable[str]) -> Dict[str, Any]:
+        """Check this generation against the documents it should hold; 'problems' empty = ok."""
+        catalog = self.lc_store.catalog
+        missing = sorted(set(expected) - set(catalog.filenames()))
+        totals = catalog.totals()
+        problems = []
+        if len(missing) > settings.generation_max_missing:
+            problems.append(f"{len(missing)} documents missing: {missing[:5]}")
+        for key, col in (('chunks', self.lc_store.col_chunks), ('tables', self.lc_store.col_tables)):
+            stored = self.lc_store.qdrant.count(collection_name=col, exact=True).count
+            if stored != totals[key]:
+                problems.append(f"{col}: {stored} points vs {totals[key]} catalogued")
+        if totals['chunks']:
+            # smoke test: a stored chunk must be its own nearest neighbour
+            points, _ = self.lc_store.qdrant.scroll(collection_name=self.lc_store.col_chunks, limit=1, with_vectors=True)
+            hits = self.lc_store.retrieve_chunks_by_vector(points[0].vector, 1) if points else []
+            if not hits:
+                problems.append('chunk search returned nothing')
+        return {**totals, 'missing': missing, 'problems': problems}
+
+    def build_generation(self, logger=None) -> 'MainStore':
+        """Build a new index generation from this one's catalog under the current settings.
+
+        The new generation is ingested from the catalogued documents' source
+        files, caught up with whatever changed here meanwhile and validated. It
+        is returned open but not activated (see generations.set_active); on
+        failure it is marked 'failed' (left for garbage collection) and the
+        error is raised. This generation keeps serving throughout.
+        """
+        gen = generations.new_generation_id()
+        generations.write_meta(gen, status='building', created_at=time.time(), source=self.generation,
+                               fingerprint=ingest_fingerprint(), embedding_model=settings.embedding_model,
+                               embedding_dim=settings.embedding_dim)
+        if logger: logger.info('generation_build_start', generation=gen, source=self.generation,
+                               documents=len(self.lc_store.catalog.filenames()))
+        print(f"[GENERATION] building={gen} source={self.generation} reason={self.stale_reason()}")
+        new = MainStore(gen)
+        try:
+            result = new._sync_from(self, logger=logger)
+            result_catch_up = new._sync_from(self, logger=logger)  # changes made here during the build
+            report = new.validate(self.lc_store.catalog.filenames())
+            if report['problems']:
+                raise RuntimeError('; '.join(report['problems']))
+            generations.write_meta(gen, status='ready', built_at=time.time(), docs=report['docs'],
+                                   chunks=report['chunks'], tables=report['tables'], missing=report['missing'])
+            if logger: logger.info('generation_built', generation=gen, **result,
+                                   caught_up=result_catch_up['ingested'] + result_catch_up['removed'])
+        except Exception as e:
+            generations.write_meta(gen, status='failed', error=str(e))
+            if logger: logger.error('generation_failed', generation=gen, error=str(e))
+            new.close()
+            raise
+        return new
+
+    def catch_up(self, new: 'MainStore', logger=None) -> Dict[str, int]:
+        """Last sync before swapping to `new` (call with ingestion into this generation paused)."""
+        return new._sync_from(self, logger=logger)
+
+    def _ingest_concurrent(self, jobs: List[Dict[str, Any]], fingerprint: str, logger=None) -> List[Dict[str, Any]]:
+        """Ingest several files through a staged pipeline.
+
+        parse (process pool, one whole file per task) -> summarize + embed
+        (scan_embed_threads threads) -> this thread, the single Qdrant writer.
+        Parse workers spool pages to a temp file and embed threads stream them
+        back, so memory is bounded by pages, not files: per embed thread the
+        pages up to summary_chars plus one batch, and scan_write_queue embedded
+        batches. Progress events carry the filename. Returns per-file results
+        in completion order.
+
+        A file that fails mid-way keeps the batches already written. It is
+        neither catalogued nor recorded in the manifest, so the next scan
+        retries it and overwrites them (point ids derive from chunk ids).
+        """
+        n_procs = max(1, min(settings.scan_parse_processes or os.cpu_count() or 1, len(jobs)))
+        n_threads = max(1, min(settings.scan_embed_threads, len(jobs)))
+        batch_size = settings.embedding_batch_size
+        parsed: "queue.Queue" = queue.Queue(maxsize=n_threads)
+        writes: "queue.Queue" = queue.Queue(maxsize=settings.scan_write_queue)
+        if settings.parse_debug:
+            print(f"[SCAN] concurrent files={len(jobs)} parse_processes={n_procs} embed_threads={n_threads}")
+
+        def parse_stage():
+            # spawn: workers only need the parser, not this process's threads and open stores
+            ctx = multiprocessing.get_context('spawn')
+            sent = set()
+            try:
+                with ProcessPoolExecutor(max_workers=n_procs, mp_context=ctx) as pool:
+                    pending = {}
+                    todo = list(jobs)
+                    while todo or pending:
+                        while todo and len(pending) < n_procs:
+                            job = todo.pop(0)
+                            pending[pool.submit(spool_file, job['path'], settings.chunk_size, settings.chunk_overlap)] = job
+                        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        for fut in done:
+                            job = pending.pop(fut)
+                            try:
+                                result = fut.result()
+                            except Exception as e:
+                                result = e
+                            sent.add(job['name'])
+                            parsed.put((job, result))
+            except Exception as e:  # pool could not start / broke: fail what never came back
+                for job in jobs:
+                    if job['name'] not in sent:
+                        parsed.put((job, e))
+            finally:
+                for _ in range(n_threads):
+                    parsed.put(_PARSE_DONE)
+
+        def embed_file(job: Dict[str, Any], spooled: Dict[str, Any]):
+            name = job['name']
+            if not spooled['pages']:
+                raise ValueError(f"no pages parsed from {name}")
+            job['total'] = spooled['chunks'] + spooled['tables']
+            job['pages'] = spooled['pages']
+            if logger: logger.info('parse_complete', filename=name, pages=spooled['pages'], chunks=spooled['chunks'],
+                                   tables=spooled['tables'])
+            coverage_parts: List[str] = []
+            coverage_len = 0
+            chunks: List[Dict[str, Any]] = []
+            tables: List[Dict[str, Any]] = []
+            summary = None
+
+            def write_summary():
+                coverage_text = "\n".join(coverage_parts)[:settings.summary_chars]
+                text = self.emb.summarize(coverage_text)
+                filing = self.lc_store.record_filing(name, coverage_text)
+                writes.put(('batch', job, self.lc_store.prepare_summary(name, text, filing)))
+                if logger: logger.info('summary_done', filename=name)
+                return text
+
+            def flush(final: bool):
+                while len(chunks) >= batch_size or (final and chunks):
+                    writes.put(('batch', job, self.lc_store.prepare_chunks(name, chunks[:batch_size])))
+                    del chunks[:batch_size]
+                while len(tables) >= batch_size or (final and tables):
+                    writes.put(('batch', job, self.lc_store.prepare_tables(name, tables[:batch_size])))
+                    del tables[:batch_size]
+
+            for page in read_spool(spooled['spool']):
+                if summary is None:
+                    coverage_parts.append(page.text)
+                    coverage_len += len(page.text) + 1
+                chunks.extend({'id': c.id + '-' + name, 'text': c.text, 'metadata': c.metadata} for c in page.chunks)
+                tables.extend({'id': t.id + '-' + name, 'text': t.text, 'raw': t.raw, 'metadata': t.metadata} for t in page.tables)
+                if summary is None and coverage_len >= settings.summary_chars:
+                    summary = write_summary()
+                if summary is not None:
+                    flush(final=False)
+            if summary is None:
+                summary = write_summary()  # short document
+            flush(final=True)
+            writes.put(('done', job, summary))
+
+        def embed_stage():
+            while True:
+                item = parsed.get()
+                if item is _PARSE_DONE:
+                    break
+                job, spooled = item
+                if isinstance(spooled, BaseException):
+                    writes.put(('failed', job, spooled))
+                    continue
+                try:
+                    embed_file(job, spooled)
+                except Exception as e:
+                    writes.put(('failed', job, e))
+                finally:
+                    try:
+                        os.remove(spooled['spool'])
+                    except OSError:
+                        pass
+            writes.put(_EMBED_DONE)
+
+        threading.Thread(target=parse_stage, daemon=True).start()
+        for _ in range(n_threads):
+            threading.Thread(target=embed_stage, daemon=True).start()
+
+        results: List[Dict[str, Any]] = []
+        counts: Dict[str, Dict[str, int]] = {}
+        failed = set()
+        running = n_threads
+        while running:
+            item = writes.get()
+            if item is _EMBED_DONE:
+                running -= 1
+                continue
+            kind, job, payload = item
+            name = job['name']
+            c = counts.setdefault(name, {'chunks': 0, 'tables': 0})
+            if kind == 'failed' or name in failed:
+                if kind == 'failed' and name not in failed:
+                    failed.add(name)
+                    if logger: logger.error('file_failed', filename=name, error=str(payload))
+                    if settings.parse_debug:
+                        print(f"[SCAN] failed file={name} error={payload}")
+                continue
+            if kind == 'batch':
+                try:
+                    n = self.lc_store.write(payload)
+                except Exception as e:
+                    failed.add(name)
+                    if logger: logger.error('file_failed', filename=name, error=str(e))
+                    continue
+                if payload.collection == self.lc_store.col_chunks:
+                    c['chunks'] += n
+                elif payload.collection == self.lc_store.col_tables:
+                    c['tables'] += n
+                if logger and payload.collection != self.lc_store.col_docs:
+                    logger.progress('ingest', c['chunks'] + c['tables'], job.get('total', 0), filename=name,
+                                    chunks_upserted=c['chunks'], tables_upserted=c['tables'])
+                continue
+            meta = {'filename': name, 'summary': payload, 'num_chunks': c['chunks'], 'num_tables': c['tables']}
+            self.lc_store.catalog.record(name, sha256=job['sha256'], pages=job.get('pages'), num_chunks=c['chunks'],
+                                         num_tables=c['tables'], has_summary=bool(payload),
+                                         source_path=os.path.abspath(job['path']))
+            if job.get('manifest', True):
+                self.manifest.record(job['path'], sha256=job['sha256'], fingerprint=fingerprint,
+                                     num_chunks=c['chunks'], num_tables=c['tables'])
+            results.append(meta)
+            if logger: logger.info('file_ingested', filename=name, chunks=c['chunks'], tables=c['tables'])
+            if settings.parse_debug:
+                print(f"[SCAN] done file={name} chunks={c['chunks']} tables={c['tables']}")
+        return results
 
     # retrieval methods
+    def embed_query(self, query: str) -> List[float]:
+        return self.lc_store.embed_query(query)
+
+    def retrieve_docs_by_vector(self, vector: List[float], top_k: int, source_files: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        return self.lc_store.retrieve_docs_by_vector(vector, top_k, source_files=source_files)
+
+    def resolve_filings(self, question: str) -> Dict[str, Any]:
+        return self.lc_store.resolve_filings(question)
+
+    def retrieve_multi(self, vector: List[float], top_ks: Dict[str, int], source_files: Optional[Iterable[str]] = None) -> Dict[str, List[Dict[str, Any]]]:
+        return self.lc_store.retrieve_multi(vector, top_ks, source_files=source_files)
+
+    def table_rows(self, table_ids: Iterable[str]) -> Dict[str, List[List[str]]]:
+        return self.lc_store.table_rows(table_ids)
+
+    def lookup_facts(self, question: str, source_files: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        return self.lc_store.lookup_facts(question, source_files=source_files)
+
     def retrieve_docs(self, query: str, top_k: int) -> List[Dict[str, Any]]:
         return self.lc_store.retrieve_docs(query, top_k)
 
-    def retrieve_chunks(self, query: str, top_k: int) -> List[Dict[str, Any]]:
-        return self.lc_store.retrieve_chunks(query, top_k)
+    def retrieve_chunks(self, query: str, top_k: int, source_files: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        return self.lc_store.retrieve_chunks(query, top_k, source_files=source_files)
 
-    def retrieve_tables(self, query: str, top_k: int) -> List[Dict[str, Any]]:
-        return self.lc_store.retrieve_tables(query, top_k)
+    def retrieve_tables(self, query: str, top_k: int, source_files: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        return self.lc_store.retrieve_tables(query, top_k, source_files=source_files)
 
     # _pack no longer needed (removed custom store logic)
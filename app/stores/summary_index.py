@@ -0,0 +1,106 @@
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+
+class SummaryIndex:
+    """In-memory exact cosine index over document-summary vectors.
+
+    One row per filing (a few thousand at most), so a brute-force matmul over
+    a contiguous float32 matrix of L2-normalised rows beats any ANN structure
+    or store round-trip. Rows live in a capacity-doubling buffer; removals
+    swap the last row into the hole.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buf: Optional[np.ndarray] = None  # (capacity, dim) float32, rows [0, n) are live
+        self._n = 0
+        self._ids: List[str] = []
+        self._payloads: List[Tuple[str, Dict[str, Any]]] = []  # (page_content, metadata)
+        self._row: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return self._n
+
+    def load(self, qdrant, collection: str):
+        """Fill from every point of a collection (LangChain payload layout)."""
+        offset = None
+        while True:
+            points, offset = qdrant.scroll(collection_name=collection, limit=1000, offset=offset,
+                                           with_payload=True, with_vectors=True)
+            if points:
+                self.upsert([str(p.id) for p in points], [p.vector for p in points],
+                            [(p.payload or {}).get('page_content', '') for p in points],
+                            [(p.payload or {}).get('metadata') or {} for p in points])
+            if offset is None:
+                break
+
+    def upsert(self, ids: Sequence[str], vectors: Sequence[Sequence[float]], texts: Sequence[str], metadatas: Sequence[Dict[str, Any]]):
+        if not ids:
+            return
+        mat = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(mat, axis=1, keepdims=True)
+        mat = mat / np.where(norms > 0, norms, 1.0)
+        with self._lock:
+            if self._buf is None:
+                self._buf = np.empty((max(64, len(ids)), mat.shape[1]), dtype=np.float32)
+            for pid, vec, text, meta in zip(ids, mat, texts, metadatas):
+                row = self._row.get(pid)
+                if row is None:
+                    if self._n == self._buf.shape[0]:
+                        grown = np.empty((self._buf.shape[0] * 2, self._buf.shape[1]), dtype=np.float32)
+                        grown[:self._n] = self._buf[:self._n]
+                        self._buf = grown
+                    row = self._n
+                    self._n += 1
+                    self._ids.append(pid)
+                    self._payloads.append((text, meta))
+                    self._row[pid] = row
+                else:
+                    self._payloads[row] = (text, meta)
+                self._buf[row] = vec
+
+    def remove_file(self, source_file: str):
+        with self._lock:
+            rows = sorted((r for r, (_, meta) in enumerate(self._payloads) if meta.get('source_file') == source_file), reverse=True)
+            for row in rows:
+                last = self._n - 1
+                del self._row[self._ids[row]]
+                if row != last:
+                    self._buf[row] = self._buf[last]
+                    self._ids[row] = self._ids[last]
+                    self._payloads[row] = self._payloads[last]
+                    self._row[self._ids[row]] = row
+                self._ids.pop()
+                self._payloads.pop()
+                self._n -= 1
+
+    def search(self, vector: Sequence[float], top_k: int, source_files: Optional[Iterable[str]] = None) -> List[Tuple[float, str, Dict[str, Any]]]:
+        """Top-k (cosine score, page_content, metadata), best first; source_files restricts the rows searched."""
+        q = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(q))
+        if norm > 0:
+            q = q / norm
+        with self._lock:
+            n = self._n
+            if n == 0 or top_k <= 0:
+                return []
+            if source_files:
+                allowed = set(source_files)
+                rows = np.flatnonzero(np.fromiter((meta.get('source_file') in allowed for _, meta in self._payloads), dtype=bool, count=n))
+            else:
+                rows = np.arange(n)
+            if len(rows) == 0:
+                return []
+            scores = np.full(n, -np.inf, dtype=np.float32)
+            scores[rows] = self._buf[rows] @ q if len(rows) < n else self._buf[:n] @ q
+            k = min(top_k, len(rows))
+            top = rows[np.argpartition(-scores[rows], k - 1)[:k]] if k < len(rows) else rows
+            top = top[np.argsort(-scores[top])]
+            return [(float(scores[i]), self._payloads[i][0], self._payloads[i][1]) for i in top]
@@ -0,0 +1,113 @@
+import os
+import sqlite3
+import threading
+import zlib
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+_CELL = '\x1f'  # unit separator between cells of a column
+_COL = '\x1e'  # record separator between columns
+
+
+def encode_rows(rows: List[List[str]]) -> Tuple[int, int, bytes]:
+    """Columnar, zlib-compressed encoding of a table's rows -> (n_rows, n_cols, blob).
+
+    Cells of a column are stored contiguously (fiscal years, units and
+    figures of the same kind sit next to each other), which compresses
+    noticeably better than row-major JSON.
+    """
+    n_rows = len(rows)
+    n_cols = max((len(r) for r in rows), default=0)
+    cols = []
+    for c in range(n_cols):
+        cells = [(r[c] if c < len(r) else '') or '' for r in rows]
+        cols.append(_CELL.join(s.replace(_CELL, ' ').replace(_COL, ' ') for s in cells))
+    return n_rows, n_cols, zlib.compress(_COL.join(cols).encode('utf-8'), 6)
+
+
+def decode_rows(n_rows: int, n_cols: int, blob: bytes) -> List[List[str]]:
+    if not n_rows or not n_cols:
+        return []
+    cols = [c.split(_CELL) for c in zlib.decompress(blob).decode('utf-8').split(_COL)]
+    return [[cols[c][r] for c in range(n_cols)] for r in range(n_rows)]
+
+
+def render_table(rows: List[List[str]], max_chars: Optional[int] = None) -> str:
+    """Pipe-separated text of a table for the LLM, capped at table_max_rows x table_max_cols and max_chars."""
+    max_chars = settings.table_context_max_chars if max_chars is None else max_chars
+    lines = []
+    for r in rows:
+        cells = [c.strip() for c in r[:settings.table_max_cols]]
+        if any(cells):
+            lines.append(' | '.join(cells))
+        if len(lines) >= settings.table_max_rows:
+            break
+    text = '\n'.join(lines)
+    return text if len(text) <= max_chars else text[:max_chars] + '…'
+
+
+class TableStore:
+    """Full rows of every ingested table, keyed by table id (the 'original_id' of its point).
+
+    The tables collection only embeds a short header / row-label projection;
+    the figures live here and are fetched for the handful of tables that
+    make it into an answer.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.path.join(settings.persist_dir, 'tables.sqlite')
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS tables ('
+            ' table_id TEXT PRIMARY KEY, source_file TEXT NOT NULL, page INTEGER,'
+            ' n_rows INTEGER NOT NULL, n_cols INTEGER NOT NULL, data BLOB NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_tables_source ON tables(source_file)')
+        self._conn.commit()
+
+    def add(self, source_file: str, entries: Iterable[Tuple[str, Optional[int], List[List[str]]]]):
+        """Store (table_id, page, rows) entries of one source file."""
+        records = []
+        for table_id, page, rows in entries:
+            n_rows, n_cols, blob = encode_rows(rows or [])
+            records.append((table_id, source_file, page, n_rows, n_cols, blob))
+        if not records:
+            return
+        with self._lock:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO tables (table_id, source_file, page, n_rows, n_cols, data) VALUES (?, ?, ?, ?, ?, ?)',
+                records
+            )
+            self._conn.commit()
+
+    def get_many(self, table_ids: Iterable[str]) -> Dict[str, List[List[str]]]:
+        """table id -> rows for the ids that are stored (others are simply absent)."""
+        ids = list(dict.fromkeys(table_ids))
+        if not ids:
+            return {}
+        out: Dict[str, List[List[str]]] = {}
+        with self._lock:
+            for i in range(0, len(ids), 500):
+                part = ids[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT table_id, n_rows, n_cols, data FROM tables WHERE table_id IN ({','.join('?' * len(part))})", part
+                ).fetchall()
+                for table_id, n_rows, n_cols, blob in rows:
+                    out[table_id] = decode_rows(n_rows, n_cols, blob)
+        return out
+
+    def remove_file(self, source_file: str):
+        with self._lock:
+            self._conn.execute('DELETE FROM tables WHERE source_file=?', (source_file,))
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            n, cells, size = self._conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(n_rows * n_cols), 0), COALESCE(SUM(LENGTH(data)), 0) FROM tables'
+            ).fetchone()
+        return {'tables': n, 'cells': cells, 'bytes': size}
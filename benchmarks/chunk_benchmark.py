@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of the single-pass Chunker against the previous implementation.
+
+The legacy strategies (sentence split + text.find offset recovery + re-scan of
+oversized groups) are reproduced below for comparison only.
+
+Usage (from the repo root):
+    python -m benchmarks.chunk_benchmark [--pdf data/goog-10-k-q4-2022.pdf] [--target-chars 1000000]
+"""
+
+import argparse
+import re
+import time
+from typing import Iterable, List
+
+from app.core.config import get_settings
+from app.services.chunking import Chunker, TextChunk
+from app.services.pdf_loader import PDFLoader
+
+
+class LegacyChunker:
+    def __init__(self, strategy, chunk_size, overlap, max_chunk_size, sentence_regex):
+        self.strategy = strategy
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.max_chunk_size = max_chunk_size
+        self.sentence_regex = re.compile(sentence_regex)
+
+    def chunk(self, text: str) -> List[TextChunk]:
+        if self.strategy == 'sentence':
+            return list(self._sentence_group(text))
+        if self.strategy == 'recursive':
+            return list(self._recursive(text))
+        return list(self._fixed(text))
+
+    def _fixed(self, text: str) -> Iterable[TextChunk]:
+        start = 0
+        n = len(text)
+        while start < n:
+            end = min(start + self.chunk_size, n)
+            yield TextChunk(text=text[start:end], start=start, end=end)
+            if end == n:
+                break
+            start = max(end - self.overlap, 0)
+
+    def _sentence_group(self, text: str) -> Iterable[TextChunk]:
+        sentences = [p.strip() for p in self.sentence_regex.split(text) if p.strip()]
+        buf: List[str] = []
+        buf_len = 0
+        cursor = 0
+        chunk_start = 0
+        for s in sentences:
+            if not buf:
+                chunk_start = text.find(s, cursor)
+            if buf_len + (1 if buf else 0) + len(s) > self.chunk_size and buf:
+                chunk_text = ' '.join(buf)
+                chunk_end = chunk_start + len(chunk_text)
+                yield TextChunk(text=chunk_text, start=chunk_start, end=chunk_end)
+                buf = [s]
+                buf_len = len(s)
+                cursor = chunk_end
+                chunk_start = text.find(s, cursor)
+            else:
+                buf.append(s)
+                buf_len += (1 if buf_len > 0 else 0) + len(s)
+        if buf:
+            chunk_text = ' '.join(buf)
+            yield TextChunk(text=chunk_text, start=chunk_start, end=chunk_start + len(chunk_text))
+
+    def _recursive(self, text: str) -> Iterable[TextChunk]:
+        for group in self._sentence_group(text):
+            if len(group.text) <= self.max_chunk_size:
+                yield group
+            else:
+                for sub in self._fixed(group.text):
+                    yield TextChunk(text=sub.text, start=group.start + sub.start, end=group.start + sub.end)
+
+
+def offset_errors(text: str, chunks: List[TextChunk]) -> int:
+    """Chunks whose recorded offsets do not reproduce their text."""
+    return sum(1 for c in chunks if text[c.start:c.end] != c.text)
+
+
+def timed(fn, repeat: int):
+    best = float('inf')
+    out = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pdf', default='data/goog-10-k-q4-2022.pdf')
+    parser.add_argument('--target-chars', type=int, default=1_000_000, help='repeat the filing text up to this size')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    settings = get_settings()
+    settings.parse_debug = False
+    loader = PDFLoader(settings.chunk_size, settings.chunk_overlap)
+    pages = [p.text for p in loader.iter_pages(args.pdf)]
+    base_chars = sum(len(p) for p in pages) + len(pages) - 1
+    reps = max(1, -(-args.target_chars // max(base_chars, 1)))
+    pages = pages * reps  # repeated boilerplate is exactly the case text.find gets wrong
+    text = "\n".join(pages)
+    print(f"pdf={args.pdf} pages={len(pages)} chars={len(text):,} chunk_size={settings.chunk_size} max_chunk_size={settings.max_chunk_size}")
+    print(f"{'strategy':>10} {'impl':>8} {'chunks':>7} {'seconds':>8} {'MB/s':>7} {'bad_offsets':>11}")
+    for strategy in ('fixed', 'sentence', 'recursive'):
+        cfg = (strategy, settings.chunk_size, settings.chunk_overlap, settings.max_chunk_size, settings.sentence_split_regex)
+        legacy, current = LegacyChunker(*cfg), Chunker(*cfg)
+
+        def streamed():
+            stream = current.stream()
+            out = []
+            for i, p in enumerate(pages):
+                out.extend(stream.feed(p, page=i))
+            return out + stream.flush()
+
+        for name, fn in (('legacy', lambda: legacy.chunk(text)), ('single', lambda: current.chunk(text)), ('stream', streamed)):
+            secs, chunks = timed(fn, args.repeat)
+            print(f"{strategy:>10} {name:>8} {len(chunks):>7} {secs:>8.3f} {len(text) / secs / 1e6:>7.1f} {offset_errors(text, chunks):>11}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Benchmark EmbeddingScheduler throughput against in-flight request count, using
+the local fake embedding server (injected latency and 429s).
+
+Usage (from the repo root):
+    python -m benchmarks.embedding_benchmark [--texts 2000] [--in-flight 1,2,4,8] [--latency-ms 200] [--max-concurrent 6] [--rate-limit-prob 0.05]
+"""
+
+import argparse
+import time
+
+from app.core.config import get_settings
+from app.services.embedding_scheduler import EmbeddingScheduler
+from benchmarks.fake_embedding_server import start_in_thread
+
+from openai import OpenAI
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--texts', type=int, default=2000)
+    parser.add_argument('--text-chars', type=int, default=1000)
+    parser.add_argument('--in-flight', default='1,2,4,8')
+    parser.add_argument('--batch-tokens', type=int, default=8000)
+    parser.add_argument('--latency-ms', type=float, default=200.0)
+    parser.add_argument('--max-concurrent', type=int, default=6)
+    parser.add_argument('--rate-limit-prob', type=float, default=0.05)
+    args = parser.parse_args()
+
+    settings = get_settings()
+    settings.rag_debug = False
+    server = start_in_thread(port=0, latency_ms=args.latency_ms, max_concurrent=args.max_concurrent,
+                             rate_limit_prob=args.rate_limit_prob)
+    client = OpenAI(api_key='fake', base_url=f"http://127.0.0.1:{server.server_address[1]}/v1", max_retries=0)
+
+    def embed_batch(texts):
+        resp = client.embeddings.create(model=settings.embedding_model, input=texts)
+        return [d.embedding for d in sorted(resp.data, key=lambda d: d.index)]
+
+    filler = 'revenue operating income net cash provided by operating activities '
+    texts = [f"{i} " + (filler * (args.text_chars // len(filler) + 1))[:args.text_chars] for i in range(args.texts)]
+    print(f"texts={len(texts)} latency_ms={args.latency_ms} server_max_concurrent={args.max_concurrent} rate_limit_prob={args.rate_limit_prob}")
+    print(f"{'in_flight':>9} {'requests':>8} {'retries':>7} {'429s':>5} {'elapsed_s':>9} {'texts/s':>8}")
+    for n in sorted({int(x) for x in args.in_flight.split(',') if x.strip()}):
+        sched = EmbeddingScheduler(embed_batch, max_batch_tokens=args.batch_tokens, max_in_flight=n, backoff_base=0.05)
+        t0 = time.perf_counter()
+        out = sched.embed(texts)
+        elapsed = time.perf_counter() - t0
+        assert len(out) == len(texts)
+        s = sched.stats()
+        print(f"{n:>9} {s['requests']:>8} {s['retries']:>7} {s['rate_limited']:>5} {elapsed:>9.2f} {len(texts) / elapsed:>8.1f}")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the OpenAI embeddings endpoint, for exercising the embedding
+scheduler without network access or API cost.
+
+Returns deterministic unit vectors per input text, sleeps for a configurable
+latency per request, and answers 429 (with Retry-After) when more than
+--max-concurrent requests are in flight or at random with --rate-limit-prob.
+
+Usage (from the repo root):
+    python -m benchmarks.fake_embedding_server [--port 8099] [--latency-ms 200] [--max-concurrent 4] [--rate-limit-prob 0.05]
+    OPENAI_API_KEY=fake OPENAI_BASE_URL=http://127.0.0.1:8099/v1 uvicorn app.api.server:app
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+
+class FakeEmbeddingServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int = 8099, dim: int = 1536, latency_ms: float = 200.0, jitter_ms: float = 0.0,
+                 max_concurrent: int = 0, rate_limit_prob: float = 0.0, retry_after: float = 0.0):
+        super().__init__(('127.0.0.1', port), _Handler)
+        self.dim = dim
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.max_concurrent = max_concurrent
+        self.rate_limit_prob = rate_limit_prob
+        self.retry_after = retry_after
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.stats = {'requests': 0, 'served': 0, 'rate_limited': 0, 'inputs': 0, 'max_in_flight': 0}
+
+    def embed(self, text: str, dimensions: int = 0) -> list:
+        h = hashlib.sha256(text.encode()).digest()
+        v = np.random.default_rng(int.from_bytes(h[:8], 'little')).standard_normal(self.dim)
+        if dimensions:
+            v = v[:dimensions]  # shortened embedding: truncate, then renormalise
+        return (v / np.linalg.norm(v)).astype(np.float32).tolist()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: FakeEmbeddingServer
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: dict, headers: dict = None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        srv = self.server
+        if not self.path.rstrip('/').endswith('/embeddings'):
+            self._send(404, {'error': {'message': f'unknown path {self.path}'}})
+            return
+        payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)) or b'{}')
+        inputs = payload.get('input') or []
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        with srv.lock:
+            srv.stats['requests'] += 1
+            limited = (srv.max_concurrent and srv.in_flight >= srv.max_concurrent) or random.random() < srv.rate_limit_prob
+            if limited:
+                srv.stats['rate_limited'] += 1
+            else:
+                srv.in_flight += 1
+                srv.stats['max_in_flight'] = max(srv.stats['max_in_flight'], srv.in_flight)
+        if limited:
+            self._send(429, {'error': {'message': 'Rate limit reached', 'type': 'rate_limit_exceeded'}},
+                       {'retry-after': str(srv.retry_after)})
+            return
+        try:
+            time.sleep(max(0.0, srv.latency_ms + random.uniform(-srv.jitter_ms, srv.jitter_ms)) / 1000.0)
+            data = [{'object': 'embedding', 'index': i, 'embedding': srv.embed(t, payload.get('dimensions') or 0)} for i, t in enumerate(inputs)]
+            n_tokens = sum(len(t) // 4 + 1 for t in inputs)
+            self._send(200, {'object': 'list', 'data': data, 'model': payload.get('model', ''),
+                             'usage': {'prompt_tokens': n_tokens, 'total_tokens': n_tokens}})
+        finally:
+            with srv.lock:
+                srv.in_flight -= 1
+                srv.stats['served'] += 1
+                srv.stats['inputs'] += len(inputs)
+
+
+def start_in_thread(**kwargs) -> FakeEmbeddingServer:
+    """Start a server on a daemon thread (port=0 picks a free port); stop with server.shutdown()."""
+    server = FakeEmbeddingServer(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--dim', type=int, default=1536)
+    parser.add_argument('--latency-ms', type=float, default=200.0)
+    parser.add_argument('--jitter-ms', type=float, default=0.0)
+    parser.add_argument('--max-concurrent', type=int, default=0, help='429 beyond this many in-flight requests (0 = unlimited)')
+    parser.add_argument('--rate-limit-prob', type=float, default=0.0)
+    parser.add_argument('--retry-after', type=float, default=0.0)
+    args = parser.parse_args()
+    server = FakeEmbeddingServer(args.port, args.dim, args.latency_ms, args.jitter_ms,
+                                 args.max_concurrent, args.rate_limit_prob, args.retry_after)
+    print(f"fake embeddings on http://127.0.0.1:{server.server_address[1]}/v1/embeddings")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(server.stats)
+
+
+if __name__ == '__main__':
+    main()
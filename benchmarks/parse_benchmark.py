@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Benchmark PDFLoader page parsing throughput (pages/second) against worker count.
+
+Usage (from the repo root):
+    python -m benchmarks.parse_benchmark [--pdf data/goog-10-k-q4-2022.pdf] [--workers 1,2,4,8] [--repeat 3] [--cache]
+
+The parse cache is disabled unless --cache is given; otherwise every run
+after the first would time cache reads instead of parsing.
+"""
+
+import argparse
+import os
+import time
+
+from app.core.config import get_settings
+from app.services.pdf_loader import PDFLoader
+
+
+def run_once(loader: PDFLoader, pdf: str) -> dict:
+    t0 = time.perf_counter()
+    pages = chunks = tables = 0
+    for page in loader.iter_pages(pdf):
+        pages += 1
+        chunks += len(page.chunks)
+        tables += len(page.tables)
+    return {'elapsed': time.perf_counter() - t0, 'pages': pages, 'chunks': chunks, 'tables': tables}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pdf', default='data/goog-10-k-q4-2022.pdf')
+    parser.add_argument('--workers', default=f"1,2,4,{os.cpu_count() or 1}")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--cache', action='store_true', help='read/write the parse cache (times cache reads)')
+    args = parser.parse_args()
+
+    settings = get_settings()
+    settings.parse_debug = False
+    settings.parse_cache_enabled = args.cache
+    worker_counts = sorted({int(w) for w in args.workers.split(',') if w.strip()})
+    loader = PDFLoader(settings.chunk_size, settings.chunk_overlap)
+
+    print(f"pdf={args.pdf} cpus={os.cpu_count()} tables={settings.enable_table_extraction and not settings.simple_pdf_parser} cache={args.cache}")
+    print(f"{'workers':>8} {'pages':>6} {'best_s':>8} {'pages/s':>9} {'speedup':>8}")
+    baseline = None
+    reference = None
+    for w in worker_counts:
+        settings.parse_workers = w
+        runs = [run_once(loader, args.pdf) for _ in range(args.repeat)]
+        best = min(r['elapsed'] for r in runs)
+        counts = (runs[0]['pages'], runs[0]['chunks'], runs[0]['tables'])
+        if reference is None:
+            reference = counts
+        elif counts != reference:
+            print(f"  !! output mismatch for workers={w}: {counts} != {reference}")
+        baseline = baseline or best
+        print(f"{w:>8} {counts[0]:>6} {best:>8.3f} {counts[0] / best:>9.1f} {baseline / best:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
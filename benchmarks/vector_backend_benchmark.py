@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Compare chunk search latency (p50/p99) and recall@k of the FAISS mirror
+(hnsw / ivf / flat, optionally int8 / binary quantized and/or searched on a
+coarse matryoshka prefix, both followed by full-vector rescoring)
+against Qdrant local mode on synthetic clustered vectors. index_mb is the
+size of the serialized ANN index, i.e. what stays resident in RAM; the float
+vectors (n * dim * 4 bytes) live in the memory-mapped file on disk.
+
+Qdrant local mode is skipped above --qdrant-max points (its Python-side
+insert alone takes very long at 1M). At 1M x 1536 the vector file is ~6 GB;
+use --dim to scale down on small machines.
+
+Usage (from the repo root):
+    python -m benchmarks.vector_backend_benchmark [--sizes 10000,100000,1000000] [--dim 1536] [--faiss hnsw,ivf] [--quant none,int8,binary] [--oversample 4] [--coarse 0,256] [--qdrant-max 100000] [--queries 200]
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from app.core.config import get_settings
+from app.stores.faiss_index import FaissIndex
+
+
+def make_batch(rng: np.random.Generator, centers: np.ndarray, n: int) -> np.ndarray:
+    """Clustered vectors (closer to real embeddings than i.i.d. noise)."""
+    assign = rng.integers(0, len(centers), n)
+    v = centers[assign] + 0.35 * rng.standard_normal((n, centers.shape[1]), dtype=np.float32)
+    return v / np.linalg.norm(v, axis=1, keepdims=True)
+
+
+def percentiles(lat_ms):
+    return float(np.percentile(lat_ms, 50)), float(np.percentile(lat_ms, 99))
+
+
+def exact_topk(vecs: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    best_s = np.full((len(queries), k), -np.inf, dtype=np.float32)
+    best_i = np.zeros((len(queries), k), dtype=np.int64)
+    for start in range(0, len(vecs), 100_000):
+        s = queries @ np.asarray(vecs[start:start + 100_000]).T
+        idx = np.argpartition(-s, min(k, s.shape[1] - 1), axis=1)[:, :k]
+        cand_s = np.concatenate([best_s, np.take_along_axis(s, idx, 1)], axis=1)
+        cand_i = np.concatenate([best_i, idx + start], axis=1)
+        order = np.argsort(-cand_s, axis=1)[:, :k]
+        best_s, best_i = np.take_along_axis(cand_s, order, 1), np.take_along_axis(cand_i, order, 1)
+    return best_i
+
+
+def run_faiss(kind, quant, coarse, n, dim, queries, k, seed, workdir, batch):
+    root = os.path.join(workdir, f"faiss-{kind}-{quant}-{coarse}-{n}")
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((256, dim), dtype=np.float32)
+    index = FaissIndex('chunks', dim, root=root, kind=kind, quantization=quant, coarse_dim=coarse)
+    t0 = time.perf_counter()
+    for start in range(0, n, batch):
+        m = min(batch, n - start)
+        ids = [f"p{start + i}" for i in range(m)]
+        metas = [{'source_file': f"f{(start + i) % 500}.pdf", 'row': start + i} for i in range(m)]
+        index.add(ids, make_batch(rng, centers, m), [''] * m, metas)
+    index.save()
+    build_s = time.perf_counter() - t0
+    index_mb = os.path.getsize(os.path.join(index.dir, 'index.faiss')) / 1e6
+    truth = exact_topk(index._vecs[:n], queries, k)
+    lat, recall = [], []
+    for qi, q in enumerate(queries):
+        t = time.perf_counter()
+        hits = index.search(q, k)
+        lat.append((time.perf_counter() - t) * 1000.0)
+        got = {meta['row'] for _, _, meta in hits}
+        recall.append(len(got & set(truth[qi].tolist())) / k)
+    return index, build_s, index_mb, lat, float(np.mean(recall))
+
+
+def run_qdrant(n, dim, queries, k, seed, workdir, batch):
+    from qdrant_client import QdrantClient
+    from qdrant_client.http import models as qmodels
+    path = os.path.join(workdir, f"qdrant-{n}")
+    client = QdrantClient(path=path)
+    client.create_collection('chunks', vectors_config=qmodels.VectorParams(size=dim, distance=qmodels.Distance.COSINE))
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((256, dim), dtype=np.float32)
+    t0 = time.perf_counter()
+    for start in range(0, n, batch):
+        m = min(batch, n - start)
+        vecs = make_batch(rng, centers, m)
+        client.upsert('chunks', points=[
+            qmodels.PointStruct(id=start + i, vector=vecs[i].tolist(), payload={'metadata': {'source_file': f"f{(start + i) % 500}.pdf"}})
+            for i in range(m)
+        ])
+    build_s = time.perf_counter() - t0
+    lat = []
+    for q in queries:
+        t = time.perf_counter()
+        client.query_points('chunks', query=q.tolist(), limit=k)
+        lat.append((time.perf_counter() - t) * 1000.0)
+    client.close()
+    return build_s, lat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='10000,100000,1000000')
+    parser.add_argument('--dim', type=int, default=1536)
+    parser.add_argument('--faiss', default='hnsw,ivf')
+    parser.add_argument('--quant', default='none,int8,binary')
+    parser.add_argument('--coarse', default='0', help='coarse (matryoshka prefix) widths to try; 0 = full width')
+    parser.add_argument('--oversample', type=float, default=None, help='override quantization_oversample')
+    parser.add_argument('--qdrant-max', type=int, default=100_000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--batch', type=int, default=10_000)
+    parser.add_argument('--workdir', default=None, help='scratch dir (default: a temp dir, removed afterwards)')
+    args = parser.parse_args()
+
+    settings = get_settings()
+    settings.rag_debug = False
+    if args.oversample is not None:
+        settings.quantization_oversample = args.oversample
+    workdir = args.workdir or tempfile.mkdtemp(prefix='vector_bench_')
+    seed = 7
+    print(f"dim={args.dim} k={args.k} queries={args.queries} workdir={workdir}")
+    print(f"{'backend':>18} {'n':>9} {'build_s':>9} {'index_mb':>9} {'p50_ms':>8} {'p99_ms':>8} {'recall@k':>9}")
+    try:
+        for n in [int(x) for x in args.sizes.split(',') if x.strip()]:
+            rng = np.random.default_rng(seed)
+            centers = rng.standard_normal((256, args.dim), dtype=np.float32)
+            queries = make_batch(np.random.default_rng(seed + 1), centers, args.queries)
+            for kind in [x for x in args.faiss.split(',') if x.strip()]:
+                for quant in [x for x in args.quant.split(',') if x.strip()]:
+                    for coarse in [int(x) for x in args.coarse.split(',') if x.strip()]:
+                        index, build_s, index_mb, lat, recall = run_faiss(kind, quant, coarse, n, args.dim, queries, args.k, seed, workdir, args.batch)
+                        p50, p99 = percentiles(lat)
+                        label = 'faiss-' + index.stats()['kind'] + (f"@{index.coarse_dim}" if index.coarse_dim else '')
+                        print(f"{label:>18} {n:>9} {build_s:>9.1f} {index_mb:>9.1f} {p50:>8.2f} {p99:>8.2f} {recall:>9.3f}")
+                        del index
+            if n <= args.qdrant_max:
+                build_s, lat = run_qdrant(n, args.dim, queries, args.k, seed, workdir, min(args.batch, 1000))
+                p50, p99 = percentiles(lat)
+                print(f"{'qdrant-local':>18} {n:>9} {build_s:>9.1f} {n * args.dim * 4 / 1e6:>9.1f} {p50:>8.2f} {p99:>8.2f} {'exact':>9}")
+            else:
+                print(f"{'qdrant-local':>18} {n:>9} {'skipped (--qdrant-max)':>47}")
+    finally:
+        if args.workdir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()